@@ -1,77 +1,278 @@
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
-import glob
+import contextvars
 import json
 import datetime
-from typing import Dict, Any
 import re
-import markdown
-
-# Load environment variables from your .env file
-load_dotenv()
+import threading
+from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from profile_store import load_profile_data_for_user, profile_store
+from response_cache import build_response_cache
+from gemini_client import build_client
+from skill_extractor import MASTER_SKILLS, canonical_skill_set
+from skill_results import SkillResultStore
+from metrics import instrument_gemini, on_tokens
+from fair_scheduler import FairScheduler, QuotaExceededError
+from prompt_builder import Section, build_prompt
+from chat_sessions import ChatSessionStore
+from settings import get_settings
+from streaming import render_markdown
+from structured_output import SchemaError, json_config, loads_json, parse_structured
+
+# Environment variables (and the .env file) are read once, into settings
+settings = get_settings()
 
 # --- FIX 1: Securely load API key from environment variables ---
 api_key = ""
 
-    
-genai.configure(api_key=api_key)
+# Label: Shared Gemini Client
+# One client for every call below: cached model objects, a cap on in-flight
+# requests and a per-call timeout. GEMINI_BACKEND=fake answers locally for load tests.
+# Retries, hedging and the circuit breaker are tuned with the GEMINI_RETRY_* /
+# GEMINI_HEDGE_AFTER / GEMINI_BREAKER_* variables (hedging is off unless set).
+# google.generativeai is only imported when the first model call is made.
+# The scheduler shares the client's slots fairly between users and puts chat
+# ahead of batch work; per-user usage is added up from every call's tokens.
+scheduler = FairScheduler(
+    slots=settings.gemini_max_concurrency,
+    interactive_slots=settings.interactive_slots,
+    tokens_per_minute=settings.user_tokens_per_minute,
+    burst_tokens=settings.user_token_burst,
+    prompt_price_per_million=settings.gemini_prompt_price,
+    output_price_per_million=settings.gemini_output_price,
+)
+on_tokens(scheduler.record_usage)
+client = build_client(
+    backend_name=settings.gemini_backend,
+    api_key=api_key,
+    max_concurrency=settings.gemini_max_concurrency,
+    default_timeout=settings.gemini_timeout,
+    max_attempts=settings.gemini_retry_attempts,
+    hedge_after=settings.gemini_hedge_after,
+    breaker_failures=settings.gemini_breaker_failures,
+    breaker_cooldown=settings.gemini_breaker_cooldown,
+    scheduler=scheduler,
+)
+
+# Label: Response Cache
+# Identical prompts (same skills, same goal) are answered from the cache.
+# Set GEMINI_CACHE_DB to keep cached responses on disk across restarts.
+response_cache = build_response_cache(
+    db_path=settings.gemini_cache_db,
+    max_entries=settings.gemini_cache_size,
+    ttl_seconds=settings.gemini_cache_ttl,
+)
+# High-temperature calls (recommend_future) are only cached if this is opted into
+CACHE_HIGH_TEMPERATURE = settings.cache_high_temperature
+
+# Label: Skill-Set Results
+# Skill gaps and recommendations depend only on the skills, so they are stored per
+# canonical skill set and shared by every user who has that set.
+skill_results = SkillResultStore()
+
+# Label: Prompt Budgets
+# Prompts are built from their relevant fields only and kept under this many
+# (estimated) tokens; long skill lists, goals and roadmaps are shortened to fit.
+PROMPT_TOKEN_BUDGET = settings.prompt_token_budget
+SKILLS_MAX_TOKENS = 300
+GOAL_MAX_TOKENS = 100
+ROADMAP_MAX_TOKENS = 1000
+
+# Label: Structured Answers
+# The skill gap and the recommendations come back as schema-constrained JSON with
+# a cap on output tokens, instead of free text split on commas / regex-converted
+# to HTML. Answers are validated before use; the page renders the lists itself.
+SKILL_GAP_SCHEMA = {
+    "type": "object",
+    "properties": {"missing_skills": {"type": "array", "items": {"type": "string"}}},
+    "required": ["missing_skills"],
+}
+RECOMMENDATION_FIELDS = ("career_paths", "next_skills", "industries", "tips")
+RECOMMENDATION_SCHEMA = {
+    "type": "object",
+    "properties": {field: {"type": "array", "items": {"type": "string"}} for field in RECOMMENDATION_FIELDS},
+    "required": list(RECOMMENDATION_FIELDS),
+}
+SKILL_GAP_CONFIG = json_config(SKILL_GAP_SCHEMA, max_output_tokens=256)
+RECOMMENDATION_CONFIG = json_config(RECOMMENDATION_SCHEMA, max_output_tokens=768, temperature=0.9)
+SKILL_GAP_MAX_ITEMS = 4
+RECOMMENDATION_MAX_ITEMS = 4
+
+
+def _generate_text(prompt: str, model_name: str = 'gemini-2.5-flash', generation_config=None,
+                   allow_high_temperature: bool = False, refresh: bool = False) -> str:
+    """
+    Sends a prompt to Gemini through the response cache and returns the response text
+    (a new one, replacing the cached answer, with refresh).
+    """
+    def call_model():
+        return client.generate(prompt, model_name, generation_config)
+
+    return response_cache.get_or_generate(
+        prompt, model_name, generation_config, call_model,
+        allow_high_temperature=allow_high_temperature, refresh=refresh,
+    )
 
 
-def get_gemini_response(user_prompt: str) -> str:
+def _generate_json(prompt: str, generation_config, schema, allow_high_temperature: bool = False):
     """
-    Sends a prompt to the Gemini API with a predefined context.
+    Like _generate_text, for a schema-constrained JSON answer: returns the validated
+    data. An answer that doesn't match the schema is never cached, and is asked for
+    once more (bypassing the cache) before SchemaError is raised.
     """
+    def is_valid(text):
+        try:
+            parse_structured(text, schema)
+            return True
+        except SchemaError:
+            return False
+
+    text = response_cache.get_or_generate(
+        prompt, 'gemini-2.5-flash', generation_config,
+        lambda: client.generate(prompt, 'gemini-2.5-flash', generation_config),
+        allow_high_temperature=allow_high_temperature, is_valid=is_valid,
+    )
     try:
-        # A more structured prompt
-        system_instruction = "You are a helpful career guidance counselor. Your goal is to guide the user's career choices. Keep your responses concise and brief, limited to 3-4 lines."
-        
-        full_prompt = f"{system_instruction}\n\nUser: {user_prompt}\nResponse:"
+        return parse_structured(text, schema)
+    except SchemaError as e:
+        print(f"Gemini answer did not match its schema ({e}); retrying once")
+    return parse_structured(client.generate(prompt, 'gemini-2.5-flash', generation_config), schema)
+
+
+def _clean_items(items, limit):
+    """Stripped, de-duplicated (case-insensitively) non-empty strings, at most limit of them."""
+    seen, cleaned = set(), []
+    for item in items:
+        item = " ".join(item.split())
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            cleaned.append(item)
+    return cleaned[:limit]
+
+
+def _stream_text(prompt: str, model_name: str = 'gemini-2.5-flash', generation_config=None,
+                 refresh: bool = False):
+    """
+    Streaming version of _generate_text: yields text chunks as Gemini produces them.
+    """
+    def stream_model():
+        return client.stream(prompt, model_name, generation_config)
+
+    return response_cache.stream_or_generate(prompt, model_name, generation_config, stream_model,
+                                             refresh=refresh)
+
+
+CHAT_FALLBACK = "Sorry, I'm having trouble thinking right now. Please try again."
+CHAT_THROTTLED = "You're sending messages faster than I can answer. Please try again in {seconds} seconds."
+CHAT_SYSTEM_INSTRUCTION = "You are a helpful career guidance counselor. Your goal is to guide the user's career choices. Keep your responses concise and brief, limited to 3-4 lines."
+CHAT_PROFILE_BUDGET = 300
+
+# Label: Chat Sessions
+# Conversation memory for /chat, bounded per session and in the number of sessions.
+chat_sessions = ChatSessionStore(
+    max_sessions=settings.chat_max_sessions,
+    idle_seconds=settings.chat_idle_seconds,
+    max_turns=settings.chat_max_turns,
+)
+
 
-        # --- FIX 2: Use a valid model name ---
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(full_prompt)
+def _chat_prompt(user_prompt: str) -> str:
+    # A more structured prompt
+    return f"{CHAT_SYSTEM_INSTRUCTION}\n\nUser: {user_prompt}\nResponse:"
 
-        return response.text
 
+def chat_profile_summary(username):
+    """A short description of the user from their latest profile, given to the model once per chat session."""
+    profile_data = load_profile_data_for_user(username) if username else None
+    if not profile_data:
+        return ''
+    return build_prompt('chat_profile', """The user you are talking to is {username}.
+Current Skills: {skills}
+Stated Career Goal: {career_goal}""", CHAT_PROFILE_BUDGET,
+                        **_profile_sections(username, profile_data, profile_data.get('skills', [])))
+
+
+@instrument_gemini
+def get_gemini_response(user_prompt: str, chat_session=None) -> str:
+    """
+    Sends a prompt to the Gemini API with a predefined context. With a chat_session
+    the model also sees the user's profile and the conversation so far, and the
+    exchange is added to the session.
+    """
+    try:
+        if chat_session is None:
+            # --- FIX 2: Use a valid model name ---
+            return _generate_text(_chat_prompt(user_prompt), 'gemini-2.5-flash')
+
+        # Not cached: with the history attached no two requests are the same
+        answer = client.generate(chat_session.contents(user_prompt), 'gemini-2.5-flash',
+                                 system_instruction=CHAT_SYSTEM_INSTRUCTION)
+        chat_session.record(user_prompt, answer)
+        return answer
+
+    except QuotaExceededError as e:
+        return CHAT_THROTTLED.format(seconds=max(1, round(e.retry_after)))
     except Exception as e:
         print(f"An error occurred in get_gemini_response: {e}")
-        return "Sorry, I'm having trouble thinking right now. Please try again."
+        return CHAT_FALLBACK
 
 
-def load_profile_data_for_user(username: str):
-    """Finds and loads the resume JSON data specifically for the logged-in user."""
+def stream_gemini_response(user_prompt: str, chat_session=None):
+    """
+    Same as get_gemini_response, but yields the answer in chunks as it is generated.
+    """
+    sent_any = False
+    parts = []
     try:
-        search_pattern = os.path.join('parsed_resumes', f'{username}_*.json')
-        user_files = glob.glob(search_pattern)
-        if not user_files:
-            return None
-        latest_file = max(user_files, key=os.path.getctime)
-        with open(latest_file, 'r') as f:
-            data = json.load(f)
-        return data
+        if chat_session is None:
+            chunks = _stream_text(_chat_prompt(user_prompt), 'gemini-2.5-flash')
+        else:
+            chunks = client.stream(chat_session.contents(user_prompt), 'gemini-2.5-flash',
+                                   system_instruction=CHAT_SYSTEM_INSTRUCTION)
+        for chunk in chunks:
+            sent_any = True
+            parts.append(chunk)
+            yield chunk
+    except QuotaExceededError as e:
+        if not sent_any:
+            yield CHAT_THROTTLED.format(seconds=max(1, round(e.retry_after)))
+        return
     except Exception as e:
-        print(f"Error loading profile data for {username}: {e}")
-        return None
+        print(f"An error occurred in stream_gemini_response: {e}")
+        if not sent_any:
+            yield CHAT_FALLBACK
+        return
+
+    if chat_session is not None:
+        chat_session.record(user_prompt, "".join(parts))
+
+
+# Fields the resume parser can be asked for. skills/emails/phones are normally
+# filled in locally by skill_extractor, so uploads only ask for LLM_ONLY_FIELDS.
+RESUME_FIELD_INSTRUCTIONS = {
+    "name": "**name**: The full name of the candidate.",
+    "emails": "**emails**: A list of all email addresses.",
+    "phones": "**phones**: A list of all phone numbers.",
+    "skills": f"**skills**: A list of skills found ONLY from this master list: {', '.join(MASTER_SKILLS)}",
+    "experience": """**experience**: An object with:
+        - "total_years": Total years of professional experience.
+        - "experience_ranges": A list of all job experiences, each with "start_date", "end_date", and "duration_years".""",
+}
+ALL_RESUME_FIELDS = list(RESUME_FIELD_INSTRUCTIONS)
+LLM_ONLY_FIELDS = ["name", "experience"]
+
 
-# You can use the same master skills list to guide the model
-MASTER_SKILLS = [
-    "python", "java", "c++", "c", "c#", "javascript", "typescript", "go", "rust", "kotlin", "swift", "php", "ruby", "scala",
-    "django", "flask", "fastapi", "node.js", "express.js", "ruby on rails", "spring boot",
-    "react", "angular", "vue.js", "next.js", "svelte",
-    "sql", "mysql", "postgresql", "sqlite", "mongodb", "redis", "cassandra", "elasticsearch",
-    "aws", "azure", "google cloud", "gcp", "docker", "kubernetes", "terraform", "ansible", "jenkins", "git", "ci/cd",
-    "pandas", "numpy", "scipy", "scikit-learn", "tensorflow", "pytorch", "keras", "matplotlib", "seaborn", "apache spark",
-    "html", "css", "sass", "graphql", "rest api",
-    "linux", "bash", "powershell", "agile", "scrum"
-]
+def _resume_extract_list(fields=None) -> str:
+    return "\n    ".join(
+        f"{i}.  {RESUME_FIELD_INSTRUCTIONS[field]}" for i, field in enumerate(fields or ALL_RESUME_FIELDS, 1)
+    )
 
 
-def parse_resume_with_gemini(resume_text: str) -> Dict[str, Any]:
+@instrument_gemini
+def parse_resume_with_gemini(resume_text: str, fields=None) -> Dict[str, Any]:
     """
     Parses a resume using the Gemini API to extract key information reliably.
+    Pass fields to only ask for some of them (see RESUME_FIELD_INSTRUCTIONS).
     """
-    model = genai.GenerativeModel('gemini-2.5-flash')
     generation_config = {
         "temperature": 0.1,  # Set a low temperature for consistency
         "top_p": 1,
@@ -79,19 +280,14 @@ def parse_resume_with_gemini(resume_text: str) -> Dict[str, Any]:
         "max_output_tokens": 2048,
     }
     today_date = datetime.date.today().isoformat()
+    extract_list = _resume_extract_list(fields)
     
     prompt = f"""
     You are an expert resume parsing system. Analyze the resume text and extract information in a structured JSON format.
     Today's date is {today_date}. Use this for roles listed as "Present" or "Current".
 
     Extract:
-    1.  **name**: The full name of the candidate.
-    2.  **emails**: A list of all email addresses.
-    3.  **phones**: A list of all phone numbers.
-    4.  **skills**: A list of skills found ONLY from this master list: {', '.join(MASTER_SKILLS)}
-    5.  **experience**: An object with:
-        - "total_years": Total years of professional experience.
-        - "experience_ranges": A list of all job experiences, each with "start_date", "end_date", and "duration_years".
+    {extract_list}
 
     Resume Text:
     ---
@@ -100,116 +296,146 @@ def parse_resume_with_gemini(resume_text: str) -> Dict[str, Any]:
     """
     
     # --- FIX 3: Use the reliable JSON mode from the API ---
-    generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
+    generation_config = {"response_mime_type": "application/json"}
 
+    response_text = None
     try:
-        response = model.generate_content(prompt, generation_config=generation_config)
-        return json.loads(response.text)
+        response_text = client.generate(prompt, 'gemini-2.5-flash', generation_config)
+        return json.loads(response_text)
     
     except (json.JSONDecodeError, Exception) as e:
         print(f"An error occurred while parsing the resume: {e}")
         # In case of an error, it's still useful to see the raw text
-        try:
+        if response_text is not None:
             print("--- Raw Response from API ---")
-            print(response.text)
-        except NameError:
+            print(response_text)
+        else:
             print("Response object not created.")
         return {"error": "Failed to parse the response from the Gemini API.", "details": str(e)}
     
 
-def format_recommendation_text(text):
+@instrument_gemini
+def parse_resumes_batch_with_gemini(resume_texts, fields=None):
     """
-    Convert markdown-style * bullets into proper HTML list items.
+    Parses several resumes with a single Gemini request (used for bulk ingestion).
+    Returns one dict per input, in order; a resume missing from the model's answer
+    comes back as {"error": ...} so the caller can retry it on its own.
     """
-    # Replace * **something** with <li><b>something</b></li>
-    text = re.sub(r"\*{1,2}\s*\*{1,2}(.*?)\*{1,2}", r"<li><b>\1</b></li>", text)
+    today_date = datetime.date.today().isoformat()
+    sections = "\n".join(
+        f"=== RESUME {index} ===\n{text}\n" for index, text in enumerate(resume_texts)
+    )
+    prompt = f"""
+    You are an expert resume parsing system. Below are {len(resume_texts)} resumes, each starting with a line "=== RESUME <index> ===".
+    Today's date is {today_date}. Use this for roles listed as "Present" or "Current".
 
-    # Replace single * bullet points into list items
-    text = re.sub(r"\*\s*(.*?)($|\n)", r"<li>\1</li>", text)
+    For EACH resume extract:
+    {_resume_extract_list(fields)}
 
-    # Wrap in <ul> if there are <li> tags
-    if "<li>" in text:
-        text = f"<ul>{text}</ul>"
+    Return a JSON array with exactly one object per resume, in the same order. Each object must
+    also have an "index" field holding the resume's index.
 
-    return text
+    {sections}
+    """
 
+    try:
+        items = json.loads(client.generate(prompt, 'gemini-2.5-flash', {"response_mime_type": "application/json"}))
+    except Exception as e:
+        print(f"An error occurred while batch-parsing {len(resume_texts)} resumes: {e}")
+        return [{"error": "Failed to parse the response from the Gemini API.", "details": str(e)}] * len(resume_texts)
 
-def recommend_future(username, profile_data, skills_list):
-    prompt = f"""
-    reply in 10 lines
+    by_index = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get("index"), int):
+            by_index[item.pop("index")] = item
+    return [by_index.get(index, {"error": "Resume missing from the batch response."})
+            for index in range(len(resume_texts))]
 
 
-    The following is the profile of a user named {username}.
-    
-    Profile Data:
-    {profile_data}
+def _recommend_for_skills(skills):
+    prompt = build_prompt('recommendation', """
+    The following are the skills of a user.
 
     Skills:
-    {skills_list}
+    {skills}
 
     Based on this, suggest the BEST possible future career path(s),
-    next skills to learn, and potential industries or job roles.
+    next skills to learn, potential industries, and practical tips.
+
+    Respond in JSON with these lists, each of at most 4 short items:
+    - career_paths: career paths or job roles that fit
+    - next_skills: skills to learn next
+    - industries: industries to target
+    - tips: one-line practical tips
+    """, PROMPT_TOKEN_BUDGET, skills=Section(skills, SKILLS_MAX_TOKENS, 'list'))
+
+    try:
+        data = _generate_json(prompt, RECOMMENDATION_CONFIG, RECOMMENDATION_SCHEMA,
+                              allow_high_temperature=CACHE_HIGH_TEMPERATURE)
+    except Exception as e:
+        print(f"An error occurred in recommend_future: {e}")
+        return {}
+
+    recommendations = {field: _clean_items(data[field], RECOMMENDATION_MAX_ITEMS) for field in RECOMMENDATION_FIELDS}
+    return recommendations if any(recommendations.values()) else {}
+
 
-    Please respond in short, clear bullet points.
+def recommend_for_skills(skills_list):
     """
+    Recommendation lists (career_paths, next_skills, industries, tips) for a skill
+    set, shared by every user with that set; {} if none could be generated.
+    """
+    skills = canonical_skill_set(skills_list)
+    return skill_results.get_or_compute('recommendation', skills, lambda: _recommend_for_skills(skills))
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt, generation_config={"temperature": 0.9})
-    
 
-    if response and response.candidates:
-        raw_text = response.text
-        formatted_text = format_recommendation_text(raw_text)
-        return {"username": username, "next_steps": formatted_text}
-    else:
-        return {"username": username, "next_steps": "No recommendation generated."}
+@instrument_gemini
+def recommend_future(username, profile_data, skills_list):
+    """Returns {"username", "recommendations"}; recommendations is None if none could be generated."""
+    return {"username": username, "recommendations": recommend_for_skills(skills_list) or None}
 
 
 
 
+@instrument_gemini
 def generate_skill_gap(current_skills):
     """
-    Uses the Gemini API to generate a list of missing skills.
+    Uses the Gemini API to generate a list of missing skills. The answer is stored
+    per canonical skill set, so users with the same skills share one model call.
 
     Args:
         current_skills (list): A list of the user's current skills.
-        target_role (str): The user's desired job role.
 
     Returns:
         list: A list of suggested skills to learn.
     """
-   
+    skills = canonical_skill_set(current_skills)
+    return skill_results.get_or_compute('skill_gap', skills, lambda: _generate_skill_gap(skills))
+
 
+def _generate_skill_gap(current_skills):
     # --- 1. Create a clear and specific prompt ---
-    # Asking for a comma-separated list makes the output easy to parse.
-    prompt = f"""
+    # The answer shape is fixed by SKILL_GAP_SCHEMA, so there is no free text to parse.
+    prompt = build_prompt('skill_gap', """
     Based on the following information, identify 2 to 4 crucial missing skills.
     
-    Current Skills: {', '.join(current_skills)}
+    Current Skills: {skills}
     
 
     Instructions:
     - Analyze the gap between the current skills and the skills required for the desired job role.
     - Provide a list of the most important skills the user needs to learn.
-    - **Return ONLY a comma-separated list of the skill names.** Do not include any explanation, titles, or numbering.
+    - Return JSON with "missing_skills": the skill names only, no explanations or numbering.
 
-    Example output: TensorFlow, PyTorch, AWS Sagemaker, Kubernetes, Docker, MLOps
-    """
+    Example output: {{"missing_skills": ["TensorFlow", "Kubernetes", "MLOps"]}}
+    """, PROMPT_TOKEN_BUDGET, skills=Section(current_skills, SKILLS_MAX_TOKENS, 'list'))
 
     try:
-        # --- 2. Call the Gemini API ---
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        
-        # --- 3. Parse the response ---
-        # The model should return a single string like: "Skill1, Skill2, Skill3"
-        generated_text = response.text.strip()
-        
-        # Split the string into a list and clean up any extra spaces
-        missing_skills = [skill.strip() for skill in generated_text.split(',')]
-        
-        # Filter out any empty strings that might result from parsing
-        return [skill for skill in missing_skills if skill]
+        # --- 2. Call the Gemini API (schema-constrained JSON, validated) ---
+        data = _generate_json(prompt, SKILL_GAP_CONFIG, SKILL_GAP_SCHEMA)
+
+        # --- 3. Clean up the names ---
+        return _clean_items(data["missing_skills"], SKILL_GAP_MAX_ITEMS)
 
     except Exception as e:
         print(f"An error occurred with the Gemini API: {e}")
@@ -218,24 +444,27 @@ def generate_skill_gap(current_skills):
 
 
 
-def generate_roadmap(username, profile_data, skills_list):
-    """
-    Generates a personalized career roadmap using the Gemini model
-    and converts it from Markdown to HTML.
-    """
-    if not skills_list:
-        # Returning a dictionary is better for handling errors in the route
-        return {"error": "Cannot generate a roadmap without skills. Please analyze a resume first."}
+def _career_goal(profile_data):
+    return profile_data.get('careerPreferences') or "a more senior role in their field"
 
-    career_goal = profile_data.get('careerPreferences') or "a more senior role in their field"
 
+def _profile_sections(username, profile_data, skills_list):
+    # The only profile fields the roadmap and challenges prompts use
+    return {
+        'username': Section(username, 16),
+        'skills': Section(skills_list, SKILLS_MAX_TOKENS, 'list'),
+        'career_goal': Section(_career_goal(profile_data), GOAL_MAX_TOKENS),
+    }
+
+
+def _roadmap_prompt(username, profile_data, skills_list):
     # --- CORRECTED PROMPT ---
     # The instructions are now clear and consistent.
-    prompt = f"""
+    return build_prompt('roadmap', """
     You are an expert career coach named "Ignite." Your task is to create a detailed, personalized 3-month career roadmap for a user named {username}.
 
     USER'S PROFILE:
-    Current Skills: {', '.join(skills_list)}
+    Current Skills: {skills}
     Stated Career Goal: {career_goal}
 
     INSTRUCTIONS:
@@ -245,80 +474,129 @@ def generate_roadmap(username, profile_data, skills_list):
         2. A bulleted list of specific technical skills or topics to learn.
         3. A suggestion for a small project to apply those skills.
     - **Format your entire response using simple Markdown.** Use headings for each month (e.g., "### Month 1: Foundation") and bullet points for lists.
+    """, PROMPT_TOKEN_BUDGET, **_profile_sections(username, profile_data, skills_list))
+
+
+@instrument_gemini
+def generate_roadmap(username, profile_data, skills_list, regenerate=False):
     """
+    Generates a personalized career roadmap using the Gemini model
+    and converts it from Markdown to HTML. With regenerate, a cached answer
+    for the same prompt isn't reused.
+    """
+    if not skills_list:
+        # Returning a dictionary is better for handling errors in the route
+        return {"error": "Cannot generate a roadmap without skills. Please analyze a resume first."}
+
+    prompt = _roadmap_prompt(username, profile_data, skills_list)
 
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash') # Corrected to a standard model name
-        response = model.generate_content(prompt)
-        
-        # 1. Get the raw Markdown text from the AI
-        raw_markdown_text = response.text
+        # 1. Get the raw Markdown text from the AI (served from the cache for repeat prompts)
+        raw_markdown_text = _generate_text(prompt, 'gemini-2.5-flash', refresh=regenerate)
         
         # 2. Convert the Markdown to HTML
-        html_output = markdown.markdown(raw_markdown_text)
+        html_output = render_markdown(raw_markdown_text)
         
         print("Roadmap generated and converted to HTML successfully.")
         return html_output # Return the final HTML
 
     except Exception as e:
         print(f"An error occurred in generate_roadmap: {e}")
-        return "<p style='color:red;'>Error: Could not generate a roadmap at this time.</p>"
+        # A dict, like the no-skills case, so it is reported and never stored as a roadmap
+        return {"error": "Could not generate a roadmap at this time."}
 
 
+# Label: Similar Profiles
+# Before queueing a model call, the routes ask whether a user with a near-identical
+# skill set (Jaccard similarity >= IGNITE_SIMILARITY_THRESHOLD) already has an
+# answer: their skill gap minus the skills this user already has, or their roadmap
+# (same career goal) with this user's name in place of theirs. The index (and
+# NumPy) is loaded on the first lookup.
+_similar = None
+_similar_lock = threading.Lock()
 
-def generate_roadmap_and_challenges(username, profile_data, skills_list):
-    """
-    Generates a personalized roadmap (Markdown → HTML) 
-    and challenges (JSON) using two prompts.
-    """
 
-    if not skills_list:
-        return {
-            "error": "Cannot generate a roadmap without skills. Please analyze a resume first."
-        }
+def similar_results():
+    global _similar
+    if _similar is None:
+        with _similar_lock:
+            if _similar is None:
+                from similar_profiles import SimilarResults
+                _similar = SimilarResults(profile_store, skill_results, settings.similarity_threshold)
+    return _similar
 
-    career_goal = profile_data.get('careerPreferences') or "a more senior role in their field"
 
-    # ---------------- FIRST PROMPT (ROADMAP) ----------------
-    roadmap_prompt = f"""
-    You are an expert career coach named "Ignite." 
-    Your task is to create a detailed, personalized 3-month career roadmap for a user named {username}.
+def similar_stats():
+    return _similar.stats() if _similar is not None else {'lookups': 0, 'matches': 0}
 
-    USER'S PROFILE:
-    Current Skills: {', '.join(skills_list)}
-    Stated Career Goal: {career_goal}
 
-    INSTRUCTIONS:
-    - Create a step-by-step roadmap for the next 3 months.
-    - For each month, provide:
-        1. A primary focus (e.g., "Mastering Core Concepts").
-        2. A bulleted list of specific technical skills or topics to learn.
-        3. A suggestion for a small project to apply those skills.
-    - **Format your entire response using simple Markdown.**
+def similar_skill_gap(current_skills):
+    """A similar skill set's stored skill gap, adapted to these skills, or None."""
+    from similar_profiles import without_held
+
+    match = similar_results().nearest('skill_gap', current_skills)
+    if match is None:
+        return None
+    return without_held(match[2], current_skills) or None
+
+
+def similar_roadmap(username, profile_data, skills_list):
     """
+    (roadmap HTML, "neighbour@version") adapted from the roadmap of a user with a
+    similar skill set and the same career goal, or None.
+    """
+    from similar_profiles import FAILED_ROADMAP_PREFIX, goal_key, readdress_roadmap
 
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        roadmap_response = model.generate_content(roadmap_prompt)
+    # Never the user's own roadmap: they asked for a new one
+    match = similar_results().nearest('roadmap', skills_list, goal_key(profile_data.get('careerPreferences')),
+                                      exclude=lambda value: value[0] == username)
+    if match is None:
+        return None
+    neighbour, version = match[2]
+    roadmap_html = profile_store.load_artifact(neighbour, 'roadmap_html', version=version)
+    if not roadmap_html or roadmap_html.startswith(FAILED_ROADMAP_PREFIX):
+        return None
+    roadmap_html = readdress_roadmap(roadmap_html, neighbour, username)
+    if roadmap_html is None:
+        return None
+    return roadmap_html, f"{neighbour}@{version}"
 
-        # Raw Markdown text
-        roadmap_md = roadmap_response.text
 
-        # Convert Markdown → HTML
-        roadmap_html = markdown.markdown(roadmap_md)
+# Label: Roadmap + Challenges Pipeline
+# The roadmap and the challenges used to be two back-to-back model calls with the
+# Markdown conversion in between. By default the challenges are now generated
+# speculatively from the same profile, in parallel with the roadmap, so the
+# roadmap HTML is ready after one round trip. mode="sequential" keeps the old
+# behaviour of deriving the challenges from the finished roadmap text.
 
-    except Exception as e:
-        print(f"Error in roadmap generation: {e}")
-        return {"error": "Could not generate roadmap"}
+CHALLENGES_JSON_CONFIG = {"response_mime_type": "application/json"}
 
-    # ---------------- SECOND PROMPT (CHALLENGES) ----------------
-    challenges_prompt = f"""
-    You are a challenge generator.
+_pipeline_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='roadmap-pipeline')
+
+
+def _challenges_prompt(username, profile_data, skills_list, roadmap_md=None):
+    if roadmap_md:
+        # The roadmap is by far the largest input; its headings and bullets are what matter
+        sections = {'username': Section(username, 16),
+                    'roadmap': Section(roadmap_md, ROADMAP_MAX_TOKENS, 'markdown')}
+        source = """
     Below is the 3-month roadmap for {username}:
 
-    {roadmap_md}
+    {roadmap}
+
+    Summarize this roadmap into JSON challenges."""
+    else:
+        sections = _profile_sections(username, profile_data, skills_list)
+        source = """
+    {username} is following a 3-month career roadmap.
+    Current Skills: {skills}
+    Stated Career Goal: {career_goal}
+
+    Create weekly practical challenges for that roadmap, building from their current skills toward the goal."""
 
-    Summarize this roadmap into JSON challenges.
+    return build_prompt('challenges', """
+    You are a challenge generator.
+    """ + source + """
     Rules:
     - Strictly output valid JSON (no explanations, no extra text).
     - Structure:
@@ -335,17 +613,104 @@ def generate_roadmap_and_challenges(username, profile_data, skills_list):
       "Month 2": [...],
       "Month 3": [...]
     }}
+    """, PROMPT_TOKEN_BUDGET, **sections)
+
+
+def _parse_challenges(text):
+    """
+    Parses the challenges JSON, tolerating Markdown code fences or stray text
+    around the object. Raises ValueError if no usable object is found.
     """
+    data = loads_json(text)
+    if not isinstance(data, dict) or not all(isinstance(v, list) for v in data.values()):
+        raise ValueError("Challenges JSON does not map months to lists")
+    return data
 
+
+@instrument_gemini
+def generate_challenges(username, profile_data, skills_list, roadmap_md=None):
+    """
+    Generates weekly challenges as JSON. Without roadmap_md they are derived from
+    the profile alone, so this can run at the same time as the roadmap call.
+    """
+    prompt = _challenges_prompt(username, profile_data, skills_list, roadmap_md)
     try:
-        challenges_response = model.generate_content(challenges_prompt)
-        challenges_json = json.loads(challenges_response.text)
+        return _parse_challenges(_generate_text(prompt, 'gemini-2.5-flash', CHALLENGES_JSON_CONFIG))
     except Exception as e:
         print(f"Error in challenges generation: {e}")
-        challenges_json = {"error": "Could not generate challenges"}
 
-    # ---------------- RETURN BOTH ----------------
+    # One retry, bypassing the cache, before giving up on the challenges
+    try:
+        return _parse_challenges(client.generate(prompt, 'gemini-2.5-flash', CHALLENGES_JSON_CONFIG))
+    except Exception as e:
+        print(f"Retry of challenges generation failed: {e}")
+        return {"error": "Could not generate challenges"}
+
+
+def generate_roadmap_and_challenges(username, profile_data, skills_list, mode="parallel"):
+    """
+    Generates a personalized roadmap (Markdown → HTML) 
+    and challenges (JSON) using two prompts.
+    """
+
+    if not skills_list:
+        return {
+            "error": "Cannot generate a roadmap without skills. Please analyze a resume first."
+        }
+
+    roadmap_prompt = _roadmap_prompt(username, profile_data, skills_list)
+
+    # Start the challenges right away unless they must be derived from the roadmap
+    challenges_future = None
+    if mode != "sequential":
+        challenges_future = _pipeline_pool.submit(contextvars.copy_context().run, generate_challenges,
+                                                  username, profile_data, skills_list)
+
+    try:
+        roadmap_md = _generate_text(roadmap_prompt, 'gemini-2.5-flash')
+        # Runs while the challenges call is still in flight
+        roadmap_html = render_markdown(roadmap_md)
+    except Exception as e:
+        print(f"Error in roadmap generation: {e}")
+        return {"error": "Could not generate roadmap"}
+
+    if challenges_future is None:
+        challenges_json = generate_challenges(username, profile_data, skills_list, roadmap_md)
+    else:
+        challenges_json = challenges_future.result()
+
     return {
         "roadmap_html": roadmap_html,
         "challenges": challenges_json
-    }
\ No newline at end of file
+    }
+
+
+def stream_roadmap_and_challenges(username, profile_data, skills_list, regenerate=False):
+    """
+    Streaming mode of the pipeline. Yields (event, data) tuples:
+    ("roadmap_chunk", markdown text) as the model produces it, then
+    ("roadmap_html", full HTML), then ("challenges", JSON) - the challenges
+    are generated speculatively while the roadmap is still streaming.
+    With regenerate, a cached roadmap for the same prompt isn't reused.
+    """
+    if not skills_list:
+        yield "error", "Cannot generate a roadmap without skills. Please analyze a resume first."
+        return
+
+    challenges_future = _pipeline_pool.submit(contextvars.copy_context().run, generate_challenges,
+                                              username, profile_data, skills_list)
+
+    parts = []
+    try:
+        for chunk in _stream_text(_roadmap_prompt(username, profile_data, skills_list), 'gemini-2.5-flash',
+                                  refresh=regenerate):
+            parts.append(chunk)
+            yield "roadmap_chunk", chunk
+    except Exception as e:
+        print(f"Error in roadmap generation: {e}")
+        challenges_future.cancel()
+        yield "error", "Could not generate roadmap"
+        return
+
+    yield "roadmap_html", render_markdown("".join(parts))
+    yield "challenges", challenges_future.result()
@@ -1,43 +1,294 @@
-import json
-import os
-import glob
-import PyPDF2
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from Chatbot import recommend_future, generate_skill_gap, generate_roadmap, get_gemini_response, parse_resume_with_gemini
-import markdown
+import gzip
+import hmac
+import importlib
+import threading
+import time
+import uuid
+from flask import (Flask, Response, make_response, render_template, request, redirect, url_for, flash, session, jsonify,
+                   stream_with_context, g)
+from Chatbot import (recommend_future, generate_skill_gap, generate_roadmap, generate_challenges, get_gemini_response,
+                     parse_resume_with_gemini, stream_gemini_response, stream_roadmap_and_challenges, LLM_ONLY_FIELDS,
+                     skill_results, response_cache, client as gemini_client, chat_sessions, chat_profile_summary,
+                     similar_roadmap, similar_skill_gap, similar_stats, scheduler)
+from fair_scheduler import BATCH, INTERACTIVE, set_caller
+from profile_store import VersionConflictError, profile_store, load_profile_data_for_user
+from user_store import user_store
+from jobs import JobQueue, QueueFullError
+from page_cache import PageCache
+import metrics
+from streaming import IncrementalMarkdown, SSE_HEADERS, sse_event
+from pdf_extract import ExtractionError, MAX_UPLOAD_BYTES, extract_text, spool_upload, text_fingerprint
+from skill_extractor import extract_profile_fields
+from static_assets import IMMUTABLE_CACHE_CONTROL, static_assets
+from settings import get_settings
+
+settings = get_settings()
 
 app = Flask(__name__)
 app.secret_key = '123'
+# Reject oversized requests before the body is read (a little headroom for the form fields)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
 
-JSON_FILE = 'users.json'
+# Label: App Factory and Startup
+# Importing this module only defines the app; nothing slow happens at import.
+# The Gemini library, PyPDF2 and python-markdown are loaded on first use, and the
+# one-time startup work runs in create_app() (or, for servers pointed straight at
+# app:app, before the first request). Run WSGI servers with the factory, e.g.
+#   gunicorn 'app:create_app()'
+# and set IGNITE_WARM_UP=1 to pay the first-use costs at startup instead of in
+# the first requests.
 
-# Label: Utility Functions (No changes needed here)
-def load_users():
-    try:
-        with open(JSON_FILE, 'r') as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+WARM_UP_MODULES = ('markdown', 'PyPDF2', 'numpy')
 
-def save_users(users):
-    with open(JSON_FILE, 'w') as file:
-        json.dump(users, file, indent=4)
+_started = False
+_startup_lock = threading.Lock()
 
-def load_profile_data_for_user(username: str):
-    """Finds and loads the latest resume JSON data for the logged-in user."""
-    try:
-        search_pattern = os.path.join('parsed_resumes', f'{username}_*.json')
-        user_files = glob.glob(search_pattern)
-        if not user_files:
-            return None
-        # Find the most recently modified file
-        latest_file = max(user_files, key=os.path.getctime)
-        with open(latest_file, 'r') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        print(f"Error loading profile data for {username}: {e}")
+
+def startup():
+    """One-time startup work, safe to call more than once."""
+    global _started
+    if _started:
+        return
+    with _startup_lock:
+        if not _started:
+            # One-time import of the old parsed_resumes/*.json files into the profile store
+            profile_store.migrate_legacy_files(user_store.usernames())
+            # Hashed CSS/JS into memory (built here if the sources changed since the last build)
+            static_assets.load()
+            _started = True
+
+
+# Covers servers that import app:app directly instead of calling create_app()
+app.before_request(startup)
+
+
+def warm_up():
+    """Does the first-use initialization (model client, PDF reader, Markdown) ahead of any request."""
+    started = time.perf_counter()
+    gemini_client.warm_up()
+    for module in WARM_UP_MODULES:
+        importlib.import_module(module)
+    print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+def create_app(warm=None):
+    """Returns the app after the startup work; warm=None follows IGNITE_WARM_UP."""
+    startup()
+    if settings.warm_up if warm is None else warm:
+        warm_up()
+    return app
+
+
+# Label: Utility Functions
+# users.json access goes through user_store (cached reads, atomic writes).
+
+# Rendered /dashboard and /roadmap pages, keyed by user + profile version
+page_cache = PageCache(max_entries=settings.page_cache_size)
+
+
+def cached_page_response(page, username, state, render):
+    """
+    Serves a per-user page from the page cache with ETag / Last-Modified headers,
+    answering 304 Not Modified when the browser already has this version.
+    """
+    # The page links the hashed CSS/JS, so a new asset build is a new page
+    cached = page_cache.render(page, username, [state, static_assets.version], render)
+    gzipped = bool(settings.gzip_level and request.accept_encodings['gzip'])
+    response = make_response(cached.gzipped(settings.gzip_level) if gzipped else cached.html)
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(cached.etag, weak=gzipped)
+    response.last_modified = cached.last_modified
+    # Per-user content: the browser may keep it but must revalidate; shared caches must not
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+# Label: Request Instrumentation
+# Every request is timed into a per-route histogram (labelled by the URL rule, not
+# the raw path, to keep the series count bounded); a sampled share is traced too.
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace_token = metrics.start_trace(f"{request.method} {request.path}")
+
+
+# Label: Fair-Share Scheduling
+# Model calls made while handling a request (or by the jobs it starts) are
+# scheduled and accounted for as this user's; anonymous chat as the client's
+# address. Chat is interactive, everything else is batch. The caller is set on
+# every request, so a reused worker thread never keeps the previous one.
+INTERACTIVE_ENDPOINTS = {'chat', 'chat_stream'}
+
+
+@app.before_request
+def identify_caller():
+    caller = session.get('username') or f"ip:{request.remote_addr}"
+    set_caller(caller, INTERACTIVE if request.endpoint in INTERACTIVE_ENDPOINTS else BATCH)
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, elapsed)
+        metrics.finish_trace(g.pop('trace_token', None), elapsed, status=response.status_code)
+    return response
+
+
+# Label: Static Assets and Compression
+# CSS and JS are served from memory under content-hashed names (see
+# static_assets.py), cached by browsers and CDNs for a year; the pages link them
+# with asset_url(). Dynamic HTML and JSON responses are gzipped when the client
+# accepts it. Streamed responses (SSE, chat streams) are left alone so each
+# event still goes out as soon as it is written.
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json', 'text/plain'}
+
+
+@app.template_global()
+def asset_url(name):
+    """URL of a static asset by its source name ('css/login.css'): the hashed build, or /static/ until built."""
+    built = static_assets.built_name(name)
+    if built is None:
+        return url_for('static', filename=name)
+    return url_for('built_asset', filename=built)
+
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    selected = static_assets.select(filename, request.accept_encodings)
+    if selected is None:
+        return Response('Not found', status=404, mimetype='text/plain')
+    asset, encoding = selected
+    response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.set_etag(f"{asset.etag}-{encoding}")
+    return response.make_conditional(request)
+
+
+@app.after_request
+def compress_response(response):
+    if (not settings.gzip_level or response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip'] or response.calculate_content_length() < settings.gzip_min_bytes:
+        return response
+    response.set_data(gzip.compress(response.get_data(), compresslevel=settings.gzip_level))
+    response.headers['Content-Encoding'] = 'gzip'
+    # The compressed bytes differ from the ones a strong ETag named
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def app_gauges():
+    queue = job_queue.stats()
+    cache = response_cache.stats()
+    pages = page_cache.stats()
+    chats = chat_sessions.stats()
+    similar = similar_stats()
+    scheduling = scheduler.stats()
+    client_stats = gemini_client.stats()
+    breaker = client_stats.get('breaker', {})
+    return [
+        ('ignite_jobs_pending', 'Background jobs queued or running.', queue['pending']),
+        ('ignite_gemini_in_flight', 'Gemini requests currently in flight.', gemini_client.in_flight),
+        ('ignite_gemini_retries', 'Gemini calls retried since start.', client_stats['retries']),
+        ('ignite_gemini_hedges', 'Hedged second requests sent since start.', client_stats['hedges']),
+        ('ignite_gemini_circuit_open', '1 while the Gemini circuit breaker is open.',
+         1 if breaker.get('state') == 'open' else 0),
+        ('ignite_response_cache_stale_served', 'Stale answers served because Gemini failed.',
+         cache['stale_served']),
+        ('ignite_response_cache_hits', 'Gemini response cache hits.', cache['hits']),
+        ('ignite_response_cache_misses', 'Gemini response cache misses.', cache['misses']),
+        ('ignite_page_cache_entries', 'Rendered pages held in memory.', pages['entries']),
+        ('ignite_chat_sessions', 'Chat sessions held in memory.', chats['sessions']),
+        ('ignite_chat_sessions_evicted', 'Chat sessions dropped to stay under the cap.', chats['evicted']),
+        ('ignite_similar_lookups', 'Similar-profile lookups before a model call.', similar['lookups']),
+        ('ignite_similar_reused', 'Skill gaps / roadmaps reused from a similar profile.', similar['matches']),
+        ('ignite_scheduler_waiting', 'Model calls waiting for a fair-share slot.', scheduling['waiting']),
+        ('ignite_scheduler_throttled', 'Model calls delayed by a user token bucket.', scheduling['throttled']),
+        ('ignite_scheduler_refused', 'Model calls refused for being over a user rate.', scheduling['refused']),
+    ]
+
+
+def metrics_access_error():
+    """
+    None if the request may read /metrics: an admin's session, or the scraper's
+    'Authorization: Bearer <IGNITE_METRICS_TOKEN>'. Otherwise the error response.
+    """
+    token = settings.metrics_token
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
         return None
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if session['username'] not in settings.admin_users:
+        return jsonify({'error': 'Forbidden'}), 403
+    return None
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (admins, or IGNITE_METRICS_TOKEN)."""
+    error = metrics_access_error()
+    if error is not None:
+        return error
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/metrics/traces')
+def recent_traces():
+    """The most recent sampled request traces (see IGNITE_TRACE_SAMPLE_RATE). Same access as /metrics."""
+    error = metrics_access_error()
+    if error is not None:
+        return error
+    return jsonify(list(metrics.recent_traces))
+
+
+@app.route('/admin/cohort')
+def cohort_summary():
+    """
+    Skill frequencies, co-occurrence and skill-gap distribution across every
+    user's latest profile (?top=N rows each). Admins only (IGNITE_ADMIN_USERS).
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if session['username'] not in settings.admin_users:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    # Imported here so NumPy isn't loaded by workers that never serve this page
+    from cohort_analytics import cohort
+    top = min(max(request.args.get('top', 20, type=int), 1), 200)
+    return jsonify(cohort.summary(top))
+
+
+@app.route('/usage')
+def my_usage():
+    """The logged-in user's model calls, tokens and estimated cost (this worker process)."""
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    return jsonify(scheduler.usage(session['username']))
+
+
+@app.route('/admin/usage')
+def usage_summary():
+    """The top users (?top=N) by estimated model cost, and the scheduler's counters. Admins only."""
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if session['username'] not in settings.admin_users:
+        return jsonify({'error': 'Forbidden'}), 403
+    top = min(max(request.args.get('top', 20, type=int), 1), 200)
+    return jsonify({'users': scheduler.usage(top=top), 'scheduler': scheduler.stats()})
+
 
 # Label: Core App Routes (Login, Register, Logout)
 @app.route('/')
@@ -49,8 +300,7 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        users = load_users()
-        if username in users and users[username]['password'] == password:
+        if user_store.check_password(username, password):
             session['username'] = username
             flash(f'Welcome, {username}! You have successfully logged in.', 'success')
             return redirect(url_for('dashboard'))
@@ -63,13 +313,10 @@ def register():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        users = load_users()
-        if username in users:
+        if not user_store.create(username, {'password': password}):
             flash('Username already exists. Please choose a different one.', 'danger')
             return redirect(url_for('register'))
         else:
-            users[username] = {'password': password}
-            save_users(users)
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
     return render_template('register.html')
@@ -77,6 +324,9 @@ def register():
 @app.route('/logout')
 def logout():
     session.pop('username', None)
+    chat_id = session.pop('chat_id', None)
+    if chat_id is not None:
+        chat_sessions.end(chat_id)
     flash('You have been successfully logged out.', 'success')
     return redirect(url_for('login'))
 
@@ -91,94 +341,293 @@ def dashboard():
         return redirect(url_for('login'))
 
     username = session['username']
-    users = load_users()
-    user = users.get(username, {})
+    user = user_store.get(username) or {}
     
     # --- Fast Operation: Load existing data ---
     # We only read the profile data from the file. No slow API calls here.
     profile_data = load_profile_data_for_user(username) or {}
 
-    # Get recommendations that were previously saved by another process (like '/generate')
-    future_recommendations = profile_data.get('missing_skills', [])
+    # Get recommendations that were previously saved by another process (like '/generate'),
+    # or the precomputed answer shared by everyone with the same skill set
+    future_recommendations = profile_data.get('missing_skills')
+    if not future_recommendations and profile_data.get('skills'):
+        future_recommendations = skill_results.lookup('skill_gap', profile_data['skills'])
+    future_recommendations = future_recommendations or []
     
-    # --- Render the page immediately ---
-    return render_template(
+    # --- Render the page immediately (or not at all, if nothing changed) ---
+    state = {
+        'profile': profile_store.latest_stamp(username),
+        'user': user_store.record_stamp(username),
+        'missing_skills': future_recommendations,
+    }
+    return cached_page_response('dashboard', username, state, lambda: render_template(
         'dashboard.html',
         username=username,
         user=user,
         profile_data=profile_data,
         future_recommendations=future_recommendations
-    )
+    ))
 
-# Label: Asynchronous Data Generation Routes (These are meant to be slow)
-# These routes are called by JavaScript in the background after the page has loaded.
+# Label: Background Job Workers
+# The slow work (Gemini calls, PDF parsing) runs on the job queue. Each worker
+# returns (payload, status) just like a route would; /jobs/<id> hands it back.
 
-@app.route('/generate', methods=['POST'])
-def generate():
+job_queue = JobQueue(
+    max_workers=settings.job_workers,
+    max_pending=settings.job_queue_depth,
+)
+metrics.REGISTRY.register_gauges(app_gauges)
+
+
+def save_skill_gap(username, version, missing_skills):
     """
-    Generates the skill gap analysis. Called by JavaScript, not during page load.
+    Writes the skill gap onto the profile version its skills came from. False if
+    the user has no profile; a newer upload meanwhile leaves it unsaved.
     """
-    if 'username' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+    try:
+        if profile_store.patch(username, {'missing_skills': missing_skills}, expected_version=version) is None:
+            return False
+    except VersionConflictError:
+        # A new resume was uploaded meanwhile; this answer belongs to the old skills
+        return True
+    page_cache.invalidate(username)
+    return True
 
-    username = session['username']
-    profile_data = load_profile_data_for_user(username)
-    if not profile_data:
-        return jsonify({'error': 'Profile data not found. Please upload a resume first.'}), 404
+
+def run_skill_gap_job(username):
+    latest = profile_store.load_latest_versioned(username)
+    if not latest:
+        return {'error': 'Profile data not found. Please upload a resume first.'}, 404
+    version, profile_data = latest
 
     current_skills = profile_data.get('skills', [])
     
     # 1. Slow API call happens here, in the background
     missing_skills = generate_skill_gap(current_skills)
 
-    # 2. Slow file write happens here
-    profile_data['missing_skills'] = missing_skills
+    # 2. Write only the new key, and only onto the version the skills came from
+    if not save_skill_gap(username, version, missing_skills):
+        return {'error': 'Could not find a profile file to save to.'}, 404
+
+    # 3. Return the new skills to the front end
+    return {'skills': missing_skills}
+
+
+def run_roadmap_job(username, regenerate=False):
+    latest = profile_store.load_latest_versioned(username)
+    if not latest:
+        return {'error': 'Profile data not found. Please upload a resume first.'}, 404
+    version, profile_data = latest
+
+    skills_list = profile_data.get('skills', [])
     
-    # Find the latest file to overwrite it
-    search_pattern = os.path.join('parsed_resumes', f'{username}_*.json')
-    user_files = glob.glob(search_pattern)
-    if not user_files:
-        return jsonify({'error': 'Could not find a profile file to save to.'}), 404
+    # Slow API call for the roadmap
+    roadmap_html = generate_roadmap(username=username, profile_data=profile_data, skills_list=skills_list,
+                                    regenerate=regenerate)
+    if isinstance(roadmap_html, dict):
+        # No skills to plan from, or the model call failed: the job fails and nothing is stored
+        return roadmap_html, 400 if not skills_list else 502
     
-    latest_file = max(user_files, key=os.path.getctime)
-    with open(latest_file, 'w') as f:
-        json.dump(profile_data, f, indent=4)
+    # Save the generated roadmap next to the profile version it was made for
+    # (no longer one reused from a similar user, so it may be handed on itself)
+    try:
+        if profile_store.put_artifacts(username, {'roadmap_html': roadmap_html, 'roadmap_reused_from': None},
+                                       expected_version=version) is None:
+            return {'error': 'Could not find a profile file to save to.'}, 404
+    except VersionConflictError:
+        return {'roadmap_html': roadmap_html}
+    page_cache.invalidate(username)
+        
+    return {'roadmap_html': roadmap_html}
+
 
-    # 3. Return the new skills as a JSON response to the front end
-    return jsonify({'skills': missing_skills})
+def wants_regenerate():
+    """The user pressed "Re-Generate My Roadmap": a similar user's roadmap won't do."""
+    return request.args.get('regenerate') == '1'
+
+
+def reuse_similar_roadmap(username, version, profile_data):
+    """
+    Saves and returns a roadmap adapted from a similar user's, or None. It is
+    marked as reused, so it is never itself handed on to another user.
+    """
+    skills_list = profile_data.get('skills', [])
+    reused = similar_roadmap(username, profile_data, skills_list) if skills_list else None
+    if reused is None:
+        return None
+    roadmap_html, source = reused
+    try:
+        profile_store.put_artifacts(username, {'roadmap_html': roadmap_html, 'roadmap_reused_from': source},
+                                    expected_version=version)
+        page_cache.invalidate(username)
+    except VersionConflictError:
+        pass
+    return roadmap_html
+
+
+def run_challenges_job(username):
+    profile_data = load_profile_data_for_user(username)
+    if not profile_data:
+        return {'error': 'Profile data not found. Please upload a resume first.'}, 404
+
+    skills_list = profile_data.get('skills', [])
+    if not skills_list:
+        return {'error': 'Cannot generate challenges without skills. Please analyze a resume first.'}, 400
+
+    # Derived from the profile, not the roadmap text, so it can run alongside the roadmap job
+    return {'challenges': generate_challenges(username, profile_data, skills_list)}
+
+
+def save_parsed_profile(username, parsed_data, fingerprint):
+    """
+    Stores a parsed resume as the user's latest profile, named after its primary skill,
+    and returns its version. Re-uploading the resume that is already the latest
+    version does not add a new one.
+    """
+    if profile_store.latest_fingerprint(username) == fingerprint:
+        return profile_store.latest_version(username)
+    skills_list = parsed_data.get('skills', [])
+    primary_skill = skills_list[0].replace('c++', 'cpp').replace('c#', 'csharp') if skills_list else 'no_skill_found'
+    json_filename = f"{username}_{primary_skill}.json"
+
+    # Each upload becomes a new version in the profile store
+    version = profile_store.save(username, parsed_data, source=json_filename, fingerprint=fingerprint)
+    page_cache.invalidate(username)
+    return version
+
+
+def upload_complete_response(parsed_data, timings):
+    return {
+        "message": f"Analysis complete for '{parsed_data.get('name', '')}'.",
+        "analysis": parsed_data,
+        "timings": timings
+    }
+
+
+def run_enrichment_job(username, version, resume_text, fingerprints):
+    """
+    Background half of an upload: asks Gemini only for the fields the local
+    extractor cannot derive (name, experience) and merges them into the profile.
+    """
+    local_fields = extract_profile_fields(resume_text)
+    enriched = parse_resume_with_gemini(resume_text, fields=LLM_ONLY_FIELDS)
+    if "error" in enriched:
+        return enriched, 500
+
+    # The deterministic local fields win over anything the model returned for them
+    parsed_data = dict(enriched, **local_fields)
+    try:
+        profile_store.patch(username, parsed_data, expected_version=version)
+        page_cache.invalidate(username)
+    except VersionConflictError:
+        pass  # Superseded by a newer upload; the parse is still worth remembering
+    profile_store.remember_parse(fingerprints, parsed_data)
+    return upload_complete_response(parsed_data, {})
+
+
+def job_links(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('job_status', job_id=job.id)
+    }
+
+
+def queue_full_response():
+    return jsonify({'error': 'The server is busy. Please try again in a moment.'}), 503, {'Retry-After': '5'}
+
+
+def submit_job(kind, fn, *args, dedup_key=None):
+    """Queues a job for the logged-in user and answers 202 with where to poll for it."""
+    try:
+        job = job_queue.submit(kind, fn, *args, owner=session['username'], dedup_key=dedup_key)
+    except QueueFullError:
+        return queue_full_response()
+    return jsonify(job_links(job)), 202
+
+
+# Label: Asynchronous Data Generation Routes (These are meant to be slow)
+# These routes are called by JavaScript in the background after the page has loaded.
+# They return a job id immediately; clicking twice while a job runs reuses that job.
+
+@app.route('/generate', methods=['POST'])
+def generate():
+    """
+    Queues the skill gap analysis. Called by JavaScript, not during page load.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    username = session['username']
+
+    # Most skill sets have been answered before (or pre-warmed): no job, no model call
+    latest = profile_store.load_latest_versioned(username)
+    if latest and latest[1].get('skills'):
+        version, profile_data = latest
+        missing_skills = skill_results.lookup('skill_gap', profile_data['skills'])
+        if missing_skills is None:
+            # ...or a near-identical set has: reuse its answer, minus the skills this user has
+            missing_skills = similar_skill_gap(profile_data['skills'])
+        if missing_skills is not None:
+            # Stored like a generated answer, so the dashboard and cohort analytics see it
+            save_skill_gap(username, version, missing_skills)
+            return jsonify({'skills': missing_skills})
+
+    return submit_job('skill_gap', run_skill_gap_job, username, dedup_key=('skill_gap', username))
 
 
 @app.route('/generate_roadmap_data', methods=['POST'])
 def generate_roadmap_data():
     """
-    Generates the learning roadmap. Called by JavaScript.
+    Queues the learning roadmap generation. Called by JavaScript.
     """
     if 'username' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     username = session['username']
-    profile_data = load_profile_data_for_user(username)
-    if not profile_data:
-        return jsonify({'error': 'Profile data not found. Please upload a resume first.'}), 404
+    regenerate = wants_regenerate()
+    latest = profile_store.load_latest_versioned(username)
+    if latest and not regenerate:
+        roadmap_html = reuse_similar_roadmap(username, *latest)
+        if roadmap_html is not None:
+            return jsonify({'roadmap_html': roadmap_html})
+    return submit_job('roadmap', run_roadmap_job, username, regenerate, dedup_key=('roadmap', username))
 
-    skills_list = profile_data.get('skills', [])
-    
-    # Slow API call for the roadmap
-    roadmap_html = generate_roadmap(username=username, profile_data=profile_data, skills_list=skills_list)
-    
-    # Save the generated roadmap to the user's profile file
-    profile_data['roadmap_html'] = roadmap_html
-    
-    search_pattern = os.path.join('parsed_resumes', f'{username}_*.json')
-    user_files = glob.glob(search_pattern)
-    if not user_files:
-        return jsonify({'error': 'Could not find a profile file to save to.'}), 404
-    
-    latest_file = max(user_files, key=os.path.getctime)
-    with open(latest_file, 'w') as f:
-        json.dump(profile_data, f, indent=4)
-        
-    return jsonify({'roadmap_html': roadmap_html})
+
+@app.route('/generate_roadmap_challenges', methods=['POST'])
+def generate_roadmap_challenges():
+    """
+    Starts the roadmap and its challenges as two parallel jobs, so the page can show
+    the roadmap HTML as soon as it is ready instead of waiting for the challenges.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    username = session['username']
+    try:
+        roadmap_job = job_queue.submit('roadmap', run_roadmap_job, username,
+                                       owner=username, dedup_key=('roadmap', username))
+        challenges_job = job_queue.submit('challenges', run_challenges_job, username,
+                                          owner=username, dedup_key=('challenges', username))
+    except QueueFullError:
+        return queue_full_response()
+
+    return jsonify({'roadmap': job_links(roadmap_job), 'challenges': job_links(challenges_job)}), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Reports a background job's status, and its result once it has finished.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    job = job_queue.get(job_id)
+    if job is None or job.owner != session['username']:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(job.to_dict()), 200 if job.finished else 202
 
 
 # Label: Resume Upload and Analysis
@@ -195,38 +644,69 @@ def upload_resume():
         return jsonify({"error": "No file selected"}), 400
 
     if file:
+        # The request stream is gone once we return, so spool it to disk before queueing
         try:
-            pdf_reader = PyPDF2.PdfReader(file.stream)
-            resume_text = "".join(page.extract_text() for page in pdf_reader.pages)
-            
-            if not resume_text.strip():
-                return jsonify({"error": "Could not extract text from PDF."}), 400
+            upload = spool_upload(file.stream)
+        except ExtractionError as e:
+            return jsonify({"error": str(e)}), 400
+
+        username = session['username']
+
+        # Fast path: this exact file was parsed before (by anyone), so skip extraction and Gemini
+        parsed_data = profile_store.lookup_parse(upload.fingerprint)
+        if parsed_data is not None:
+            upload.discard()
+            save_parsed_profile(username, parsed_data, upload.fingerprint)
+            return jsonify(upload_complete_response(parsed_data, {'spool_ms': round(upload.spool_ms, 2)}))
+
+        dedup_key = ('upload', username, upload.sha256)
+        running = job_queue.inflight(dedup_key)
+        if running is not None:
+            # Same file is already being analysed; don't keep a second copy around
+            upload.discard()
+            return jsonify(job_links(running)), 202
 
-            parsed_data = parse_resume_with_gemini(resume_text)
-
-            if "error" in parsed_data:
-                return jsonify(parsed_data), 500
-            
-            username = session['username']
-            skills_list = parsed_data.get('skills', [])
-            primary_skill = skills_list[0].replace('c++', 'cpp').replace('c#', 'csharp') if skills_list else 'no_skill_found'
-            json_filename = f"{username}_{primary_skill}.json"
-            
-            save_dir = 'parsed_resumes'
-            os.makedirs(save_dir, exist_ok=True)
-            save_path = os.path.join(save_dir, json_filename)
+        try:
+            extraction = extract_text(upload.path)
+        except ExtractionError as e:
+            return jsonify({"error": str(e)}), 400
+        finally:
+            upload.discard()
+        resume_text = extraction.text
+        timings = dict(extraction.timings, spool_ms=round(upload.spool_ms, 2))
+
+        if not resume_text.strip():
+            return jsonify({"error": "Could not extract text from PDF."}), 400
+
+        # A different file with the same text (e.g. re-exported PDF) was parsed before
+        text_fp = text_fingerprint(resume_text)
+        parsed_data = profile_store.lookup_parse(text_fp)
+        if parsed_data is not None:
+            profile_store.remember_parse([upload.fingerprint], parsed_data)
+            save_parsed_profile(username, parsed_data, upload.fingerprint)
+            return jsonify(upload_complete_response(parsed_data, timings))
+
+        # Skills, emails and phones come from the local extractor straight away;
+        # Gemini fills in name and experience in the background.
+        local_started = time.perf_counter()
+        parsed_data = extract_profile_fields(resume_text)
+        timings['local_extract_ms'] = round((time.perf_counter() - local_started) * 1000, 3)
+        version = save_parsed_profile(username, parsed_data, upload.fingerprint)
 
-            with open(save_path, 'w') as json_file:
-                json.dump(parsed_data, json_file, indent=4)
-            
-            return jsonify({
-                "message": f"Analysis complete for '{parsed_data.get('name', '')}'.",
-                "analysis": parsed_data 
-            })
-
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            return jsonify({"error": "An unexpected error occurred during processing."}), 500
+        try:
+            job = job_queue.submit('upload', run_enrichment_job, username, version, resume_text,
+                                   [upload.fingerprint, text_fp], owner=username, dedup_key=dedup_key)
+        except QueueFullError:
+            job = None
+
+        response = {
+            "message": f"Found {len(parsed_data['skills'])} skill(s) in your resume.",
+            "analysis": parsed_data,
+            "timings": timings
+        }
+        if job is not None:
+            response["enrichment"] = job_links(job)
+        return jsonify(response)
             
     return jsonify({"error": "File upload failed"}), 400
 
@@ -238,38 +718,123 @@ def update_profile():
     
     username = session['username']
     updated_data = request.get_json()
-    users = load_users()
+    user = user_store.update(username, updated_data)
     
-    if username in users:
-        users[username].update(updated_data)
-        save_users(users)
-        return jsonify({'success': True, 'message': 'Profile updated successfully!', 'user': users[username]})
+    if user is not None:
+        page_cache.invalidate(username)
+        return jsonify({'success': True, 'message': 'Profile updated successfully!', 'user': user})
     
     return jsonify({'success': False, 'error': 'User not found'}), 404
 
+def current_chat_session():
+    """This browser session's chat memory, started on its first message."""
+    chat_id = session.get('chat_id')
+    if chat_id is None:
+        chat_id = session['chat_id'] = uuid.uuid4().hex
+    return chat_sessions.get(chat_id, session.get('username'), chat_profile_summary)
+
+
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.get_json()
     user_message = data.get('message')
-    ai_response = get_gemini_response(user_message)
+    ai_response = get_gemini_response(user_message, current_chat_session())
     return jsonify({'response': ai_response})
 
+# Label: Streaming Routes (server-sent events)
+# Same work as /chat and /generate_roadmap_data, but the text is pushed to the
+# browser chunk by chunk as the model produces it.
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.get_json()
+    user_message = data.get('message')
+    chat_session = current_chat_session()
+
+    def events():
+        for chunk in stream_gemini_response(user_message, chat_session):
+            yield sse_event('token', {'text': chunk})
+        yield sse_event('done', {})
+
+    return sse_response(events())
+
+
+@app.route('/generate_roadmap_data/stream', methods=['POST'])
+def generate_roadmap_data_stream():
+    """
+    Streams the roadmap as HTML fragments (one per finished Markdown block), then
+    the challenges, which are generated in parallel while the roadmap streams.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    username = session['username']
+    latest = profile_store.load_latest_versioned(username)
+    if not latest:
+        return jsonify({'error': 'Profile data not found. Please upload a resume first.'}), 404
+    version, profile_data = latest
+
+    skills_list = profile_data.get('skills', [])
+    regenerate = wants_regenerate()
+    reused_html = None if regenerate else reuse_similar_roadmap(username, version, profile_data)
+
+    def events():
+        if reused_html is not None:
+            # A similar user's roadmap: sent whole, then only the challenges are generated
+            yield sse_event('roadmap_html', {'html': reused_html})
+            yield sse_event('roadmap_done', {})
+            yield sse_event('challenges', {'challenges': generate_challenges(username, profile_data, skills_list)})
+            yield sse_event('done', {})
+            return
+
+        renderer = IncrementalMarkdown()
+        for event, payload in stream_roadmap_and_challenges(username, profile_data, skills_list, regenerate):
+            if event == 'roadmap_chunk':
+                html = renderer.feed(payload)
+                if html:
+                    yield sse_event('roadmap_html', {'html': html})
+            elif event == 'roadmap_html':
+                tail = renderer.finish()
+                if tail:
+                    yield sse_event('roadmap_html', {'html': tail})
+                # Save the complete roadmap next to the profile version it was made for
+                try:
+                    profile_store.put_artifacts(username, {'roadmap_html': payload, 'roadmap_reused_from': None},
+                                                expected_version=version)
+                    page_cache.invalidate(username)
+                except VersionConflictError:
+                    pass
+                yield sse_event('roadmap_done', {})
+            elif event == 'challenges':
+                yield sse_event('challenges', {'challenges': payload})
+            else:
+                yield sse_event('error', {'error': payload})
+        yield sse_event('done', {})
+
+    return sse_response(events())
+
+
 @app.route('/roadmap')
 def roadmap():
     if 'username' not in session:
         return redirect(url_for('login'))
         
     username = session['username']
-    users = load_users()
-    user = users.get(username, {})
-    profile_data = load_profile_data_for_user(username)
-    
-    return render_template(
+    user = user_store.get(username) or {}
+
+    # The profile (with its roadmap HTML) is only loaded when the page must be re-rendered
+    state = {'profile': profile_store.latest_stamp(username), 'user': user_store.record_stamp(username)}
+    return cached_page_response('roadmap', username, state, lambda: render_template(
         'roadmap.html',
         username=username,
         user=user,
-        profile_data=profile_data
-    )
+        profile_data=load_profile_data_for_user(username),
+        roadmap_html=profile_store.load_artifact(username, 'roadmap_html')
+    ))
 
 # Legacy route stubs (can be developed or removed)
 @app.route('/generate_recommendations')
@@ -282,7 +847,12 @@ def generate_recommendations():
     skills_list = profile_data.get('skills', [])
 
     result = recommend_future(username, profile_data, skills_list)
-    return jsonify(result)
+    recommendations = result['recommendations']
+    if not recommendations:
+        return jsonify({'username': username, 'next_steps': 'No recommendation generated.'})
+    # The lists for the page's own rendering, plus the same lists as an HTML fragment
+    next_steps = render_template('recommendations_fragment.html', recommendations=recommendations)
+    return jsonify(dict(recommendations, username=username, next_steps=next_steps))
 
 @app.route("/recommendation")
 def recommendation():
@@ -290,4 +860,4 @@ def recommendation():
 
 # Main execution
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
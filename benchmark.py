@@ -0,0 +1,722 @@
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+# Label: Offline Benchmark Suite
+# Drives the real Flask app in-process with the Gemini backend swapped for
+# gemini_client.FakeBackend (configurable latency, jitter and failure rate), so
+# any change to app.py / Chatbot.py can be measured without an API key.
+#
+#   python benchmark.py corpus --scale 100k --data-dir bench-data
+#   python benchmark.py run --data-dir bench-data --concurrency 16 --iterations 10
+#
+# `corpus` writes a synthetic users.json and profile store (optionally also the
+# legacy parsed_resumes/*.json files) at 1k / 100k / 1M users. `run` logs in as
+# random corpus users and walks the login, dashboard, upload, generate, roadmap
+# and chat flows, then reports throughput and p50/p95/p99 latency per route.
+# Everything runs inside --data-dir, which is where the app's relative paths
+# (users.json, profiles.db, ...) resolve.
+#
+#   python benchmark.py resilience --tail-rate 0.05 --hedge-after 0.25
+#
+# `resilience` exercises GeminiClient directly: the same slow-tailed, flaky fake
+# backend with and without retries / hedging, then an outage with and without
+# the circuit breaker (stale cached answers vs. waiting on timeouts).
+#
+#   python benchmark.py startup --repeat 5
+#   python benchmark.py cohort --data-dir bench-data
+#   python benchmark.py fairness --users 6 --abusers 24
+#   python benchmark.py pages
+#
+# `startup` measures a worker's cold start in fresh interpreters: importing app,
+# create_app() and the first GET /login, with the heavy libraries loaded lazily
+# (the default), up front at import (as every worker used to), or by warm-up.
+# `cohort` times cohort_analytics over the corpus in --data-dir: the first build,
+# a full analytics pass, and an incremental refresh after a batch of new uploads.
+# `fairness` has one user flood the client with batch and chat calls while other
+# users chat, and compares their chat latency first come, first served and with
+# the fair-share scheduler. `pages` reports the bytes sent for a first and a
+# repeat view of the login, register and dashboard pages.
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+FLOWS = ('login', 'dashboard', 'upload', 'generate', 'roadmap', 'chat')
+CORPUS_META = 'bench-corpus.json'
+PASSWORD = 'benchmark'
+POLL_INTERVAL = 0.05
+
+FIRST_NAMES = ['Asha', 'Ben', 'Chen', 'Dara', 'Eli', 'Fatima', 'Goran', 'Hana', 'Ivan', 'Jia', 'Kofi', 'Lena']
+EXTRA_GAP_SKILLS = ['MLOps', 'System Design', 'Data Structures', 'Communication', 'Microservices']
+ROLES = ['Backend Developer', 'Data Analyst', 'Frontend Engineer', 'DevOps Engineer', 'ML Engineer', 'Student']
+
+
+def parse_scale(value: str) -> int:
+    value = value.strip().lower()
+    return SCALES[value] if value in SCALES else int(value)
+
+
+# --- Synthetic corpus ---
+def synthetic_profile(rng: random.Random, skills_pool: List[str]) -> Dict[str, Any]:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)}son"
+    years = rng.randint(0, 12)
+    profile = {
+        'name': name,
+        'emails': [f"{name.split()[0].lower()}{rng.randint(1, 9999)}@example.com"],
+        'phones': [f"+1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}"],
+        # A skewed draw, so popular skill sets repeat the way real ones do
+        'skills': sorted(set(rng.choices(skills_pool[:25], k=rng.randint(2, 5))
+                             + rng.sample(skills_pool, k=rng.randint(0, 2)))),
+        'experience': {'total_years': years, 'roles': [rng.choice(ROLES)] if years else []},
+    }
+    # Most users have generated a skill gap; a few answers name skills outside the master list
+    if rng.random() < 0.6:
+        gap = [skill for skill in rng.sample(skills_pool, k=4) if skill not in profile['skills']][:3]
+        profile['missing_skills'] = gap + (rng.sample(EXTRA_GAP_SKILLS, k=1) if rng.random() < 0.2 else [])
+    return profile
+
+
+def write_corpus(data_dir: str, users: int, legacy_files: bool = False, seed: int = 7,
+                 chunk: int = 10_000) -> Dict[str, Any]:
+    from profile_store import PROFILE_DB, PROFILE_DIR, ProfileStore
+    from skill_extractor import MASTER_SKILLS
+
+    os.makedirs(data_dir, exist_ok=True)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    # users.json is streamed out rather than built as one dict (1M users is ~100 MB)
+    with open(os.path.join(data_dir, 'users.json'), 'w') as out:
+        out.write('{')
+        for i in range(users):
+            record = {'password': PASSWORD, 'currentRole': rng.choice(ROLES), 'location': 'Remote'}
+            out.write(('' if i == 0 else ',') + json.dumps(f'user{i}') + ':' + json.dumps(record))
+        out.write('}')
+    users_s = time.perf_counter() - started
+
+    store = ProfileStore(db_path=os.path.join(data_dir, PROFILE_DB),
+                         legacy_dir=os.path.join(data_dir, PROFILE_DIR))
+    if legacy_files:
+        # The old layout, for measuring the migration / glob path
+        os.makedirs(store.legacy_dir, exist_ok=True)
+        for i in range(users):
+            profile = synthetic_profile(rng, MASTER_SKILLS)
+            primary = (profile['skills'] or ['no_skill_found'])[0].replace('c++', 'cpp').replace('c#', 'csharp')
+            with open(os.path.join(store.legacy_dir, f'user{i}_{primary}.json'), 'w') as f:
+                json.dump(profile, f)
+    else:
+        for start in range(0, users, chunk):
+            store.save_many({'username': f'user{i}', 'data': synthetic_profile(rng, MASTER_SKILLS),
+                             'source': 'benchmark'} for i in range(start, min(users, start + chunk)))
+        # Nothing to migrate; don't let the app glob for legacy files on startup
+        conn = store._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('legacy_migrated', ?)",
+                         (str(time.time()),))
+
+    meta = {'users': users, 'legacy_files': legacy_files, 'seed': seed,
+            'users_json_s': round(users_s, 2), 'total_s': round(time.perf_counter() - started, 2)}
+    with open(os.path.join(data_dir, CORPUS_META), 'w') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def resume_pdf(text: str) -> bytes:
+    """A minimal one-page PDF with the given text (Helvetica, no dependencies)."""
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    content = f"BT /F1 11 Tf 72 720 Td ({text}) Tj ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+# --- Fake Gemini answers shaped like the real ones ---
+def fake_responder(prompt, model_name, generation_config) -> str:
+    prompt = str(prompt)
+    config = generation_config if isinstance(generation_config, dict) else {}
+    if '=== RESUME ' in prompt:
+        count = prompt.count('=== RESUME ')
+        return json.dumps([{'index': i, 'name': 'Bench User', 'experience': []} for i in range(count)])
+    if 'resume parsing' in prompt:
+        return json.dumps({'name': 'Bench User', 'experience': {'total_years': 3, 'roles': []}})
+    if 'challenge generator' in prompt:
+        return json.dumps({f'Month {m}': [{'week': w, 'title': 'Build a project', 'description': 'Practice.',
+                                            'related_skill': 'python'} for w in range(1, 5)] for m in (1, 2, 3)})
+    if 'missing skills' in prompt:
+        return json.dumps({'missing_skills': ['Kubernetes', 'Terraform', 'GraphQL']})
+    if 'career_paths' in prompt:
+        return json.dumps({'career_paths': ['Platform Engineer'], 'next_skills': ['Go', 'Kubernetes'],
+                           'industries': ['Cloud'], 'tips': ['Ship a side project.']})
+    if config.get('response_mime_type') == 'application/json':
+        return '{}'
+    if 'roadmap' in prompt.lower():
+        return '\n\n'.join(f'## Month {m}\n\n* Week 1: learn\n* Week 2: build' for m in (1, 2, 3))
+    return '* **Keep going**: practise daily.\n* Ship a side project.'
+
+
+# --- Load driver ---
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+    def timed(self, name: str, call: Callable[[], Any], ok: Callable[[Any], bool] = lambda r: r.status_code < 400):
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            self.record(name, time.perf_counter() - started, False)
+            print(f"  {name} raised: {e}")
+            return None
+        self.record(name, time.perf_counter() - started, ok(result))
+        return result
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def wait_for_job(client, recorder: Recorder, name: str, links: Dict[str, Any], deadline_s: float = 120):
+    """Polls a job (the job_links() JSON of a 202) to completion; records it under 'job <name>'."""
+    started = time.perf_counter()
+    ok = True
+    if links.get('status_url'):
+        while time.perf_counter() - started < deadline_s:
+            time.sleep(POLL_INTERVAL)
+            poll = recorder.timed('GET /jobs/<job_id>', lambda: client.get(links['status_url']))
+            if poll is None or poll.status_code != 202:
+                ok = poll is not None and (poll.get_json(silent=True) or {}).get('status') == 'done'
+                break
+        else:
+            ok = False
+    recorder.record(f'job {name}', time.perf_counter() - started, ok)
+
+
+def submit_and_wait(client, recorder: Recorder, name: str, route: str, call: Callable[[], Any]):
+    response = recorder.timed(route, call)
+    # A 200 means the answer came straight back (e.g. a precomputed skill gap)
+    if response is not None and response.status_code == 202:
+        wait_for_job(client, recorder, name, response.get_json(silent=True) or {})
+
+
+def run_virtual_user(app, recorder: Recorder, users: int, iterations: int, flows, rng: random.Random,
+                     unique_upload_share: float):
+    client = app.test_client()
+    username = f'user{rng.randrange(users)}'
+    for iteration in range(iterations):
+        if 'login' in flows or iteration == 0:
+            recorder.timed('POST /login', lambda: client.post('/login', data={'username': username,
+                                                                               'password': PASSWORD}),
+                           ok=lambda r: r.status_code == 302)
+        if 'dashboard' in flows:
+            recorder.timed('GET /dashboard', lambda: client.get('/dashboard'))
+        if 'upload' in flows:
+            # Some uploads repeat a resume (fingerprint reuse), the rest are new text
+            tag = rng.randrange(10 ** 9) if rng.random() < unique_upload_share else 0
+            pdf = resume_pdf(f"{username} python docker k8s postgres {username}@example.com r{tag}")
+            response = recorder.timed('POST /upload', lambda: client.post(
+                '/upload', data={'resume': (io.BytesIO(pdf), 'resume.pdf')},
+                content_type='multipart/form-data'))
+            body = response.get_json(silent=True) if response is not None else None
+            if body and body.get('enrichment'):
+                wait_for_job(client, recorder, 'upload', body['enrichment'])
+        if 'generate' in flows:
+            submit_and_wait(client, recorder, 'skill_gap', 'POST /generate', lambda: client.post('/generate'))
+        if 'roadmap' in flows:
+            recorder.timed('GET /roadmap', lambda: client.get('/roadmap'))
+            submit_and_wait(client, recorder, 'roadmap', 'POST /generate_roadmap_data',
+                            lambda: client.post('/generate_roadmap_data'))
+        if 'chat' in flows:
+            recorder.timed('POST /chat', lambda: client.post('/chat', json={'message': 'What should I learn next?'}))
+
+
+def run_benchmark(data_dir: str, concurrency: int, iterations: int, flows, latency: float, jitter: float,
+                  failure_rate: float, unique_upload_share: float, seed: int) -> Dict[str, Any]:
+    os.makedirs(data_dir, exist_ok=True)
+    os.chdir(data_dir)
+    if not os.path.exists(CORPUS_META):
+        print("No corpus in this directory; generating 1k users first.")
+        write_corpus('.', SCALES['1k'])
+    with open(CORPUS_META) as f:
+        corpus = json.load(f)
+
+    os.environ['GEMINI_BACKEND'] = 'fake'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import_started = time.perf_counter()
+    import app as app_module
+    import Chatbot
+    flask_app = app_module.create_app(warm=False)
+    import_s = time.perf_counter() - import_started
+
+    backend = Chatbot.client.backend
+    backend.latency, backend.jitter, backend.failure_rate = latency, jitter, failure_rate
+    backend.responder = fake_responder
+
+    recorder = Recorder()
+    rng = random.Random(seed)
+    threads = [threading.Thread(target=run_virtual_user,
+                                args=(flask_app, recorder, corpus['users'], iterations, flows,
+                                      random.Random(rng.random()), unique_upload_share))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        routes[name] = {
+            'count': len(ordered),
+            'errors': recorder.errors.get(name, 0),
+            'per_s': round(len(ordered) / elapsed, 2),
+            'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2),
+        }
+    return {
+        'corpus_users': corpus['users'],
+        'concurrency': concurrency,
+        'iterations': iterations,
+        'fake_latency_s': latency,
+        'app_import_s': round(import_s, 3),
+        'elapsed_s': round(elapsed, 2),
+        'gemini_calls': backend.calls,
+        'response_cache': Chatbot.response_cache.stats(),
+        'routes': routes,
+    }
+
+
+def latency_summary(samples: List[float], failures: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        'calls': len(ordered),
+        'failed': failures,
+        'per_s': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def drive_client(call: Callable[[int], Any], calls: int, concurrency: int) -> Dict[str, Any]:
+    """Runs call(i) for i in range(calls) on concurrency threads; returns its latency summary."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            call(i)
+            return time.perf_counter() - started, True
+        except Exception:
+            return time.perf_counter() - started, False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(calls)))
+    return latency_summary([seconds for seconds, _ in results], sum(1 for _, ok in results if not ok),
+                           time.perf_counter() - started)
+
+
+def run_resilience(calls: int, concurrency: int, latency: float, jitter: float, tail_rate: float,
+                   tail_latency: float, failure_rate: float, hedge_after: float, timeout: float,
+                   seed: int) -> Dict[str, Any]:
+    from gemini_client import FakeBackend, GeminiClient
+    from resilience import CircuitBreaker, RetryPolicy
+    from response_cache import ResponseCache
+
+    def client_for(max_attempts=1, hedge=None, breaker=None, **backend_overrides):
+        settings = dict(latency=latency, jitter=jitter, tail_rate=tail_rate, tail_latency=tail_latency,
+                        failure_rate=failure_rate, seed=seed)
+        settings.update(backend_overrides)
+        return GeminiClient(FakeBackend(**settings), max_concurrency=concurrency * 2, default_timeout=timeout,
+                            retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=0.05,
+                                                     min_attempt_time=0.05, seed=seed),
+                            breaker=breaker, hedge_after=hedge)
+
+    report = {'tail': {}, 'outage': {}}
+    for name, client in (('baseline', client_for()),
+                         ('retries', client_for(max_attempts=3)),
+                         ('retries+hedging', client_for(max_attempts=3, hedge=hedge_after))):
+        report['tail'][name] = dict(drive_client(lambda i: client.generate(f'prompt {i}'), calls, concurrency),
+                                    **client.stats())
+
+    # Outage: every prompt was answered (and cached) earlier, then the API goes down.
+    # Failing calls take a while each (like real timeouts), so fewer of them are enough
+    outage_calls = min(calls, 100)
+    prompts = [f'cached prompt {i}' for i in range(20)]
+    for name, breaker in (('no breaker', None), ('breaker', CircuitBreaker(failure_threshold=5, cooldown=60))):
+        client = client_for(max_attempts=3, breaker=breaker, tail_rate=0.0, failure_rate=0.0)
+        cache = ResponseCache(ttl_seconds=0)  # everything is stale straight away
+        for prompt in prompts:
+            cache.get_or_generate(prompt, 'fake', None, lambda prompt=prompt: client.generate(prompt))
+        client.backend.failure_rate, client.backend.latency = 1.0, min(timeout, 0.5)
+
+        def call(i, client=client, cache=cache):
+            prompt = prompts[i % len(prompts)]
+            return cache.get_or_generate(prompt, 'fake', None, lambda: client.generate(prompt))
+
+        report['outage'][name] = dict(drive_client(call, outage_calls, concurrency),
+                                      stale_served=cache.stats()['stale_served'], **client.stats())
+    return report
+
+
+def run_fairness(users: int, calls_per_user: int, abusers: int, slots: int, latency: float, timeout: float,
+                 seed: int) -> Dict[str, Any]:
+    from fair_scheduler import BATCH, INTERACTIVE, FairScheduler, set_caller
+    from gemini_client import FakeBackend, GeminiClient
+
+    long_prompt = 'Write a detailed three-month roadmap. ' * 150
+    report = {}
+    for name in ('first come, first served', 'fair-share'):
+        scheduler = FairScheduler(slots=slots, interactive_slots=2) if name == 'fair-share' else None
+        # A chat that can't start within timeout counts as failed (a semaphore lets
+        # the abuser's threads re-take a freed slot first, so it can wait forever)
+        client = GeminiClient(FakeBackend(latency=latency, jitter=latency / 4, seed=seed), max_concurrency=slots,
+                              default_timeout=timeout, scheduler=scheduler)
+        stop = threading.Event()
+        abuser_calls = [0, 0]
+
+        def abuse(index):
+            # Half the threads re-generate roadmaps, the rest spam chat
+            set_caller('abuser', BATCH if index % 2 else INTERACTIVE)
+            while not stop.is_set():
+                try:
+                    client.generate(long_prompt if index % 2 else f'chat {index}')
+                    abuser_calls[0] += 1
+                except Exception:
+                    abuser_calls[1] += 1
+                    time.sleep(0.05)
+
+        def chat(i):
+            set_caller(f'user{i % users}', INTERACTIVE)
+            client.generate(f'How do I learn Kubernetes? ({i})')
+
+        threads = [threading.Thread(target=abuse, args=(index,), daemon=True) for index in range(abusers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(latency)
+        summary = drive_client(chat, users * calls_per_user, users)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        report[name] = dict(summary, abuser_calls=abuser_calls[0], abuser_refused=abuser_calls[1],
+                            **({'scheduler': scheduler.stats()} if scheduler else {}))
+    return report
+
+
+def print_fairness_report(report: Dict[str, Any]):
+    header = f"{'scheduling':<28}{'chats':>7}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  abuser"
+    print("\nOther users' chat latency while one user floods the model")
+    print(header)
+    print('-' * len(header))
+    for name, row in report.items():
+        notes = f"calls={row['abuser_calls']} refused={row['abuser_refused']}"
+        if 'scheduler' in row:
+            notes += f" throttled={row['scheduler']['throttled']}"
+        print(f"{name:<28}{row['calls']:>7}{row['failed']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['max_ms']:>10}  {notes}")
+
+
+def print_resilience_report(report: Dict[str, Any]):
+    header = f"{'scenario':<28}{'calls':>7}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  notes"
+    for section, title in (('tail', 'Slow tail + transient failures'), ('outage', 'API outage, cached answers')):
+        print(f"\n{title}")
+        print(header)
+        print('-' * len(header))
+        for name, row in report[section].items():
+            notes = f"retries={row['retries']} hedges={row['hedges']} hedge_wins={row['hedge_wins']}"
+            if 'stale_served' in row:
+                notes += f" stale_served={row['stale_served']}"
+            if 'breaker' in row:
+                notes += f" breaker={row['breaker']['state']} rejected={row['breaker']['rejected']}"
+            print(f"{name:<28}{row['calls']:>7}{row['failed']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                  f"{row['p99_ms']:>10}{row['max_ms']:>10}  {notes}")
+
+
+HEAVY_MODULES = ('google.generativeai', 'PyPDF2', 'markdown')
+
+STARTUP_SCRIPT = """
+import importlib, json, sys, time
+sys.path.insert(0, {root!r})
+mode = {mode!r}
+started = time.perf_counter()
+if mode == 'eager':
+    for module in {heavy!r}:
+        importlib.import_module(module)
+import app
+imported = time.perf_counter()
+flask_app = app.create_app(warm=(mode == 'warm'))
+created = time.perf_counter()
+status = flask_app.test_client().get('/login').status_code
+served = time.perf_counter()
+print(json.dumps({{'import_s': imported - started, 'create_s': created - imported,
+                  'first_request_s': served - created, 'status': status,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_startup(repeat: int, modes: List[str]) -> Dict[str, Any]:
+    """Times cold starts of the app in fresh interpreters (one per repeat and mode)."""
+    import subprocess
+    import tempfile
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        with open(os.path.join(data_dir, 'users.json'), 'w') as f:
+            json.dump({}, f)
+        for mode in modes:
+            script = STARTUP_SCRIPT.format(root=root, mode=mode, heavy=HEAVY_MODULES)
+            runs = []
+            for _ in range(repeat):
+                result = subprocess.run([sys.executable, '-c', script], cwd=data_dir, capture_output=True,
+                                        text=True, check=True)
+                runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+            report[mode] = {
+                key: round(sorted(run[key] for run in runs)[len(runs) // 2] * 1000, 1)
+                for key in ('import_s', 'create_s', 'first_request_s')
+            }
+            report[mode]['loaded'] = runs[-1]['loaded']
+    return report
+
+
+def print_startup_report(report: Dict[str, Any]):
+    header = f"{'mode':<10}{'import ms':>12}{'create_app ms':>15}{'first GET ms':>14}{'total ms':>10}  heavy modules loaded"
+    print(header)
+    print('-' * len(header))
+    for mode, row in report.items():
+        total = round(row['import_s'] + row['create_s'] + row['first_request_s'], 1)
+        print(f"{mode:<10}{row['import_s']:>12}{row['create_s']:>15}{row['first_request_s']:>14}{total:>10}  "
+              f"{', '.join(row['loaded']) or '-'}")
+
+
+def run_cohort(data_dir: str, new_uploads: int, top: int, seed: int) -> Dict[str, Any]:
+    from cohort_analytics import CohortAnalytics
+    from profile_store import PROFILE_DB, ProfileStore
+    from skill_extractor import MASTER_SKILLS
+
+    store = ProfileStore(db_path=os.path.join(data_dir, PROFILE_DB))
+    analytics = CohortAnalytics(store)
+    timings = {}
+
+    started = time.perf_counter()
+    analytics.refresh()
+    timings['build_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    summary = analytics.summary(top, refresh=False)
+    timings['analytics_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    analytics.summary(top, refresh=False)
+    timings['cached_analytics_s'] = time.perf_counter() - started
+
+    rng = random.Random(seed)
+    store.save_many({'username': f'cohort-bench-{rng.random()}', 'data': synthetic_profile(rng, MASTER_SKILLS),
+                     'source': 'benchmark'} for _ in range(new_uploads))
+    started = time.perf_counter()
+    applied = analytics.refresh()
+    analytics.summary(top, refresh=False)
+    timings['refresh_and_analytics_s'] = time.perf_counter() - started
+
+    return {'profiles': summary['profiles'], 'skills_tracked': summary['skills_tracked'],
+            'new_uploads': new_uploads, 'versions_applied_on_refresh': applied,
+            'timings_ms': {name: round(seconds * 1000, 1) for name, seconds in timings.items()},
+            'top_missing': [row['skill'] for row in summary['gaps']['missing_skills'][:5]]}
+
+
+def run_pages(data_dir: str) -> Dict[str, Any]:
+    """Bytes sent for a first and a repeat view of each page, with its CSS/JS as separate cacheable files."""
+    import re
+
+    os.makedirs(data_dir, exist_ok=True)
+    os.chdir(data_dir)
+    if not os.path.exists('users.json'):
+        with open('users.json', 'w') as f:
+            json.dump({}, f)
+    os.environ['GEMINI_BACKEND'] = 'fake'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    client = app_module.create_app(warm=False).test_client()
+    client.post('/register', data={'username': 'pages-bench', 'password': PASSWORD})
+    client.post('/login', data={'username': 'pages-bench', 'password': PASSWORD})
+    report = {}
+    for page in ('/login', '/register', '/dashboard'):
+        response = client.get(page, headers={'Accept-Encoding': 'gzip'})
+        html = client.get(page, headers={'Accept-Encoding': 'identity'}).get_data()
+        assets = []
+        for url in re.findall(rb'(?:href|src)="(/assets/[^"]+)"', html):
+            asset = client.get(url.decode(), headers={'Accept-Encoding': 'br, gzip'})
+            assets.append({'url': url.decode(), 'sent': len(asset.get_data()),
+                           'raw': len(client.get(url.decode(), headers={'Accept-Encoding': 'identity'}).get_data()),
+                           'encoding': asset.headers.get('Content-Encoding', 'identity'),
+                           'cache_control': asset.headers.get('Cache-Control')})
+        html_sent = len(response.get_data())
+        report[page] = {
+            # What one view cost with the CSS/JS inline and nothing compressed
+            'inline_uncompressed': len(html) + sum(asset['raw'] for asset in assets),
+            'first_view': html_sent + sum(asset['sent'] for asset in assets),
+            # The assets are immutable, so a repeat view only fetches the HTML
+            'repeat_view': html_sent,
+            'assets': assets,
+        }
+    return report
+
+
+def print_pages_report(report: Dict[str, Any]):
+    header = f"{'page':<14}{'inline, raw':>13}{'first view':>12}{'repeat view':>13}  assets"
+    print(header)
+    print('-' * len(header))
+    for page, row in report.items():
+        assets = ', '.join(f"{asset['url'].rsplit('/', 1)[-1]} {asset['encoding']}" for asset in row['assets'])
+        print(f"{page:<14}{row['inline_uncompressed']:>13}{row['first_view']:>12}{row['repeat_view']:>13}  {assets}")
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['corpus_users']} users, concurrency {report['concurrency']}, "
+          f"{report['iterations']} iteration(s), fake latency {report['fake_latency_s']}s, "
+          f"app import {report['app_import_s']}s, {report['gemini_calls']} Gemini call(s), "
+          f"wall time {report['elapsed_s']}s")
+    header = f"{'route':<32}{'count':>7}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, row in report['routes'].items():
+        print(f"{name:<32}{row['count']:>7}{row['errors']:>6}{row['per_s']:>9}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Offline benchmarks for Ignite with a fake Gemini backend.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    corpus = commands.add_parser('corpus', help='generate a synthetic users.json + profile corpus')
+    corpus.add_argument('--scale', default='1k', help='1k, 100k, 1m or a number of users')
+    corpus.add_argument('--data-dir', default='bench-data')
+    corpus.add_argument('--legacy-files', action='store_true',
+                        help='write parsed_resumes/*.json instead of the profile database')
+    corpus.add_argument('--seed', type=int, default=7)
+
+    run = commands.add_parser('run', help='drive the app flows and report per-route latency')
+    run.add_argument('--data-dir', default='bench-data')
+    run.add_argument('--concurrency', type=int, default=8, help='virtual users running at once')
+    run.add_argument('--iterations', type=int, default=5, help='passes through the flows per virtual user')
+    run.add_argument('--flows', default=','.join(FLOWS), help='comma-separated subset of ' + ','.join(FLOWS))
+    run.add_argument('--latency', type=float, default=0.5, help='fake Gemini latency in seconds')
+    run.add_argument('--jitter', type=float, default=0.1)
+    run.add_argument('--failure-rate', type=float, default=0.0)
+    run.add_argument('--unique-uploads', type=float, default=0.5,
+                     help='share of uploads with new text (the rest repeat a resume)')
+    run.add_argument('--seed', type=int, default=7)
+    run.add_argument('--json', help='also write the report to this file')
+
+    resilience = commands.add_parser('resilience', help='compare retry / hedging / breaker settings')
+    resilience.add_argument('--calls', type=int, default=400)
+    resilience.add_argument('--concurrency', type=int, default=8)
+    resilience.add_argument('--latency', type=float, default=0.1, help='typical fake Gemini latency')
+    resilience.add_argument('--jitter', type=float, default=0.02)
+    resilience.add_argument('--tail-rate', type=float, default=0.05, help='share of calls that are very slow')
+    resilience.add_argument('--tail-latency', type=float, default=2.0)
+    resilience.add_argument('--failure-rate', type=float, default=0.05)
+    resilience.add_argument('--hedge-after', type=float, default=0.25)
+    resilience.add_argument('--timeout', type=float, default=5.0)
+    resilience.add_argument('--seed', type=int, default=7)
+
+    startup = commands.add_parser('startup', help='time cold start: import, create_app, first request')
+    startup.add_argument('--repeat', type=int, default=5, help='fresh interpreters per mode (median is reported)')
+    startup.add_argument('--modes', default='eager,lazy,warm',
+                         help='eager (heavy libraries imported up front, the old behaviour), lazy, warm')
+
+    fairness = commands.add_parser('fairness', help='chat latency under one abusive user, FIFO vs fair-share')
+    fairness.add_argument('--users', type=int, default=6, help='well-behaved users chatting at once')
+    fairness.add_argument('--calls-per-user', type=int, default=10)
+    fairness.add_argument('--abusers', type=int, default=24, help="threads making the abusive user's calls")
+    fairness.add_argument('--slots', type=int, default=8, help='concurrent model calls allowed')
+    fairness.add_argument('--latency', type=float, default=0.2, help='typical fake Gemini latency')
+    fairness.add_argument('--timeout', type=float, default=5.0, help='per-call timeout')
+    fairness.add_argument('--seed', type=int, default=7)
+
+    pages = commands.add_parser('pages', help='bytes sent per page view, first and repeat')
+    pages.add_argument('--data-dir', default='bench-data')
+
+    cohort = commands.add_parser('cohort', help='time cohort analytics over a corpus')
+    cohort.add_argument('--data-dir', default='bench-data')
+    cohort.add_argument('--new-uploads', type=int, default=1000, help='profiles saved before the incremental refresh')
+    cohort.add_argument('--top', type=int, default=20)
+    cohort.add_argument('--seed', type=int, default=7)
+
+    args = parser.parse_args(argv)
+    if args.command == 'pages':
+        print_pages_report(run_pages(os.path.abspath(args.data_dir)))
+        return 0
+    if args.command == 'fairness':
+        print_fairness_report(run_fairness(args.users, args.calls_per_user, args.abusers, args.slots,
+                                           args.latency, args.timeout, args.seed))
+        return 0
+    if args.command == 'cohort':
+        print(json.dumps(run_cohort(os.path.abspath(args.data_dir), args.new_uploads, args.top, args.seed), indent=2))
+        return 0
+    if args.command == 'startup':
+        print_startup_report(run_startup(args.repeat, [mode.strip() for mode in args.modes.split(',')]))
+        return 0
+    if args.command == 'resilience':
+        print_resilience_report(run_resilience(args.calls, args.concurrency, args.latency, args.jitter,
+                                               args.tail_rate, args.tail_latency, args.failure_rate,
+                                               args.hedge_after, args.timeout, args.seed))
+        return 0
+    if args.command == 'corpus':
+        print(json.dumps(write_corpus(args.data_dir, parse_scale(args.scale), args.legacy_files, args.seed), indent=2))
+        return 0
+
+    flows = [flow.strip() for flow in args.flows.split(',') if flow.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flow(s): {', '.join(sorted(unknown))}")
+    json_path = os.path.abspath(args.json) if args.json else None
+    report = run_benchmark(os.path.abspath(args.data_dir), args.concurrency, args.iterations, flows,
+                           args.latency, args.jitter, args.failure_rate, args.unique_uploads, args.seed)
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from prompt_builder import compact_text
+
+# Label: Chat Session Memory
+# /chat used to send each message on its own, so users restated their background
+# in every message and the bot forgot what it had just said. A ChatSession keeps
+# the conversation for one browser session:
+#   - the user's profile summary, built once when the session starts
+#   - the last max_turns messages verbatim, in a ring buffer
+#   - older messages folded into a short "earlier in this conversation" digest
+#     (one shortened line per message, itself a bounded ring)
+# Every part is capped, so a session never exceeds a fixed size however long
+# the conversation runs. ChatSessionStore holds at most max_sessions of them,
+# evicting the least recently used, and drops sessions idle for idle_seconds.
+# The history is sent as Gemini chat contents (alternating user/model turns)
+# to the shared chat model, the same request a genai ChatSession would make.
+
+DEFAULT_MAX_TURNS = 10
+DEFAULT_MAX_SESSIONS = 5000
+DEFAULT_IDLE_SECONDS = 30 * 60
+# Per message kept verbatim / per line of the digest of older messages
+TURN_MAX_TOKENS = 300
+DIGEST_LINE_TOKENS = 30
+DIGEST_MAX_LINES = 20
+
+ROLE_LABELS = {'user': 'User', 'model': 'You'}
+
+
+class ChatSession:
+    def __init__(self, session_id: str, username: Optional[str], profile_summary: str = '',
+                 max_turns: int = DEFAULT_MAX_TURNS):
+        self.session_id = session_id
+        self.username = username
+        self.profile_summary = profile_summary
+        self.turns = deque(maxlen=max_turns)
+        self.digest = deque(maxlen=DIGEST_MAX_LINES)
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    def contents(self, message: str) -> List[Dict[str, Any]]:
+        """The Gemini chat contents for answering message: context, recent turns, then message."""
+        context = []
+        if self.profile_summary:
+            context.append(self.profile_summary)
+        with self._lock:
+            if self.digest:
+                context.append('Earlier in this conversation:\n' + '\n'.join(self.digest))
+            turns = list(self.turns)
+
+        contents = []
+        if context:
+            contents += [{'role': 'user', 'parts': ['\n\n'.join(context)]},
+                         {'role': 'model', 'parts': ['Understood.']}]
+        contents += [{'role': role, 'parts': [text]} for role, text in turns]
+        contents.append({'role': 'user', 'parts': [compact_text(message, TURN_MAX_TOKENS)]})
+        return contents
+
+    def record(self, message: str, answer: str):
+        """Adds a question and its answer, folding turns that fall out of the buffer into the digest."""
+        with self._lock:
+            for role, text in (('user', message), ('model', answer)):
+                if len(self.turns) == self.turns.maxlen:
+                    old_role, old_text = self.turns[0]
+                    self.digest.append(f"{ROLE_LABELS[old_role]}: {compact_text(old_text, DIGEST_LINE_TOKENS)}")
+                self.turns.append((role, compact_text(text, TURN_MAX_TOKENS)))
+            self.last_used = time.monotonic()
+
+
+class ChatSessionStore:
+    """LRU of ChatSessions keyed by session id, capped in count and idle time."""
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, idle_seconds: float = DEFAULT_IDLE_SECONDS,
+                 max_turns: int = DEFAULT_MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_turns = max_turns
+        self._sessions: 'OrderedDict[str, ChatSession]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'created': 0, 'evicted': 0, 'expired': 0}
+
+    def _expire_idle(self, now: float):
+        # Called with the lock held; the oldest sessions are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._counts['expired'] += 1
+
+    def get(self, session_id: str, username: Optional[str],
+            profile_summary: Callable[[Optional[str]], str]) -> ChatSession:
+        """
+        Returns the session, starting a new one (with profile_summary(username) as
+        its context) if it doesn't exist, expired, or belongs to another user.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire_idle(now)
+            session = self._sessions.get(session_id)
+            if session is not None and session.username == username:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+                return session
+
+        # Built outside the lock: it may read the profile store
+        session = ChatSession(session_id, username, profile_summary(username), self.max_turns)
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._counts['created'] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counts['evicted'] += 1
+        return session
+
+    def end(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts, sessions=len(self._sessions))
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from profile_store import ProfileStore, profile_store
+from skill_extractor import MASTER_SKILLS, canonical_skill
+
+# Label: Cohort Skill Analytics
+# "Which skills are most often missing across our users?" used to mean loading
+# every profile JSON in a Python loop. CohortAnalytics keeps two bit matrices,
+# one row per user (their latest profile), one bit per skill:
+#   have     the profile's skills
+#   missing  its missing_skills (the skill gap)
+# Columns are MASTER_SKILLS followed by any other skill name seen, up to
+# COHORT_MAX_SKILLS. Rows are packed 8 skills to a byte, so a million users is a
+# few tens of MB. Frequencies, co-occurrence and gap distributions are computed
+# with NumPy over row chunks. The matrices are built from the profile store on
+# first use; after that refresh() only reads the versions written since the
+# previous refresh (new uploads, newly stored skill gaps), so it stays cheap.
+#   python cohort_analytics.py --top 20
+
+MAX_COLUMNS = int(os.getenv('COHORT_MAX_SKILLS', '1024'))
+# Rows unpacked at once while scanning (bounds the temporary memory)
+CHUNK_ROWS = 1 << 14
+# A write can commit with a timestamp a little behind one already seen, so each
+# refresh re-reads this window (rows it has already applied are skipped)
+REFRESH_OVERLAP_SECONDS = 1.0
+INITIAL_WIDTH_BYTES = 16
+MASTER_SET = frozenset(canonical_skill(skill) for skill in MASTER_SKILLS)
+
+
+def _skill_names(raw: Optional[str]) -> List[str]:
+    # skill_changes() yields the lists as JSON text (or None when the key is absent)
+    if not raw:
+        return []
+    try:
+        names = json.loads(raw)
+    except json.JSONDecodeError:
+        return []
+    return [name for name in names if isinstance(name, str)] if isinstance(names, list) else []
+
+
+class CohortAnalytics:
+    """User-by-skill bit matrices over the latest profile of every user."""
+
+    def __init__(self, store: Optional[ProfileStore] = None, vocabulary: Iterable[str] = MASTER_SKILLS,
+                 max_columns: int = MAX_COLUMNS):
+        self.store = store or profile_store
+        self.max_columns = max_columns
+        # Display names by column (the first spelling seen, so MASTER_SKILLS keep their casing)
+        self.skills: List[str] = []
+        self._columns: Dict[str, int] = {}
+        # Raw spelling -> column (None when over max_columns), so canonical_skill() runs once per spelling
+        self._spellings: Dict[str, Optional[int]] = {}
+        self._width = INITIAL_WIDTH_BYTES
+        self._have = np.zeros((0, self._width), dtype=np.uint8)
+        self._missing = np.zeros((0, self._width), dtype=np.uint8)
+        self._versions = np.zeros(0, dtype=np.int64)
+        self._changed = np.zeros(0, dtype=np.float64)
+        self._rows: Dict[str, int] = {}
+        # Every column any row has ever had set in _have (bounds the co-occurrence product)
+        self._held = 0
+        self._watermark: Optional[float] = None
+        self._generation = 0
+        self._scan_cache = None
+        self._counts = {'refreshes': 0, 'versions_applied': 0, 'skills_dropped': 0}
+        self._lock = threading.RLock()
+        for skill in vocabulary:
+            self._column(skill)
+
+    # --- Building ---
+    def _column(self, name: str) -> Optional[int]:
+        if name in self._spellings:
+            return self._spellings[name]
+        skill = canonical_skill(name)
+        column = self._columns.get(skill)
+        if column is None and skill:
+            if len(self.skills) >= self.max_columns:
+                self._counts['skills_dropped'] += 1
+            else:
+                column = self._columns[skill] = len(self.skills)
+                self.skills.append(name.strip())
+                if column >= self._width * 8:
+                    self._grow_width()
+        self._spellings[name] = column
+        return column
+
+    def _grow_width(self):
+        extra = self._width
+        self._have = np.pad(self._have, ((0, 0), (0, extra)))
+        self._missing = np.pad(self._missing, ((0, 0), (0, extra)))
+        self._width += extra
+
+    def _ensure_rows(self, rows: int):
+        capacity = len(self._versions)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        for name in ('_have', '_missing'):
+            grown = np.zeros((capacity, self._width), dtype=np.uint8)
+            old = getattr(self, name)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+        versions = np.full(capacity, -1, dtype=np.int64)
+        versions[:len(self._versions)] = self._versions
+        self._versions = versions
+        changed = np.zeros(capacity, dtype=np.float64)
+        changed[:len(self._changed)] = self._changed
+        self._changed = changed
+
+    def _mask(self, names: List[str]) -> int:
+        mask = 0
+        for name in names:
+            column = self._column(name)
+            if column is not None:
+                mask |= 1 << column
+        return mask
+
+    def _apply(self, pending: Dict[int, tuple]):
+        """Writes a batch of {row: (version, changed_at, have mask, missing mask)} into the matrices."""
+        if not pending:
+            return
+        rows = np.fromiter(pending.keys(), dtype=np.int64, count=len(pending))
+        width = self._width
+        for entry in pending.values():
+            self._held |= entry[2]
+        for name, position in (('_have', 2), ('_missing', 3)):
+            packed = b''.join(entry[position].to_bytes(width, 'little') for entry in pending.values())
+            getattr(self, name)[rows] = np.frombuffer(packed, dtype=np.uint8).reshape(len(pending), width)
+        self._versions[rows] = np.fromiter((entry[0] for entry in pending.values()), dtype=np.int64,
+                                           count=len(pending))
+        self._changed[rows] = np.fromiter((entry[1] for entry in pending.values()), dtype=np.float64,
+                                          count=len(pending))
+        self._counts['versions_applied'] += len(pending)
+
+    def _ingest(self, changes) -> float:
+        """Applies (username, version, skills, missing, changed_at) rows; returns the newest changed_at."""
+        newest = self._watermark or 0.0
+        pending: Dict[int, tuple] = {}
+        for username, version, skills, missing, changed_at in changes:
+            newest = max(newest, changed_at)
+            row = self._rows.get(username)
+            if row is None:
+                row = self._rows[username] = len(self._rows)
+                self._ensure_rows(row + 1)
+            known, seen_at = pending[row][:2] if row in pending else (self._versions[row], self._changed[row])
+            if version < known or (version == known and changed_at <= seen_at):
+                # An older version was patched (the row follows the user's newest
+                # profile), or this write was already applied by the last refresh
+                continue
+            pending[row] = (version, changed_at, self._mask(_skill_names(skills)), self._mask(_skill_names(missing)))
+            if len(pending) >= CHUNK_ROWS:
+                self._apply(pending)
+                pending = {}
+        self._apply(pending)
+        return newest
+
+    def refresh(self) -> int:
+        """Brings the matrices up to date with the profile store; returns the versions applied."""
+        with self._lock:
+            applied_before = self._counts['versions_applied']
+            since = 0.0 if self._watermark is None else self._watermark - REFRESH_OVERLAP_SECONDS
+            self._watermark = self._ingest(self.store.skill_changes(since))
+            applied = self._counts['versions_applied'] - applied_before
+            self._counts['refreshes'] += 1
+            if applied:
+                self._generation += 1
+            return applied
+
+    # --- Analytics ---
+    def _scan(self) -> Dict[str, Any]:
+        """One pass over all rows: per-skill counts, co-occurrence and gap sizes (cached until data changes)."""
+        if self._scan_cache is not None and self._scan_cache[0] == self._generation:
+            return self._scan_cache[1]
+
+        users, columns = len(self._rows), len(self.skills)
+        # Co-occurrence only over skills someone has held: a users x skills product
+        # per chunk, whose diagonal is also the per-skill count
+        active = np.array([column for column in range(columns) if self._held >> column & 1], dtype=np.int64)
+        co_occurrence = np.zeros((len(active), len(active)), dtype=np.float64)
+        missing_counts = np.zeros(columns, dtype=np.int64)
+        gap_sizes = np.zeros(columns + 1, dtype=np.int64)
+        for start in range(0, users, CHUNK_ROWS):
+            stop = min(users, start + CHUNK_ROWS)
+            have = np.unpackbits(self._have[start:stop], axis=1, count=columns, bitorder='little')
+            chunk = have.take(active, axis=1).astype(np.float32)
+            co_occurrence += chunk.T @ chunk
+            missing = np.unpackbits(self._missing[start:stop], axis=1, count=columns, bitorder='little')
+            missing_counts += missing.sum(axis=0, dtype=np.int64)
+            gap_sizes += np.bincount(missing.sum(axis=1, dtype=np.int64), minlength=columns + 1)
+
+        co_occurrence = co_occurrence.round().astype(np.int64)
+        have_counts = np.zeros(columns, dtype=np.int64)
+        have_counts[active] = np.diagonal(co_occurrence)
+        scan = {'users': users, 'have': have_counts, 'missing': missing_counts, 'gap_sizes': gap_sizes,
+                'active': active, 'co_occurrence': co_occurrence}
+        self._scan_cache = (self._generation, scan)
+        return scan
+
+    def _ranked(self, counts: np.ndarray, users: int, top: int) -> List[Dict[str, Any]]:
+        order = np.argsort(-counts, kind='stable')[:top]
+        return [{'skill': self.skills[i], 'users': int(counts[i]), 'share': round(counts[i] / users, 4),
+                 'master': self.skills[i] in MASTER_SET}
+                for i in order if counts[i]]
+
+    def skill_frequencies(self, top: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            scan = self._scan()
+            return self._ranked(scan['have'], max(scan['users'], 1), top)
+
+    def gap_distribution(self, top: int = 20) -> Dict[str, Any]:
+        """The most common missing skills and how many missing skills users have."""
+        with self._lock:
+            scan = self._scan()
+            users = max(scan['users'], 1)
+            sizes = scan['gap_sizes']
+            last = int(np.flatnonzero(sizes).max()) if sizes.any() else 0
+            return {
+                'missing_skills': self._ranked(scan['missing'], users, top),
+                'users_with_gap': int(scan['users'] - sizes[0]),
+                'gap_sizes': {str(size): int(sizes[size]) for size in range(last + 1)},
+            }
+
+    def co_occurrence(self, top: int = 20) -> List[Dict[str, Any]]:
+        """The skill pairs held together most often, with their lift (1.0 = independent)."""
+        with self._lock:
+            scan = self._scan()
+            matrix, active, users = scan['co_occurrence'], scan['active'], max(scan['users'], 1)
+            upper = np.triu_indices(len(active), k=1)
+            pair_counts = matrix[upper]
+            order = np.argsort(-pair_counts, kind='stable')[:top]
+            have = scan['have']
+            pairs = []
+            for index in order:
+                if not pair_counts[index]:
+                    break
+                a, b = active[upper[0][index]], active[upper[1][index]]
+                lift = pair_counts[index] * users / (have[a] * have[b])
+                pairs.append({'skills': [self.skills[a], self.skills[b]], 'users': int(pair_counts[index]),
+                              'lift': round(float(lift), 3)})
+            return pairs
+
+    def summary(self, top: int = 20, refresh: bool = True) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with self._lock:
+            if refresh:
+                self.refresh()
+            result = {
+                'profiles': len(self._rows),
+                'skills_tracked': len(self.skills),
+                'skill_frequencies': self.skill_frequencies(top),
+                'co_occurrence': self.co_occurrence(top),
+                'gaps': self.gap_distribution(top),
+                'stats': dict(self._counts),
+            }
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+
+cohort = CohortAnalytics()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Skill frequencies, co-occurrence and gaps across all profiles.')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+    build_started = time.perf_counter()
+    cohort.refresh()
+    print(f"Built from {len(cohort._rows)} profiles in {time.perf_counter() - build_started:.2f}s")
+    print(json.dumps(cohort.summary(top=args.top), indent=2))
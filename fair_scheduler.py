@@ -0,0 +1,258 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Label: Fair-Share Scheduling
+# GeminiClient's semaphore admitted model calls first come, first served, so one
+# user hammering /chat or re-generating roadmaps could fill every slot and
+# queue everyone else behind them. FairScheduler decides who gets the next slot:
+#   - each user has a token bucket (estimated tokens per minute, with a burst);
+#     a call that overdraws it waits until it is paid off, or is refused with
+#     QuotaExceededError when that would take longer than the caller can wait
+#   - waiting calls are ordered by weighted fair queuing: each gets a virtual
+#     finish time (the user's previous finish, or now, plus cost / weight), so a
+#     user with a backlog only delays their own later calls
+#   - interactive calls (chat) weigh more than batch ones (roadmaps,
+#     recommendations, parsing), and batch calls can never take the last
+#     interactive_slots slots, so a chat message never waits behind a full
+#     house of long generations
+# Who is calling is a context variable: app.py sets it per request, and the job
+# queue and thread pools copy it into the threads they run work on. Calls with
+# no user (command-line tools, prewarming) are scheduled but never throttled.
+# Admission takes an estimate from the bucket (the prompt plus the longest answer
+# allowed); when the call finishes, the estimate is settled against the tokens
+# the API reported, so the bucket pays for each token once.
+# Every call's tokens and estimated cost are added up per user; see usage().
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+KIND_WEIGHTS = {INTERACTIVE: 8.0, BATCH: 1.0}
+# Longest an interactive call waits for its bucket before being refused
+INTERACTIVE_MAX_WAIT = 5.0
+# Forget idle users' finish times once this many are kept
+MAX_TRACKED_FINISHES = 10000
+
+_caller = contextvars.ContextVar('ignite_caller', default=(None, BATCH))
+
+
+class QuotaExceededError(Exception):
+    """The user's token bucket can't cover the call within the time the caller can wait."""
+
+    def __init__(self, user: str, retry_after: float):
+        super().__init__(f"{user} is over their model usage rate; retry in {retry_after:.0f}s")
+        self.user = user
+        self.retry_after = retry_after
+
+
+def set_caller(user: Optional[str], kind: str = BATCH):
+    """Attributes model calls made from this context to user, with kind's priority."""
+    return _caller.set((user, kind))
+
+
+def current_caller() -> Tuple[Optional[str], str]:
+    return _caller.get()
+
+
+class Ticket:
+    __slots__ = ('user', 'kind', 'cost', 'charged', 'finish', 'queued_at', 'granted', 'cancelled', 'event')
+
+    def __init__(self, user: Optional[str], kind: str, cost: float, charged: float = 0.0, queued_at: float = 0.0):
+        self.user = user
+        self.kind = kind
+        self.cost = cost
+        # Tokens taken from the user's bucket at admission, settled when the call finishes
+        self.charged = charged
+        self.finish = 0.0
+        self.queued_at = queued_at
+        self.granted = False
+        self.cancelled = False
+        self.event = threading.Event()
+
+
+class FairScheduler:
+    """Per-user token buckets and weighted fair queuing over a fixed number of call slots."""
+
+    def __init__(self, slots: int = 8, interactive_slots: int = 2, tokens_per_minute: float = 20000,
+                 burst_tokens: float = 8000, prompt_price_per_million: float = 0.0,
+                 output_price_per_million: float = 0.0, clock=time.monotonic):
+        self.slots = slots
+        self.interactive_slots = min(interactive_slots, slots - 1)
+        self.refill_per_second = tokens_per_minute / 60.0
+        self.burst_tokens = burst_tokens
+        self.prompt_price = prompt_price_per_million / 1e6
+        self.output_price = output_price_per_million / 1e6
+        self._buckets: Dict[str, List[float]] = {}
+        self._queues: Dict[str, list] = {INTERACTIVE: [], BATCH: []}
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Optional[str], float] = {}
+        self._running = {INTERACTIVE: 0, BATCH: 0}
+        self._usage: Dict[str, Dict[str, float]] = {}
+        # Tokens the API reported for a user's calls that no finished call has settled yet
+        self._reported: Dict[str, int] = {}
+        self._clock = clock
+        self._counts = {'granted': 0, 'queued': 0, 'throttled': 0, 'refused': 0, 'timed_out': 0}
+        self._lock = threading.Lock()
+
+    # --- Token buckets ---
+    def _charge(self, user: str, tokens: float) -> float:
+        """Takes tokens from the user's bucket (it may go into debt); returns the seconds until it is paid off."""
+        now = self._clock()
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = [self.burst_tokens, now]
+        bucket[0] = min(self.burst_tokens, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+        bucket[1] = now
+        bucket[0] -= tokens
+        return -bucket[0] / self.refill_per_second if bucket[0] < 0 else 0.0
+
+    def _refund(self, user: Optional[str], tokens: float):
+        bucket = self._buckets.get(user)
+        if bucket is not None and tokens:
+            bucket[0] = min(self.burst_tokens, bucket[0] + tokens)
+
+    def _settle(self, ticket: Ticket, failed: bool):
+        """Replaces the estimate a finished call was charged with the tokens reported for it."""
+        if ticket.user is None:
+            return
+        # A user's overlapping calls may settle each other's reports; the bucket's total is the same
+        reported = self._reported.pop(ticket.user, None)
+        if reported is None:
+            # No count from the API: a failed call used nothing, an answered one is taken at its estimate
+            if failed:
+                self._refund(ticket.user, ticket.charged)
+        elif reported > ticket.charged:
+            self._charge(ticket.user, reported - ticket.charged)
+        else:
+            self._refund(ticket.user, ticket.charged - reported)
+
+    def _account(self, user: Optional[str]) -> Dict[str, float]:
+        account = self._usage.get(user or '(system)')
+        if account is None:
+            account = self._usage[user or '(system)'] = {
+                INTERACTIVE: 0, BATCH: 0, 'prompt_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0,
+                'throttled': 0, 'refused': 0, 'queue_seconds': 0.0}
+        return account
+
+    # --- Slots ---
+    def _can_start(self, kind: str) -> bool:
+        running = self._running[INTERACTIVE] + self._running[BATCH]
+        if running >= self.slots:
+            return False
+        return kind == INTERACTIVE or self._running[BATCH] < self.slots - self.interactive_slots
+
+    def _head(self, kind: str) -> Optional[Ticket]:
+        queue = self._queues[kind]
+        while queue and queue[0][2].cancelled:
+            heapq.heappop(queue)
+        return queue[0][2] if queue else None
+
+    def _dispatch(self):
+        # Called with the lock held: start the waiting calls with the earliest finish times
+        while True:
+            candidates = [ticket for kind in (INTERACTIVE, BATCH)
+                          for ticket in [self._head(kind)] if ticket is not None and self._can_start(kind)]
+            if not candidates:
+                return
+            ticket = min(candidates, key=lambda t: t.finish)
+            heapq.heappop(self._queues[ticket.kind])
+            self._grant(ticket)
+
+    def _grant(self, ticket: Ticket):
+        ticket.granted = True
+        self._running[ticket.kind] += 1
+        self._virtual_time = max(self._virtual_time, ticket.finish)
+        self._counts['granted'] += 1
+        account = self._account(ticket.user)
+        account[ticket.kind] += 1
+        account['queue_seconds'] += self._clock() - ticket.queued_at
+        ticket.event.set()
+
+    def acquire(self, cost: float, timeout: float, caller: Optional[Tuple[Optional[str], str]] = None) -> Ticket:
+        """
+        Waits (at most timeout seconds) for a slot for a call of about cost tokens,
+        made by caller (default: the current context's). Pass the ticket to release().
+        """
+        user, kind = caller or current_caller()
+        kind = kind if kind in KIND_WEIGHTS else BATCH
+        deadline = self._clock() + timeout
+        if user is not None:
+            with self._lock:
+                wait = self._charge(user, cost)
+                max_wait = min(timeout, INTERACTIVE_MAX_WAIT) if kind == INTERACTIVE else timeout
+                if wait > max_wait:
+                    self._refund(user, cost)
+                    self._counts['refused'] += 1
+                    self._account(user)['refused'] += 1
+                    raise QuotaExceededError(user, wait)
+                if wait:
+                    self._counts['throttled'] += 1
+                    self._account(user)['throttled'] += 1
+            if wait:
+                time.sleep(wait)
+
+        ticket = Ticket(user, kind, cost, charged=cost if user is not None else 0.0, queued_at=self._clock())
+        with self._lock:
+            ticket.finish = max(self._virtual_time, self._last_finish.get(user, 0.0)) + cost / KIND_WEIGHTS[kind]
+            self._last_finish[user] = ticket.finish
+            if len(self._last_finish) > MAX_TRACKED_FINISHES:
+                self._last_finish = {key: finish for key, finish in self._last_finish.items()
+                                     if finish > self._virtual_time}
+            if self._can_start(kind) and self._head(kind) is None:
+                self._grant(ticket)
+                return ticket
+            heapq.heappush(self._queues[kind], (ticket.finish, next(self._sequence), ticket))
+            self._counts['queued'] += 1
+            self._dispatch()
+
+        if ticket.event.wait(max(0.0, deadline - self._clock())):
+            return ticket
+        with self._lock:
+            if ticket.granted:
+                return ticket
+            ticket.cancelled = True
+            self._counts['timed_out'] += 1
+            self._refund(user, ticket.charged)
+        raise TimeoutError(f'No Gemini slot within {timeout}s')
+
+    def release(self, ticket: Ticket, refund: bool = False):
+        """
+        Frees the ticket's slot and settles its estimate against the reported tokens;
+        refund means the call failed without an answer.
+        """
+        with self._lock:
+            self._running[ticket.kind] -= 1
+            self._settle(ticket, failed=refund)
+            self._dispatch()
+
+    # --- Accounting ---
+    def record_usage(self, prompt_tokens: int, output_tokens: int,
+                     caller: Optional[Tuple[Optional[str], str]] = None):
+        """Adds a call's actual tokens to its user's totals; release() settles them with the bucket."""
+        user, _ = caller or current_caller()
+        with self._lock:
+            account = self._account(user)
+            account['prompt_tokens'] += prompt_tokens
+            account['output_tokens'] += output_tokens
+            account['cost_usd'] += prompt_tokens * self.prompt_price + output_tokens * self.output_price
+            if user is not None:
+                self._reported[user] = self._reported.get(user, 0) + prompt_tokens + output_tokens
+
+    def usage(self, user: Optional[str] = None, top: int = 20) -> Any:
+        """One user's totals, or the top users by estimated cost."""
+        with self._lock:
+            if user is not None:
+                account = dict(self._account(user))
+                bucket = self._buckets.get(user)
+                account['bucket_tokens'] = round(bucket[0], 1) if bucket else self.burst_tokens
+                return account
+            ranked = sorted(self._usage.items(), key=lambda item: item[1]['cost_usd'], reverse=True)[:top]
+            return [dict(account, user=name) for name, account in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counts, running=self._running[INTERACTIVE] + self._running[BATCH],
+                        waiting=sum(len(queue) for queue in self._queues.values()), users=len(self._usage))
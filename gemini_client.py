@@ -0,0 +1,540 @@
+import asyncio
+import contextvars
+import json
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from fair_scheduler import current_caller
+from metrics import estimate_tokens, record_error, record_tokens
+from resilience import CircuitBreaker, RetryPolicy, is_retryable
+
+# Label: Shared Gemini Client
+# Every helper in Chatbot.py used to build a fresh genai.GenerativeModel per call
+# and block on it with no limit on how many calls were in flight. GeminiClient
+# caches model objects per (model name, config), caps in-flight requests with a
+# semaphore, applies a timeout to every call, and offers the same call as a
+# sync and an async API so independent requests can be overlapped.
+# The backend is pluggable: GenaiBackend talks to the real API, FakeBackend
+# answers locally with configurable latency/failures for offline load tests.
+# Every call also goes through the resilience policies (resilience.py): deadline-
+# aware retries, an optional hedged second request when the first is slow, and a
+# circuit breaker that fails fast while the API is unhealthy.
+# With a scheduler (fair_scheduler.FairScheduler), which caller's call takes the
+# next slot is decided per user and priority instead of first come, first served.
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_CONCURRENCY = 8
+# Output tokens assumed for scheduling when the config sets no max_output_tokens
+DEFAULT_OUTPUT_ESTIMATE = 512
+
+
+def _config_dict(generation_config) -> Dict[str, Any]:
+    if generation_config is None:
+        return {}
+    if isinstance(generation_config, dict):
+        return generation_config
+    return vars(generation_config)
+
+
+def _estimated_cost(prompt, generation_config) -> int:
+    """Tokens a call is expected to use: the prompt plus the longest answer its config allows."""
+    output = _config_dict(generation_config).get('max_output_tokens') or DEFAULT_OUTPUT_ESTIMATE
+    return estimate_tokens(str(prompt)) + output
+
+
+def _config_key(generation_config) -> str:
+    if generation_config is None:
+        return ''
+    if isinstance(generation_config, dict):
+        return json.dumps(generation_config, sort_keys=True, default=str)
+    return repr(generation_config)
+
+
+class GenaiBackend:
+    """
+    Calls the real google.generativeai API. The library (slow to import) is loaded
+    and configured on the first call, or by warm_up().
+    """
+
+    def __init__(self, api_key: str = ''):
+        self.api_key = api_key
+        self.genai = None
+        self._models: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _library(self):
+        # Called with the lock held
+        if self.genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self.genai = genai
+        return self.genai
+
+    def warm_up(self, model_name: str = DEFAULT_MODEL):
+        self._model(model_name)
+
+    def _model(self, model_name: str, generation_config=None, system_instruction: Optional[str] = None):
+        # Models are built once per (name, config, system instruction) and reused
+        key = (model_name, _config_key(generation_config), system_instruction)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._library().GenerativeModel(
+                        model_name,
+                        generation_config=generation_config,
+                        system_instruction=system_instruction,
+                    )
+                    self._models[key] = model
+        return model
+
+    def generate(self, prompt, model_name, generation_config=None, timeout=DEFAULT_TIMEOUT,
+                 system_instruction=None) -> str:
+        model = self._model(model_name, generation_config, system_instruction)
+        response = model.generate_content(prompt, request_options={'timeout': timeout})
+        self._record_usage(response)
+        return response.text
+
+    async def agenerate(self, prompt, model_name, generation_config=None, timeout=DEFAULT_TIMEOUT,
+                        system_instruction=None) -> str:
+        model = self._model(model_name, generation_config, system_instruction)
+        response = await model.generate_content_async(prompt, request_options={'timeout': timeout})
+        self._record_usage(response)
+        return response.text
+
+    def stream(self, prompt, model_name, generation_config=None, timeout=DEFAULT_TIMEOUT,
+               system_instruction=None) -> Iterator[str]:
+        model = self._model(model_name, generation_config, system_instruction)
+        chunk = None
+        for chunk in model.generate_content(prompt, stream=True, request_options={'timeout': timeout}):
+            if chunk.text:
+                yield chunk.text
+        # The usage totals arrive with the final chunk
+        if chunk is not None:
+            self._record_usage(chunk)
+
+    @staticmethod
+    def _record_usage(response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            record_tokens(getattr(usage, 'prompt_token_count', 0) or 0,
+                          getattr(usage, 'candidates_token_count', 0) or 0)
+
+
+def _fake_for_schema(schema) -> Any:
+    """A minimal value matching a response_schema, so schema-validated callers get usable fake answers."""
+    kind = schema.get('type')
+    if kind == 'object':
+        return {key: _fake_for_schema(child) for key, child in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [_fake_for_schema(schema.get('items', {'type': 'string'}))]
+    return {'string': 'Fake item', 'integer': 1, 'number': 1.0, 'boolean': True}.get(kind)
+
+
+def _default_fake_response(prompt, model_name, generation_config) -> str:
+    config = _config_dict(generation_config)
+    if config.get('response_mime_type') == 'application/json':
+        schema = config.get('response_schema')
+        return json.dumps(_fake_for_schema(schema)) if isinstance(schema, dict) else '{}'
+    return f'Fake response from {model_name}.'
+
+
+class FakeBackend:
+    """
+    Local stand-in for the Gemini API. Sleeps for latency (+/- jitter) seconds and
+    fails failure_rate of the calls, so the layers above can be load-tested offline.
+    tail_rate of the calls take tail_latency seconds instead, to model a slow tail.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, failure_rate: float = 0.0,
+                 responder: Optional[Callable[[str, str, Any], str]] = None, seed: Optional[int] = None,
+                 tail_rate: float = 0.0, tail_latency: float = 5.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.responder = responder or _default_fake_response
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan(self, timeout):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            if self._random.random() < self.tail_rate:
+                delay = self.tail_latency
+            fails = self._random.random() < self.failure_rate
+        return delay, fails
+
+    def _answer(self, prompt, model_name, generation_config, fails):
+        if fails:
+            raise RuntimeError('FakeBackend: simulated upstream failure')
+        text = self.responder(prompt, model_name, generation_config)
+        record_tokens(estimate_tokens(str(prompt)), estimate_tokens(text))
+        return text
+
+    def generate(self, prompt, model_name, generation_config=None, timeout=DEFAULT_TIMEOUT,
+                 system_instruction=None) -> str:
+        delay, fails = self._plan(timeout)
+        if delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f'FakeBackend: no response within {timeout}s')
+        time.sleep(delay)
+        return self._answer(prompt, model_name, generation_config, fails)
+
+    async def agenerate(self, prompt, model_name, generation_config=None, timeout=DEFAULT_TIMEOUT,
+                        system_instruction=None) -> str:
+        delay, fails = self._plan(timeout)
+        await asyncio.sleep(delay)
+        return self._answer(prompt, model_name, generation_config, fails)
+
+    def stream(self, prompt, model_name, generation_config=None, timeout=DEFAULT_TIMEOUT,
+               system_instruction=None) -> Iterator[str]:
+        # The full latency is spread over the chunks, so the first one arrives early
+        delay, fails = self._plan(timeout)
+        text = self._answer(prompt, model_name, generation_config, fails)
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)] or ['']
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield chunk
+
+
+class GeminiClient:
+    """Concurrency-limited, retrying sync + async front end over a Gemini backend."""
+
+    def __init__(self, backend, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 default_timeout: float = DEFAULT_TIMEOUT, retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, hedge_after: Optional[float] = None,
+                 scheduler=None):
+        self.backend = backend
+        self.scheduler = scheduler
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=1)
+        self.breaker = breaker
+        # Seconds to wait on a call before racing a second copy of it (None: never hedge)
+        self.hedge_after = hedge_after
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        # asyncio semaphores belong to one event loop, so keep one per loop
+        self._async_slots = weakref.WeakKeyDictionary()
+        self._hedge_pool = (ThreadPoolExecutor(max_workers=2 * max_concurrency, thread_name_prefix='gemini-hedge')
+                            if hedge_after else None)
+        # The scheduler blocks, so async callers wait for it on these threads
+        self._admit_pool = (ThreadPoolExecutor(max_workers=4 * max_concurrency, thread_name_prefix='gemini-admit')
+                            if scheduler is not None else None)
+        self._in_flight = 0
+        self._counts = {'retries': 0, 'hedges': 0, 'hedge_wins': 0}
+        self._count_lock = threading.Lock()
+
+    def _track(self, delta: int):
+        with self._count_lock:
+            self._in_flight += delta
+
+    def _count(self, name: str):
+        with self._count_lock:
+            self._counts[name] += 1
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        with self._count_lock:
+            counts = dict(self._counts, in_flight=self._in_flight)
+        if self.breaker is not None:
+            counts['breaker'] = self.breaker.stats()
+        return counts
+
+    def warm_up(self):
+        """Loads the backend's library and default model now rather than on the first call."""
+        warm_up = getattr(self.backend, 'warm_up', None)
+        if warm_up is not None:
+            warm_up()
+
+    # --- Scheduling ---
+    def _admit(self, prompt, generation_config, timeout: float):
+        """Waits for the scheduler to let this caller's call start (a no-op without a scheduler)."""
+        if self.scheduler is None:
+            return None
+        return self.scheduler.acquire(_estimated_cost(prompt, generation_config), timeout)
+
+    def _leave(self, ticket, failed: bool = False):
+        # A call that failed or never started doesn't count against the user's rate
+        if ticket is not None:
+            self.scheduler.release(ticket, refund=failed)
+
+    async def _aadmit(self, prompt, generation_config, timeout: float):
+        if self.scheduler is None:
+            return None
+        admitted = self._admit_pool.submit(self.scheduler.acquire, _estimated_cost(prompt, generation_config),
+                                           timeout, current_caller())
+        try:
+            return await asyncio.wrap_future(admitted)
+        except asyncio.CancelledError:
+            # Timed out while waiting: a slot granted after that must still be given back
+            admitted.add_done_callback(
+                lambda done: done.cancelled() or done.exception() or self._leave(done.result(), failed=True))
+            raise
+
+    # --- Resilience ---
+    def _before_attempt(self):
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+    def _after_attempt(self, error: Optional[BaseException]):
+        if self.breaker is None:
+            return
+        # A rejected request (bad prompt, auth) still means the API is up
+        if error is not None and is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _with_retries(self, attempt: Callable[[float], Any], deadline: float):
+        """Runs attempt(remaining_seconds) until it succeeds, the policy gives up or the deadline passes."""
+        number = 0
+        while True:
+            self._before_attempt()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError('Gemini deadline passed before the call could be made')
+            try:
+                result = attempt(remaining)
+            except Exception as e:
+                self._after_attempt(e)
+                delay = self.retry_policy.next_delay(e, number, deadline - time.monotonic())
+                if delay is None:
+                    raise
+                self._count('retries')
+                time.sleep(delay)
+                number += 1
+                continue
+            self._after_attempt(None)
+            return result
+
+    def _hedged(self, call: Callable[[float], Any], remaining: float):
+        """
+        Runs call(timeout); if it has not answered within hedge_after seconds, races an
+        identical call (when a concurrency slot is free) and returns the first success.
+        """
+        if not self.hedge_after or remaining <= self.hedge_after:
+            return call(remaining)
+        deadline = time.monotonic() + remaining
+        # Both copies run in the caller's context, so their tokens are attributed to it
+        primary = self._hedge_pool.submit(contextvars.copy_context().run, call, remaining)
+        try:
+            return primary.result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+
+        pending = {primary}
+        hedge = None
+        if self._sync_slots.acquire(blocking=False):
+            self._count('hedges')
+            self._track(1)
+            hedge = self._hedge_pool.submit(contextvars.copy_context().run, call,
+                                            max(0.1, deadline - time.monotonic()))
+            # The loser keeps running in the background, so its slot is freed when it ends
+            hedge.add_done_callback(lambda _: (self._track(-1), self._sync_slots.release()))
+            pending.add(hedge)
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f'No Gemini response within {remaining:.1f}s')
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    # --- Calls ---
+    def generate(self, prompt: str, model_name: str = DEFAULT_MODEL, generation_config=None,
+                 timeout: Optional[float] = None, system_instruction: Optional[str] = None) -> str:
+        """
+        Blocking call. Waits for a free slot, then for the response (retried and
+        hedged per the client's policies), all within timeout.
+        """
+        timeout = timeout or self.default_timeout
+        deadline = time.monotonic() + timeout
+        ticket = self._admit(prompt, generation_config, timeout)
+        if not self._sync_slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._leave(ticket, failed=True)
+            raise TimeoutError(f'No free Gemini slot within {timeout}s')
+        self._track(1)
+
+        def call(remaining):
+            return self.backend.generate(prompt, model_name, generation_config, remaining,
+                                         system_instruction=system_instruction)
+
+        failed = False
+        try:
+            return self._with_retries(lambda remaining: self._hedged(call, remaining), deadline)
+        except Exception:
+            failed = True
+            record_error()
+            raise
+        finally:
+            self._track(-1)
+            self._sync_slots.release()
+            self._leave(ticket, failed)
+
+    def stream(self, prompt: str, model_name: str = DEFAULT_MODEL, generation_config=None,
+               timeout: Optional[float] = None, system_instruction: Optional[str] = None) -> Iterator[str]:
+        """
+        Yields the response text chunk by chunk; holds one slot until the stream ends.
+        A failure before the first chunk is retried; after it, it is raised.
+        """
+        timeout = timeout or self.default_timeout
+        deadline = time.monotonic() + timeout
+        ticket = self._admit(prompt, generation_config, timeout)
+        if not self._sync_slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._leave(ticket, failed=True)
+            raise TimeoutError(f'No free Gemini slot within {timeout}s')
+        self._track(1)
+
+        def first_chunk(remaining):
+            chunks = iter(self.backend.stream(prompt, model_name, generation_config, remaining,
+                                              system_instruction=system_instruction))
+            return chunks, next(chunks, None)
+
+        # Only a stream that failed before its first chunk produced nothing to pay for
+        failed = True
+        try:
+            chunks, first = self._with_retries(first_chunk, deadline)
+            failed = False
+            if first is not None:
+                yield first
+                yield from chunks
+        except Exception:
+            record_error()
+            raise
+        finally:
+            self._track(-1)
+            self._sync_slots.release()
+            self._leave(ticket, failed)
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+    async def _ahedged(self, call, remaining: float):
+        """Async counterpart of _hedged(); the hedge shares the caller's slot."""
+        if not self.hedge_after or remaining <= self.hedge_after:
+            return await asyncio.wait_for(call(remaining), remaining)
+        primary = asyncio.ensure_future(call(remaining))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        self._count('hedges')
+        hedge = asyncio.ensure_future(call(remaining - self.hedge_after))
+        pending = {primary, hedge}
+        try:
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=remaining - self.hedge_after,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError(f'No Gemini response within {remaining:.1f}s')
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def agenerate(self, prompt: str, model_name: str = DEFAULT_MODEL, generation_config=None,
+                        timeout: Optional[float] = None, system_instruction: Optional[str] = None) -> str:
+        """Async call with the same concurrency limit, timeout and resilience policies as generate()."""
+        timeout = timeout or self.default_timeout
+        deadline = time.monotonic() + timeout
+
+        def call(remaining):
+            return self.backend.agenerate(prompt, model_name, generation_config, remaining,
+                                          system_instruction=system_instruction)
+
+        async def limited():
+            ticket = await self._aadmit(prompt, generation_config, timeout)
+            failed = True
+            try:
+                async with self._loop_slots():
+                    self._track(1)
+                    try:
+                        number = 0
+                        while True:
+                            self._before_attempt()
+                            remaining = deadline - time.monotonic()
+                            try:
+                                result = await self._ahedged(call, remaining)
+                            except Exception as e:
+                                self._after_attempt(e)
+                                delay = self.retry_policy.next_delay(e, number, deadline - time.monotonic())
+                                if delay is None:
+                                    raise
+                                self._count('retries')
+                                await asyncio.sleep(delay)
+                                number += 1
+                                continue
+                            self._after_attempt(None)
+                            failed = False
+                            return result
+                    finally:
+                        self._track(-1)
+            finally:
+                self._leave(ticket, failed)
+
+        try:
+            return await asyncio.wait_for(limited(), timeout)
+        except Exception:
+            record_error()
+            raise
+
+    async def agenerate_many(self, requests: Iterable[Dict[str, Any]]) -> List[Any]:
+        """
+        Runs several agenerate(**request) calls concurrently. Failed calls come back
+        as their exception instead of cancelling the others.
+        """
+        return await asyncio.gather(*(self.agenerate(**request) for request in requests),
+                                    return_exceptions=True)
+
+    def generate_many(self, requests: Iterable[Dict[str, Any]]) -> List[Any]:
+        """Sync wrapper around agenerate_many for callers outside an event loop."""
+        return asyncio.run(self.agenerate_many(list(requests)))
+
+
+def build_client(backend_name: str = 'genai', api_key: str = '',
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 default_timeout: float = DEFAULT_TIMEOUT, fake_latency: float = 0.5,
+                 max_attempts: int = 1, hedge_after: Optional[float] = None,
+                 breaker_failures: int = 0, breaker_cooldown: float = 30.0, scheduler=None) -> GeminiClient:
+    """
+    Builds the client for the configured backend ('genai' or 'fake'). breaker_failures=0
+    disables the circuit breaker; hedge_after=None disables hedging.
+    """
+    if backend_name == 'fake':
+        backend = FakeBackend(latency=fake_latency)
+    else:
+        backend = GenaiBackend(api_key=api_key)
+    breaker = CircuitBreaker(breaker_failures, breaker_cooldown) if breaker_failures > 0 else None
+    return GeminiClient(backend, max_concurrency=max_concurrency, default_timeout=default_timeout,
+                        retry_policy=RetryPolicy(max_attempts=max_attempts), breaker=breaker,
+                        hedge_after=hedge_after, scheduler=scheduler)
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from pdf_extract import ExtractionError, PDF_WORKERS, extract_text, file_sha256, text_fingerprint
+from profile_store import profile_store
+from skill_extractor import extract_profile_fields
+
+# Label: Bulk Resume Ingestion
+# Onboarding a cohort through /upload means one request and one Gemini call per
+# resume. This command takes a directory or .zip of PDFs instead:
+#   python ingest.py cohort.zip --batch-size 8
+# Text is extracted on a process pool, skills/emails/phones come from the local
+# extractor, and several resumes are packed into each Gemini request for the
+# fields only the model can fill in. Each batch is written to the profile store
+# in one transaction and appended to a checkpoint file, so re-running the same
+# command after an interruption skips everything already ingested.
+# Usernames are taken from the file names (jane_doe.pdf -> jane_doe).
+
+DEFAULT_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '5'))
+DEFAULT_CONCURRENCY = int(os.getenv('INGEST_CONCURRENCY', '4'))
+
+
+def username_for(path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', stem).strip('_') or 'resume'
+
+
+def list_pdfs(directory: str) -> List[str]:
+    pdfs = []
+    for root, _, files in os.walk(directory):
+        pdfs.extend(os.path.join(root, name) for name in files if name.lower().endswith('.pdf'))
+    return sorted(pdfs)
+
+
+def unpack_zip(zip_path: str, target_dir: str) -> List[str]:
+    """Extracts only the PDFs, flattened to their base names (no path traversal)."""
+    pdfs = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            name = os.path.basename(member.filename)
+            if member.is_dir() or not name.lower().endswith('.pdf'):
+                continue
+            out_path = os.path.join(target_dir, name)
+            if os.path.exists(out_path):
+                # Same file name in two folders of the archive
+                out_path = os.path.join(target_dir, f"{len(pdfs)}_{name}")
+            with archive.open(member) as src, open(out_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(64 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            pdfs.append(out_path)
+    return sorted(pdfs)
+
+
+def _extract_one(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker-process task: extracts one PDF (pages serially, we are already parallel)."""
+    path = item['path']
+    try:
+        item['text'] = extract_text(path, parallel=False).text
+    except ExtractionError as e:
+        item['error'] = str(e)
+    return item
+
+
+class Checkpoint:
+    """
+    Append-only JSONL of stored files, so an interrupted run can pick up where it
+    stopped. Failed files are not recorded and are retried on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)['file_fp'])
+                    except (ValueError, KeyError):
+                        continue  # A torn last line from a killed run
+
+    def record(self, items: List[Dict[str, Any]]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for item in items:
+                f.write(json.dumps({'file_fp': item['file_fp'], 'username': item['username']}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(item['file_fp'] for item in items)
+
+
+class IngestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0
+        self.skipped = 0
+        self.reused = 0
+        self.parsed = 0
+        self.failed = 0
+        self.api_calls = 0
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        processed = self.reused + self.parsed + self.failed
+        return {
+            'total': self.total,
+            'skipped_from_checkpoint': self.skipped,
+            'reused_previous_parse': self.reused,
+            'parsed': self.parsed,
+            'failed': self.failed,
+            'elapsed_s': round(elapsed, 2),
+            'resumes_per_s': round(processed / elapsed, 2) if elapsed else 0.0,
+            'api_calls': self.api_calls,
+            'api_calls_per_resume': round(self.api_calls / processed, 3) if processed else 0.0,
+        }
+
+
+def _parse_batch(batch: List[Dict[str, Any]], parse_batch) -> int:
+    """Fills in the model-only fields for a batch; returns the number of API calls made."""
+    from Chatbot import LLM_ONLY_FIELDS, parse_resume_with_gemini
+
+    results = parse_batch([item['text'] for item in batch], fields=LLM_ONLY_FIELDS)
+    calls = 1
+    for item, enriched in zip(batch, results):
+        if 'error' in enriched:
+            # Dropped from the packed answer: give it one request of its own
+            enriched = parse_resume_with_gemini(item['text'], fields=LLM_ONLY_FIELDS)
+            calls += 1
+        if 'error' in enriched:
+            item['error'] = enriched.get('details') or enriched['error']
+        else:
+            # The deterministic local fields win over anything the model returned for them
+            item['data'] = dict(enriched, **extract_profile_fields(item['text']))
+    return calls
+
+
+def _store(items: List[Dict[str, Any]]):
+    stored = [item for item in items if 'data' in item]
+    profile_store.save_many(
+        {'username': item['username'], 'data': item['data'], 'fingerprint': item['file_fp'],
+         'source': 'batch:' + os.path.basename(item['path'])}
+        for item in stored
+    )
+    for item in stored:
+        if not item.get('reused'):
+            profile_store.remember_parse([item['file_fp'], text_fingerprint(item['text'])], item['data'])
+
+
+def ingest(pdfs: List[str], checkpoint: Checkpoint, batch_size: int = DEFAULT_BATCH_SIZE,
+           concurrency: int = DEFAULT_CONCURRENCY, workers: int = PDF_WORKERS,
+           parse_batch=None, log=print) -> Dict[str, Any]:
+    """Runs the whole pipeline over pdfs and returns the throughput stats."""
+    if parse_batch is None:
+        from Chatbot import parse_resumes_batch_with_gemini as parse_batch
+
+    stats = IngestStats()
+    stats.total = len(pdfs)
+
+    with ProcessPoolExecutor(max_workers=workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as model_pool:
+        # Hashing is cheap next to extraction, so filter out finished files first
+        todo = []
+        for path in pdfs:
+            item = {'path': path, 'username': username_for(path), 'file_fp': 'file:' + file_sha256(path)}
+            if item['file_fp'] in checkpoint.done:
+                stats.skipped += 1
+            else:
+                todo.append(item)
+
+        pending, batch_futures = [], []
+        for item in extract_pool.map(_extract_one, todo, chunksize=4):
+            if 'error' not in item and not item['text'].strip():
+                item['error'] = 'Could not extract text from PDF.'
+            if 'error' in item:
+                stats.failed += 1
+                log(f"  {os.path.basename(item['path'])}: {item['error']}")
+                continue
+
+            previous = profile_store.lookup_parse(item['file_fp'], text_fingerprint(item['text']))
+            if previous is not None:
+                item['data'], item['reused'] = previous, True
+                _store([item])
+                checkpoint.record([item])
+                stats.reused += 1
+                continue
+
+            pending.append(item)
+            if len(pending) >= batch_size:
+                batch_futures.append((pending, model_pool.submit(_parse_batch, pending, parse_batch)))
+                pending = []
+
+        if pending:
+            batch_futures.append((pending, model_pool.submit(_parse_batch, pending, parse_batch)))
+
+        for batch, future in batch_futures:
+            try:
+                stats.api_calls += future.result()
+            except Exception as e:
+                for item in batch:
+                    item.setdefault('error', str(e))
+            _store(batch)
+            for item in batch:
+                if 'data' in item:
+                    stats.parsed += 1
+                else:
+                    stats.failed += 1
+                    log(f"  {os.path.basename(item['path'])}: {item['error']}")
+            checkpoint.record([item for item in batch if 'data' in item])
+            log(f"  stored batch of {len(batch)} ({stats.parsed + stats.reused} ingested so far)")
+
+    return stats.report()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Bulk-ingest a directory or .zip of PDF resumes.')
+    parser.add_argument('source', help='directory of PDFs, or a .zip file containing them')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='resumes packed into one Gemini request')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Gemini requests in flight at once')
+    parser.add_argument('--workers', type=int, default=PDF_WORKERS, help='PDF extraction processes')
+    parser.add_argument('--checkpoint', help='progress file (default: <source>.ingest.jsonl)')
+    args = parser.parse_args(argv)
+
+    source = args.source.rstrip('/\\')
+    checkpoint = Checkpoint(args.checkpoint or source + '.ingest.jsonl')
+
+    with tempfile.TemporaryDirectory(prefix='ingest-') as scratch:
+        if zipfile.is_zipfile(source):
+            pdfs = unpack_zip(source, scratch)
+        elif os.path.isdir(source):
+            pdfs = list_pdfs(source)
+        else:
+            print(f"Not a directory or zip file: {source}", file=sys.stderr)
+            return 2
+
+        print(f"Ingesting {len(pdfs)} PDF(s) from {source} "
+              f"({len(checkpoint.done)} already done per {checkpoint.path})")
+        report = ingest(pdfs, checkpoint, batch_size=max(1, args.batch_size),
+                        concurrency=max(1, args.concurrency), workers=max(1, args.workers))
+
+    print(json.dumps(report, indent=2))
+    return 0 if report['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
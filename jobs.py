@@ -0,0 +1,151 @@
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Label: Background Job Queue
+# /generate, /generate_roadmap_data and /upload used to hold a Flask worker for
+# the whole Gemini round trip. They now hand the work to this in-process pool
+# and return a job id straight away; the browser polls /jobs/<id> for the result.
+# No external broker: a ThreadPoolExecutor plus a bounded count of pending jobs.
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the number of queued + running jobs has reached max_pending."""
+
+
+class Job:
+    def __init__(self, kind: str, owner: Optional[str], dedup_key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.dedup_key = dedup_key
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.status_code = 200
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'status_code': self.status_code,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Runs callables on a bounded worker pool. A callable returns either a JSON-able
+    dict or a (dict, http_status) tuple, mirroring what a Flask route would return.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, result_ttl: float = 600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ignite-job')
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[Any, Job] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, owner: Optional[str] = None,
+               dedup_key=None, **kwargs) -> Job:
+        """
+        Queues fn(*args, **kwargs). If a job with the same dedup_key is still queued
+        or running, that job is returned instead of starting a second one.
+        """
+        with self._lock:
+            self._prune()
+            if dedup_key is not None:
+                existing = self._inflight.get(dedup_key)
+                if existing is not None and not existing.finished:
+                    return existing
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f'{self._pending} jobs already pending')
+
+            job = Job(kind, owner, dedup_key)
+            self._jobs[job.id] = job
+            if dedup_key is not None:
+                self._inflight[dedup_key] = job
+            self._pending += 1
+
+        # The job runs in the submitter's context (who is calling, for fair scheduling)
+        self._executor.submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            payload, status_code = self._normalize(fn(*args, **kwargs))
+            job.result = payload
+            job.status_code = status_code
+            job.status = DONE if status_code < 400 else FAILED
+        except Exception as e:
+            print(f"Background job {job.kind} ({job.id}) failed: {e}")
+            job.result = {'error': 'An unexpected error occurred during processing.'}
+            job.status_code = 500
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+                if job.dedup_key is not None and self._inflight.get(job.dedup_key) is job:
+                    del self._inflight[job.dedup_key]
+            job._done.set()
+
+    @staticmethod
+    def _normalize(result) -> Tuple[Dict[str, Any], int]:
+        if isinstance(result, tuple):
+            return result[0], result[1]
+        return result, 200
+
+    def _prune(self):
+        # Called with the lock held; forgets finished jobs nobody has polled for a while
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def inflight(self, dedup_key) -> Optional[Job]:
+        """Returns the queued/running job for dedup_key, if there is one."""
+        with self._lock:
+            job = self._inflight.get(dedup_key)
+            return job if job is not None and not job.finished else None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'tracked': len(self._jobs),
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+            }
@@ -0,0 +1,304 @@
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Label: Instrumentation
+# Until now the only visibility was print() output. This module keeps counters
+# and latency histograms in process memory and renders them in the Prometheus
+# text format for GET /metrics:
+#   ignite_http_request_seconds{route,method,status}   per-route latency
+#   ignite_gemini_call_seconds{function}                per Chatbot function
+#   ignite_gemini_errors_total{function}               failed model calls
+#   ignite_gemini_tokens_total{function,kind}          prompt / output tokens
+#   ignite_io_seconds{op}                               profile store, users.json, PDF
+#   ignite_prompt_tokens{prompt}                        estimated prompt sizes (prompt_builder)
+# Set IGNITE_TRACE_SAMPLE_RATE (0..1) to also record a span tree for that share
+# of requests; finished traces are logged (logger 'metrics', INFO) and kept for
+# GET /metrics/traces. /metrics and /metrics/traces are for admins or a scraper
+# holding IGNITE_METRICS_TOKEN.
+# No client library needed: the exposition format is a few lines of text.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+TRACE_SAMPLE_RATE = float(os.getenv('IGNITE_TRACE_SAMPLE_RATE', '0'))
+TRACE_HISTORY = int(os.getenv('IGNITE_TRACE_HISTORY', '100'))
+
+LabelValues = Tuple[str, ...]
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_text(self.labels, values)} {total:g}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects it."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                    lines.append(f'{self.name}_bucket{_label_text(self.labels, values, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_label_text(self.labels, values)} {total:.6f}')
+                lines.append(f'{self.name}_count{_label_text(self.labels, values)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        # Callables returning (name, help, value) gauges read at scrape time (queue depth, cache size...)
+        self._gauges: List[Callable[[], Iterable[Tuple[str, str, float]]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_gauges(self, collect: Callable[[], Iterable[Tuple[str, str, float]]]):
+        self._gauges.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._gauges:
+            try:
+                gauges = list(collect())
+            except Exception as e:
+                print(f"Metrics gauge collection failed: {e}")
+                continue
+            for name, help_text, value in gauges:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value:g}']
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_SECONDS = REGISTRY.histogram('ignite_http_request_seconds', 'Request latency by route.',
+                                  ('route', 'method', 'status'))
+GEMINI_SECONDS = REGISTRY.histogram('ignite_gemini_call_seconds', 'Latency of Chatbot functions that call Gemini.',
+                                    ('function',))
+GEMINI_ERRORS = REGISTRY.counter('ignite_gemini_errors_total', 'Gemini calls that raised.', ('function',))
+GEMINI_TOKENS = REGISTRY.counter('ignite_gemini_tokens_total', 'Tokens sent to / received from Gemini.',
+                                 ('function', 'kind'))
+IO_SECONDS = REGISTRY.histogram('ignite_io_seconds', 'File and database I/O latency by operation.', ('op',))
+PROMPT_TOKENS = REGISTRY.histogram('ignite_prompt_tokens', 'Estimated size of each built prompt, in tokens.',
+                                   ('prompt',), buckets=TOKEN_BUCKETS)
+PROMPT_COMPACTIONS = REGISTRY.counter('ignite_prompt_compactions_total',
+                                      'Prompt sections shortened to fit their token budget.', ('prompt', 'section'))
+
+# The Chatbot function currently running on this thread, so token counts reported
+# deep inside the client are attributed to it
+_current_function = contextvars.ContextVar('ignite_gemini_function', default='other')
+
+
+# --- Tracing ---
+class Trace:
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Dict[str, object]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, started: float, seconds: float, error: Optional[str] = None):
+        span = {'name': name, 'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round(seconds * 1000, 3)}
+        if error:
+            span['error'] = error
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self, total_seconds: float, **attributes) -> Dict[str, object]:
+        return dict(attributes, trace_id=self.id, name=self.name, started_at=self.started_at,
+                    duration_ms=round(total_seconds * 1000, 3), spans=self.spans)
+
+
+_current_trace = contextvars.ContextVar('ignite_trace', default=None)
+recent_traces = deque(maxlen=TRACE_HISTORY)
+
+
+def start_trace(name: str, sample_rate: float = TRACE_SAMPLE_RATE):
+    """Starts a trace for this request with probability sample_rate; returns a token for finish_trace."""
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return None
+    return _current_trace.set(Trace(name))
+
+
+def finish_trace(token, total_seconds: float, **attributes):
+    if token is None:
+        return
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is not None:
+        record = trace.to_dict(total_seconds, **attributes)
+        recent_traces.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('trace %s', json.dumps(record))
+
+
+@contextmanager
+def span(name: str):
+    """Times a block as a span of the current trace (a no-op when the request isn't sampled)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, started, time.perf_counter() - started, error)
+
+
+# --- Helpers used by the instrumented modules ---
+def observe_request(route: str, method: str, status: int, seconds: float):
+    HTTP_SECONDS.observe(seconds, route, method, str(status))
+
+
+_token_listeners: List[Callable[[int, int], None]] = []
+
+
+def on_tokens(listener: Callable[[int, int], None]):
+    """Also calls listener(prompt_tokens, output_tokens) for every model call (e.g. per-user accounting)."""
+    _token_listeners.append(listener)
+
+
+def record_tokens(prompt_tokens: int, output_tokens: int):
+    function = _current_function.get()
+    if prompt_tokens:
+        GEMINI_TOKENS.inc(function, 'prompt', amount=prompt_tokens)
+    if output_tokens:
+        GEMINI_TOKENS.inc(function, 'output', amount=output_tokens)
+    for listener in _token_listeners:
+        listener(prompt_tokens, output_tokens)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text; used where the API gives no count
+    return (len(text) + 3) // 4
+
+
+def record_error():
+    # Counted where the model call fails: most Chatbot functions catch and return a fallback
+    GEMINI_ERRORS.inc(_current_function.get())
+
+
+def instrument_gemini(function: Callable) -> Callable:
+    """Records latency of a Chatbot function; its model calls report tokens and errors under its name."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current_function.set(name)
+        started = time.perf_counter()
+        try:
+            with span('gemini.' + name):
+                return function(*args, **kwargs)
+        finally:
+            GEMINI_SECONDS.observe(time.perf_counter() - started, name)
+            _current_function.reset(token)
+
+    return wrapper
+
+
+@contextmanager
+def timed_io(op: str):
+    started = time.perf_counter()
+    try:
+        with span('io.' + op):
+            yield
+    finally:
+        IO_SECONDS.observe(time.perf_counter() - started, op)
+
+
+def instrument_io(op: str) -> Callable[[Callable], Callable]:
+    """Decorator form of timed_io()."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed_io(op):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+# Label: Rendered Page Cache
+# /dashboard and /roadmap re-rendered their (large) templates on every visit even
+# though the inputs only change when the user's profile or account is written.
+# Pages are cached per user under an ETag derived from those inputs (page name,
+# profile version + last write time, account record, ...), so a stale entry can
+# never be served: a write changes the ETag. Writers also call invalidate() so
+# superseded pages don't sit in memory. The ETag is sent to the browser, which
+# then gets a bodiless 304 while nothing has changed. A page's gzipped HTML is
+# kept with it, so a hit doesn't compress it again.
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class CachedPage:
+    def __init__(self, html: str, etag: str, last_modified: float):
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self._gzipped: Optional[bytes] = None
+
+    def gzipped(self, level: int) -> bytes:
+        """The page gzip-compressed, compressed once and kept alongside the HTML."""
+        if self._gzipped is None:
+            # A race only compresses the same bytes twice
+            self._gzipped = gzip.compress(self.html.encode('utf-8'), compresslevel=level)
+        return self._gzipped
+
+
+def page_etag(page: str, username: str, state: Any) -> str:
+    payload = json.dumps([page, username, state], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class PageCache:
+    """LRU of rendered pages keyed by ETag, with an index of each user's entries."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._pages: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'renders': 0, 'invalidations': 0}
+
+    def _forget(self, etag: str):
+        # Called with the lock held
+        username, _ = self._pages.pop(etag)
+        etags = self._by_user.get(username)
+        if etags is not None:
+            etags.discard(etag)
+            if not etags:
+                del self._by_user[username]
+
+    def get(self, etag: str) -> Optional[CachedPage]:
+        with self._lock:
+            entry = self._pages.get(etag)
+            if entry is None:
+                return None
+            self._pages.move_to_end(etag)
+            self._counts['hits'] += 1
+            return entry[1]
+
+    def put(self, username: str, page: CachedPage):
+        with self._lock:
+            if page.etag in self._pages:
+                self._forget(page.etag)
+            self._pages[page.etag] = (username, page)
+            self._by_user.setdefault(username, set()).add(page.etag)
+            while len(self._pages) > self.max_entries:
+                self._forget(next(iter(self._pages)))
+
+    def render(self, page: str, username: str, state: Any, render: Callable[[], str]) -> CachedPage:
+        """Returns the cached page for this state, or calls render() and caches its HTML."""
+        etag = page_etag(page, username, state)
+        cached = self.get(etag)
+        if cached is not None:
+            return cached
+
+        html = render()
+        # Whole seconds: that is all Last-Modified / If-Modified-Since can carry
+        rendered = CachedPage(html, etag, float(int(time.time())))
+        self.put(username, rendered)
+        with self._lock:
+            self._counts['renders'] += 1
+        return rendered
+
+    def invalidate(self, username: str):
+        """Drops every cached page of this user (call after writing their profile/account)."""
+        with self._lock:
+            for etag in list(self._by_user.get(username, ())):
+                self._forget(etag)
+            self._counts['invalidations'] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts, entries=len(self._pages))
@@ -0,0 +1,178 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+from metrics import instrument_io
+
+# Label: Resume Text Extraction
+# /upload used to hold the whole PDF in memory and extract every page serially
+# in the request thread. Uploads are now spooled to a temp file in fixed-size
+# chunks (hashing as they go), the file is memory-mapped rather than read, and
+# longer documents have their pages extracted in parallel on a process pool.
+# Size, page-count and time limits are enforced, and extraction stops once we
+# have more text than the resume parser will ever use.
+
+MAX_UPLOAD_BYTES = int(os.getenv('RESUME_MAX_BYTES', str(10 * 1024 * 1024)))
+MAX_PAGES = int(os.getenv('RESUME_MAX_PAGES', '20'))
+EXTRACT_TIMEOUT = float(os.getenv('RESUME_EXTRACT_TIMEOUT', '20'))
+# A resume prompt never needs more than this; later pages are skipped once we have it
+ENOUGH_TEXT_CHARS = int(os.getenv('RESUME_ENOUGH_CHARS', '30000'))
+PDF_WORKERS = int(os.getenv('RESUME_PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Below this many pages, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 4
+PAGES_PER_TASK = 2
+SPOOL_CHUNK_BYTES = 64 * 1024
+
+
+class ExtractionError(Exception):
+    """The upload was rejected (too big, too many pages, unreadable or too slow)."""
+
+
+class SpooledUpload:
+    def __init__(self, path: str, size: int, sha256: str, spool_ms: float):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.spool_ms = spool_ms
+
+    @property
+    def fingerprint(self) -> str:
+        return 'file:' + self.sha256
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ExtractionResult:
+    def __init__(self, text: str, page_count: int, pages_read: int, timings: Dict[str, float]):
+        self.text = text
+        self.page_count = page_count
+        self.pages_read = pages_read
+        self.timings = timings
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(SPOOL_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@instrument_io('pdf.spool')
+def spool_upload(stream, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """Copies an upload stream to a temp file chunk by chunk, hashing it on the way."""
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix='resume-', suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ExtractionError(f"File is too large (max {max_bytes // (1024 * 1024)} MB).")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, size, digest.hexdigest(), (time.perf_counter() - started) * 1000)
+
+
+def text_fingerprint(text: str) -> str:
+    """Hash of the extracted text with whitespace normalised, so re-exported PDFs of the same resume match."""
+    normalized = ' '.join(text.split()).lower()
+    return 'text:' + hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _open_pdf(path: str):
+    # The mmap stays referenced by the reader for as long as the reader is alive
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Imported here, not at module load: only uploads and the ingest workers read PDFs
+    import PyPDF2
+    return PyPDF2.PdfReader(mapped)
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Worker-process task: extracts the text of pages [start, stop)."""
+    reader = _open_pdf(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pool
+
+
+@instrument_io('pdf.extract')
+def extract_text(path: str, max_pages: int = MAX_PAGES, timeout: float = EXTRACT_TIMEOUT,
+                 enough_chars: int = ENOUGH_TEXT_CHARS, parallel: bool = True) -> ExtractionResult:
+    """
+    Extracts the text of a spooled PDF. Pages are processed in order and
+    extraction stops early once enough_chars characters have been collected.
+    Pass parallel=False when already running inside a worker process.
+    """
+    started = time.perf_counter()
+    deadline = started + timeout
+    try:
+        reader = _open_pdf(path)
+        page_count = len(reader.pages)
+    except Exception as e:
+        raise ExtractionError(f"Could not read PDF: {e}")
+    opened = time.perf_counter()
+
+    if page_count > max_pages:
+        raise ExtractionError(f"Resume has too many pages ({page_count}, max {max_pages}).")
+
+    texts: List[str] = []
+    collected = 0
+    if page_count < PARALLEL_MIN_PAGES or not parallel:
+        for page in reader.pages:
+            if time.perf_counter() > deadline:
+                raise ExtractionError("Timed out while extracting text from PDF.")
+            text = page.extract_text() or ''
+            texts.append(text)
+            collected += len(text)
+            if collected >= enough_chars:
+                break
+    else:
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count))
+                  for start in range(0, page_count, PAGES_PER_TASK)]
+        futures = [_get_pool().submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+        try:
+            # Consume in page order so early stopping keeps the beginning of the resume
+            for future in futures:
+                for text in future.result(timeout=max(0.0, deadline - time.perf_counter())):
+                    texts.append(text)
+                    collected += len(text)
+                if collected >= enough_chars:
+                    break
+        except FutureTimeout:
+            raise ExtractionError("Timed out while extracting text from PDF.")
+        finally:
+            for future in futures:
+                future.cancel()
+
+    finished = time.perf_counter()
+    timings = {
+        'open_ms': round((opened - started) * 1000, 2),
+        'extract_ms': round((finished - opened) * 1000, 2),
+    }
+    return ExtractionResult(''.join(texts), page_count, len(texts), timings)
@@ -0,0 +1,492 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metrics import instrument_io
+
+# Label: Profile Storage
+# Parsed resumes used to live only as parsed_resumes/{username}_{skill}.json and
+# every page load globbed that directory and stat'ed every match to find the
+# newest one. Profiles now live in a small SQLite database keyed by
+# (username, version), so "latest profile for user" is a single index lookup
+# and every upload is kept as its own version.
+# Generated fields are written with patch() (a JSON merge inside SQLite, with an
+# optional expected-version check) instead of rewriting the whole profile, and
+# large generated artifacts (roadmap HTML) live in their own table so reading
+# a user's skills never has to deserialize them.
+
+PROFILE_DIR = 'parsed_resumes'
+PROFILE_DB = 'profiles.db'
+# Profile keys stored as artifacts rather than inside the profile JSON
+ARTIFACT_FIELDS = ('roadmap_html',)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    username   TEXT    NOT NULL,
+    version    INTEGER NOT NULL,
+    source     TEXT,
+    created_at REAL    NOT NULL,
+    data       TEXT    NOT NULL,
+    fingerprint TEXT,
+    updated_at REAL,
+    PRIMARY KEY (username, version)
+);
+CREATE TABLE IF NOT EXISTS parse_index (
+    fingerprint TEXT PRIMARY KEY,
+    data        TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profile_artifacts (
+    username   TEXT    NOT NULL,
+    version    INTEGER NOT NULL,
+    name       TEXT    NOT NULL,
+    content    TEXT    NOT NULL,
+    updated_at REAL    NOT NULL,
+    PRIMARY KEY (username, version, name)
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class VersionConflictError(Exception):
+    """The profile gained a newer version (e.g. a new upload) since the caller read it."""
+
+
+def _split_artifacts(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    profile = {k: v for k, v in data.items() if k not in ARTIFACT_FIELDS}
+    artifacts = {k: data[k] for k in ARTIFACT_FIELDS if data.get(k) is not None}
+    return profile, artifacts
+
+
+class ProfileStore:
+    """Versioned, per-user profile storage backed by SQLite."""
+
+    def __init__(self, db_path: str = PROFILE_DB, legacy_dir: str = PROFILE_DIR):
+        self.db_path = db_path
+        self.legacy_dir = legacy_dir
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite connections must not be shared.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(_SCHEMA)
+                    self._upgrade_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _upgrade_schema(conn: sqlite3.Connection):
+        # Databases created before resume fingerprinting lack this column
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(profiles)')}
+        if 'fingerprint' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE profiles ADD COLUMN fingerprint TEXT')
+        # ...and this one, added for page caching (NULL means "never updated in place")
+        if 'updated_at' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE profiles ADD COLUMN updated_at REAL')
+        # Lets cohort analytics fetch only the versions written since its last refresh
+        with conn:
+            conn.execute('CREATE INDEX IF NOT EXISTS profiles_changed_at '
+                         'ON profiles (COALESCE(updated_at, created_at))')
+            # ...and the similar-profiles index only the artifacts written since its last one
+            conn.execute('CREATE INDEX IF NOT EXISTS profile_artifacts_changed_at '
+                         'ON profile_artifacts (name, updated_at)')
+        # Roadmap HTML used to be stored inside the profile JSON; move it out once
+        if not conn.execute("SELECT 1 FROM store_meta WHERE key = 'artifacts_split'").fetchone():
+            with conn:
+                for name in ARTIFACT_FIELDS:
+                    path = '$.' + name
+                    conn.execute(
+                        'INSERT OR REPLACE INTO profile_artifacts (username, version, name, content, updated_at) '
+                        'SELECT username, version, ?, json_extract(data, ?), COALESCE(updated_at, created_at) '
+                        'FROM profiles WHERE json_extract(data, ?) IS NOT NULL',
+                        (name, path, path),
+                    )
+                    conn.execute('UPDATE profiles SET data = json_remove(data, ?) '
+                                 'WHERE json_extract(data, ?) IS NOT NULL', (path, path))
+                conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('artifacts_split', ?)",
+                             (str(time.time()),))
+
+    # --- Reads ---
+    @instrument_io('profiles.latest_version')
+    def latest_version(self, username: str) -> Optional[int]:
+        row = self._conn().execute(
+            'SELECT MAX(version) FROM profiles WHERE username = ?', (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+    @instrument_io('profiles.latest_fingerprint')
+    def latest_fingerprint(self, username: str) -> Optional[str]:
+        row = self._conn().execute(
+            'SELECT fingerprint FROM profiles WHERE username = ? ORDER BY version DESC LIMIT 1',
+            (username,),
+        ).fetchone()
+        return row[0] if row else None
+
+    @instrument_io('profiles.latest_stamp')
+    def latest_stamp(self, username: str) -> Optional[Tuple[int, float]]:
+        """(version, last write time) of the newest profile; changes on every save or update."""
+        row = self._conn().execute(
+            'SELECT version, COALESCE(updated_at, created_at) FROM profiles '
+            'WHERE username = ? ORDER BY version DESC LIMIT 1',
+            (username,),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    @instrument_io('profiles.load_latest_versioned')
+    def load_latest_versioned(self, username: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(version, profile) of the newest profile; pass the version to patch() as expected_version."""
+        row = self._conn().execute(
+            'SELECT version, data FROM profiles WHERE username = ? ORDER BY version DESC LIMIT 1',
+            (username,),
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    @instrument_io('profiles.load_latest')
+    def load_latest(self, username: str) -> Optional[Dict[str, Any]]:
+        """Returns the newest profile for a user, or None if they have none."""
+        row = self._conn().execute(
+            'SELECT data FROM profiles WHERE username = ? ORDER BY version DESC LIMIT 1',
+            (username,),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @instrument_io('profiles.load_version')
+    def load_version(self, username: str, version: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            'SELECT data FROM profiles WHERE username = ? AND version = ?',
+            (username, version),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest_profiles(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (username, newest profile) for every user, one row at a time."""
+        rows = self._conn().execute(
+            'SELECT p.username, p.data FROM profiles p '
+            'JOIN (SELECT username, MAX(version) AS version FROM profiles GROUP BY username) newest '
+            'ON p.username = newest.username AND p.version = newest.version'
+        )
+        for username, data in rows:
+            yield username, json.loads(data)
+
+    def skill_changes(self, since: float = 0.0) -> Iterator[Tuple[str, int, Optional[str], Optional[str], float]]:
+        """
+        Yields (username, version, skills JSON, missing_skills JSON, last write time)
+        for every version saved or updated at or after since, oldest write first.
+        Only the two lists are pulled out of the profile JSON (inside SQLite).
+        """
+        rows = self._conn().execute(
+            "SELECT username, version, json_extract(data, '$.skills'), json_extract(data, '$.missing_skills'), "
+            'COALESCE(updated_at, created_at) FROM profiles '
+            'WHERE COALESCE(updated_at, created_at) >= ? ORDER BY COALESCE(updated_at, created_at)',
+            (since,),
+        )
+        yield from rows
+
+    def artifact_changes(self, name: str, since: float = 0.0, unless: Optional[str] = None,
+                         unless_prefix: Optional[str] = None
+                         ) -> Iterator[Tuple[str, int, Optional[str], Optional[str], float]]:
+        """
+        Yields (username, version, skills JSON, careerPreferences, artifact write time)
+        for every profile version whose artifact name was written at or after since,
+        oldest write first. With unless, versions that also have that artifact are
+        skipped; with unless_prefix, artifacts whose content starts with it.
+        """
+        rows = self._conn().execute(
+            "SELECT a.username, a.version, json_extract(p.data, '$.skills'), "
+            "json_extract(p.data, '$.careerPreferences'), a.updated_at FROM profile_artifacts a "
+            'JOIN profiles p ON p.username = a.username AND p.version = a.version '
+            'WHERE a.name = ? AND a.updated_at >= ? AND NOT EXISTS ('
+            'SELECT 1 FROM profile_artifacts m WHERE m.username = a.username AND m.version = a.version '
+            'AND m.name = ?) AND (? IS NULL OR substr(a.content, 1, length(?)) != ?) ORDER BY a.updated_at',
+            (name, since, unless, unless_prefix, unless_prefix, unless_prefix),
+        )
+        yield from rows
+
+    def history(self, username: str) -> List[Dict[str, Any]]:
+        """Lists every stored version for a user, newest first (without the data)."""
+        rows = self._conn().execute(
+            'SELECT version, source, created_at FROM profiles '
+            'WHERE username = ? ORDER BY version DESC',
+            (username,),
+        ).fetchall()
+        return [{'version': v, 'source': s, 'created_at': c} for v, s, c in rows]
+
+    # --- Writes ---
+    @instrument_io('profiles.save')
+    def save(self, username: str, data: Dict[str, Any], source: Optional[str] = None,
+             created_at: Optional[float] = None, fingerprint: Optional[str] = None) -> int:
+        """Stores a new profile version for the user and returns its version number."""
+        conn = self._conn()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock before we read MAX(version),
+            # so two concurrent uploads cannot claim the same version.
+            conn.execute('BEGIN IMMEDIATE')
+            return self._insert_version(conn, username, data, source, created_at, fingerprint)
+
+    def _insert_version(self, conn: sqlite3.Connection, username: str, data: Dict[str, Any],
+                        source: Optional[str] = None, created_at: Optional[float] = None,
+                        fingerprint: Optional[str] = None) -> int:
+        # Called inside a BEGIN IMMEDIATE transaction
+        data, artifacts = _split_artifacts(data)
+        row = conn.execute(
+            'SELECT MAX(version) FROM profiles WHERE username = ?', (username,)
+        ).fetchone()
+        version = (row[0] or 0) + 1
+        conn.execute(
+            'INSERT INTO profiles (username, version, source, created_at, data, fingerprint) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (username, version, source, created_at or time.time(), json.dumps(data), fingerprint),
+        )
+        self._write_artifacts(conn, username, version, artifacts)
+        return version
+
+    @instrument_io('profiles.save_many')
+    def save_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Bulk version of save() in a single transaction. Each record is a dict with
+        username, data and optionally source / fingerprint. Returns the count written.
+        """
+        conn = self._conn()
+        written = 0
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for record in records:
+                data, artifacts = _split_artifacts(record['data'])
+                row = conn.execute(
+                    'SELECT MAX(version) FROM profiles WHERE username = ?', (record['username'],)
+                ).fetchone()
+                version = (row[0] or 0) + 1
+                conn.execute(
+                    'INSERT INTO profiles (username, version, source, created_at, data, fingerprint) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (record['username'], version, record.get('source'), now,
+                     json.dumps(data), record.get('fingerprint')),
+                )
+                self._write_artifacts(conn, record['username'], version, artifacts)
+                written += 1
+        return written
+
+    @instrument_io('profiles.update_latest')
+    def update_latest(self, username: str, data: Dict[str, Any]) -> Optional[int]:
+        """
+        Overwrites the newest profile version in place. Returns its version, or None.
+        Prefer patch() for adding generated fields: it does not rewrite the whole profile.
+        """
+        data, artifacts = _split_artifacts(data)
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT MAX(version) FROM profiles WHERE username = ?', (username,)
+            ).fetchone()
+            if not row or row[0] is None:
+                return None
+            conn.execute(
+                'UPDATE profiles SET data = ?, updated_at = ? WHERE username = ? AND version = ?',
+                (json.dumps(data), time.time(), username, row[0]),
+            )
+            self._write_artifacts(conn, username, row[0], artifacts)
+        return row[0]
+
+    @instrument_io('profiles.update_version')
+    def update_version(self, username: str, version: int, data: Dict[str, Any]) -> bool:
+        """Overwrites one specific profile version. Returns False if it does not exist."""
+        data, artifacts = _split_artifacts(data)
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                'UPDATE profiles SET data = ?, updated_at = ? WHERE username = ? AND version = ?',
+                (json.dumps(data), time.time(), username, version),
+            )
+            if cursor.rowcount:
+                self._write_artifacts(conn, username, version, artifacts)
+        return cursor.rowcount > 0
+
+    # --- Partial writes ---
+    def _resolve_version(self, conn: sqlite3.Connection, username: str,
+                         expected_version: Optional[int]) -> Optional[int]:
+        # Called inside a BEGIN IMMEDIATE transaction
+        row = conn.execute('SELECT MAX(version) FROM profiles WHERE username = ?', (username,)).fetchone()
+        latest = row[0] if row else None
+        if latest is None:
+            return None
+        if expected_version is not None and expected_version != latest:
+            raise VersionConflictError(
+                f"{username}'s profile is at version {latest}, not {expected_version}")
+        return latest
+
+    @staticmethod
+    def _write_artifacts(conn: sqlite3.Connection, username: str, version: int, artifacts: Dict[str, Any]):
+        # None deletes the artifact
+        for name, content in artifacts.items():
+            if content is not None and not isinstance(content, str):
+                raise TypeError(f"Artifact {name!r} must be text, not {type(content).__name__}")
+        now = time.time()
+        conn.executemany(
+            'DELETE FROM profile_artifacts WHERE username = ? AND version = ? AND name = ?',
+            [(username, version, name) for name, content in artifacts.items() if content is None],
+        )
+        conn.executemany(
+            'INSERT OR REPLACE INTO profile_artifacts (username, version, name, content, updated_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(username, version, name, content, now) for name, content in artifacts.items() if content is not None],
+        )
+
+    @instrument_io('profiles.patch')
+    def patch(self, username: str, fields: Dict[str, Any],
+              expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Merges fields into the newest profile (a key set to None is removed), leaving
+        every other key untouched. With expected_version, raises VersionConflictError
+        if a newer version has been saved since the caller read the profile.
+        Returns the patched version, or None if the user has no profile.
+        """
+        fields, artifacts = _split_artifacts(fields)
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            version = self._resolve_version(conn, username, expected_version)
+            if version is None:
+                return None
+            # json_patch merges inside SQLite (RFC 7396), so only the new keys are serialized here
+            conn.execute(
+                'UPDATE profiles SET data = json_patch(data, ?), updated_at = ? '
+                'WHERE username = ? AND version = ?',
+                (json.dumps(fields), time.time(), username, version),
+            )
+            self._write_artifacts(conn, username, version, artifacts)
+        return version
+
+    def put_artifact(self, username: str, name: str, content: str,
+                     expected_version: Optional[int] = None) -> Optional[int]:
+        """Stores a generated artifact (e.g. roadmap_html) for the newest profile version."""
+        return self.put_artifacts(username, {name: content}, expected_version)
+
+    @instrument_io('profiles.put_artifact')
+    def put_artifacts(self, username: str, artifacts: Dict[str, Optional[str]],
+                      expected_version: Optional[int] = None) -> Optional[int]:
+        """Stores several artifacts for the newest profile version in one transaction (None deletes one)."""
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            version = self._resolve_version(conn, username, expected_version)
+            if version is None:
+                return None
+            self._write_artifacts(conn, username, version, artifacts)
+            # Bumps the profile's write stamp, which rendered pages are keyed on
+            conn.execute('UPDATE profiles SET updated_at = ? WHERE username = ? AND version = ?',
+                         (time.time(), username, version))
+        return version
+
+    @instrument_io('profiles.load_artifact')
+    def load_artifact(self, username: str, name: str, version: Optional[int] = None) -> Optional[str]:
+        """The artifact stored for the user's newest (or the given) profile version, if any."""
+        if version is not None:
+            row = self._conn().execute(
+                'SELECT content FROM profile_artifacts WHERE username = ? AND version = ? AND name = ?',
+                (username, version, name),
+            ).fetchone()
+            return row[0] if row else None
+        row = self._conn().execute(
+            'SELECT a.content FROM profile_artifacts a '
+            'JOIN (SELECT MAX(version) AS version FROM profiles WHERE username = ?) newest '
+            'ON a.version = newest.version WHERE a.username = ? AND a.name = ?',
+            (username, username, name),
+        ).fetchone()
+        return row[0] if row else None
+
+    # --- Parsed-resume index (resume fingerprint -> parsed JSON) ---
+    @instrument_io('profiles.lookup_parse')
+    def lookup_parse(self, *fingerprints: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored parse for the first fingerprint that has one."""
+        conn = self._conn()
+        for fingerprint in fingerprints:
+            row = conn.execute(
+                'SELECT data FROM parse_index WHERE fingerprint = ?', (fingerprint,)
+            ).fetchone()
+            if row:
+                return json.loads(row[0])
+        return None
+
+    @instrument_io('profiles.remember_parse')
+    def remember_parse(self, fingerprints: Iterable[str], data: Dict[str, Any]):
+        """Indexes a parsed resume under each of its fingerprints (file bytes, text)."""
+        conn = self._conn()
+        payload = json.dumps(data)
+        now = time.time()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO parse_index (fingerprint, data, created_at) VALUES (?, ?, ?)',
+                [(fingerprint, payload, now) for fingerprint in fingerprints],
+            )
+
+    # --- One-time migration of parsed_resumes/*.json ---
+    def migrate_legacy_files(self, usernames: Iterable[str]) -> int:
+        """
+        Imports the old parsed_resumes/{username}_*.json files, oldest first, so
+        the newest file becomes the latest version. Runs only once per database.
+        """
+        conn = self._conn()
+        imported = 0
+        with conn:
+            # The check, the import and the mark are one write transaction: of several
+            # workers starting together, one imports and the others wait, then skip
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute("SELECT 1 FROM store_meta WHERE key = 'legacy_migrated'").fetchone():
+                return 0
+            for username in usernames:
+                pattern = os.path.join(self.legacy_dir, f'{glob.escape(username)}_*.json')
+                for path in sorted(glob.glob(pattern), key=os.path.getctime):
+                    try:
+                        with open(path, 'r') as f:
+                            data = json.load(f)
+                    except (OSError, json.JSONDecodeError) as e:
+                        print(f"Skipping unreadable profile file {path}: {e}")
+                        continue
+                    self._insert_version(conn, username, data, source=os.path.basename(path),
+                                         created_at=os.path.getctime(path))
+                    imported += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('legacy_migrated', ?)",
+                (str(time.time()),),
+            )
+        print(f"Migrated {imported} legacy profile file(s) into {self.db_path}.")
+        return imported
+
+
+profile_store = ProfileStore()
+
+
+def load_profile_data_for_user(username: str):
+    """Loads the latest resume JSON data for the logged-in user from the profile store."""
+    try:
+        return profile_store.load_latest(username)
+    except Exception as e:
+        print(f"Error loading profile data for {username}: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    # Usage: python profile_store.py  -> runs the one-time migration for all known users
+    with open('users.json', 'r') as users_file:
+        profile_store.migrate_legacy_files(json.load(users_file).keys())
@@ -0,0 +1,168 @@
+import re
+from typing import Dict, Iterable, List
+
+from metrics import PROMPT_COMPACTIONS, PROMPT_TOKENS, estimate_tokens
+
+# Label: Prompt Budgets
+# Prompts were f-strings over whatever the caller passed in, so they grew with the
+# data: every skill ever extracted, a long free-text career goal, or a whole
+# roadmap pasted into the challenges prompt. build_prompt() fills a template from
+# named sections, each with its own token allowance, and keeps the result under
+# an overall budget (tokens are estimated locally, ~4 characters each). Sections
+# that don't fit are shortened deterministically - the same input always gives
+# the same prompt, so compacted prompts still hit the response cache:
+#   text      whitespace collapsed, then cut at a word boundary
+#   list      the first items kept, followed by "and N more"
+#   markdown  prose dropped, bullets shortened, then the first bullets under each
+#             heading kept, so every heading (month) survives
+# Every built prompt's size is recorded in ignite_prompt_tokens{prompt}, and each
+# shortened section in ignite_prompt_compactions_total{prompt,section}.
+
+ELLIPSIS = ' ...'
+# Below this a section is no longer useful to the model; don't shrink past it
+MIN_SECTION_TOKENS = 16
+# Markdown bullets are cut to this before whole bullets are dropped
+BULLET_TOKENS = 30
+
+_STRUCTURE_LINE = re.compile(r'^\s*(#{1,6}\s|[-*+]\s|\d+[.)]\s)')
+_HEADING_LINE = re.compile(r'^\s*#{1,6}\s')
+
+
+def _fits(text: str, budget: int) -> bool:
+    return estimate_tokens(text) <= budget
+
+
+def compact_text(text: str, budget: int) -> str:
+    text = ' '.join(str(text).split())
+    if _fits(text, budget):
+        return text
+    limit = max(budget * 4 - len(ELLIPSIS), 0)
+    cut = text[:limit]
+    space = cut.rfind(' ')
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(' ,;:.') + ELLIPSIS
+
+
+def compact_list(items: Iterable[str], budget: int, separator: str = ', ') -> str:
+    items = [' '.join(str(item).split()) for item in items]
+    items = [item for item in items if item]
+    text = separator.join(items)
+    if _fits(text, budget):
+        return text
+
+    kept: List[str] = []
+    length = 0
+    for index, item in enumerate(items):
+        grown = length + (len(separator) if kept else 0) + len(item)
+        tail = f"{separator}and {len(items) - index - 1} more"
+        if (grown + len(tail) + 3) // 4 > budget:
+            break
+        kept.append(item)
+        length = grown
+    return separator.join(kept) + f"{separator}and {len(items) - len(kept)} more"
+
+
+def _bullet_runs(lines: List[str]) -> List[List[str]]:
+    runs, current = [], []
+    for line in lines:
+        if _HEADING_LINE.match(line):
+            runs.append(current)
+            current = []
+        else:
+            current.append(line)
+    runs.append(current)
+    return runs
+
+
+def _first_bullets(lines: List[str], per_heading: int) -> List[str]:
+    kept, under_heading = [], 0
+    for line in lines:
+        if _HEADING_LINE.match(line):
+            kept.append(line)
+            under_heading = 0
+        elif under_heading < per_heading:
+            kept.append(line)
+            under_heading += 1
+    return kept
+
+
+def compact_markdown(text: str, budget: int) -> str:
+    lines = [line.rstrip() for line in str(text).splitlines() if line.strip()]
+    joined = '\n'.join(lines)
+    if _fits(joined, budget):
+        return joined
+
+    # Headings and list items carry the plan; paragraphs around them are commentary
+    lines = [line for line in lines if _STRUCTURE_LINE.match(line)] or lines
+    lines = [line if _HEADING_LINE.match(line)
+             else line[:len(line) - len(line.lstrip())] + compact_text(line, BULLET_TOKENS)
+             for line in lines]
+    joined = '\n'.join(lines)
+    if _fits(joined, budget):
+        return joined
+
+    # As many bullets per heading as fit, so later months aren't dropped entirely
+    longest = max(len(run) for run in _bullet_runs(lines))
+    for per_heading in range(longest - 1, -1, -1):
+        joined = '\n'.join(_first_bullets(lines, per_heading))
+        if _fits(joined, budget):
+            return joined
+
+    kept, length = [], 0
+    for line in lines:
+        if (length + len(line) + 1 + len(ELLIPSIS) + 3) // 4 > budget:
+            break
+        kept.append(line)
+        length += len(line) + 1
+    return '\n'.join(kept) + '\n' + ELLIPSIS.strip()
+
+
+_COMPACTORS = {'text': compact_text, 'list': compact_list, 'markdown': compact_markdown}
+
+
+class Section:
+    """One variable part of a prompt: its content, how to shorten it, and its allowance."""
+
+    def __init__(self, content, max_tokens: int, kind: str = 'text'):
+        if kind not in _COMPACTORS:
+            raise ValueError(f"Unknown prompt section kind: {kind}")
+        self.content = content
+        self.max_tokens = max_tokens
+        self.kind = kind
+
+    def raw(self) -> str:
+        if self.kind == 'list':
+            return ', '.join(str(item) for item in self.content)
+        return str(self.content)
+
+    def render(self, budget: int) -> str:
+        return _COMPACTORS[self.kind](self.content, budget)
+
+
+def build_prompt(name: str, template: str, budget: int, **sections: Section) -> str:
+    """
+    Fills template (str.format placeholders) with the sections, each shortened to
+    its max_tokens and, if the whole prompt would still exceed budget, to a
+    proportional share of what the fixed template text leaves over.
+    """
+    fixed = estimate_tokens(template.format(**{key: '' for key in sections}))
+    available = max(budget - fixed, MIN_SECTION_TOKENS * len(sections))
+    raw_tokens = {key: estimate_tokens(section.raw()) for key, section in sections.items()}
+    allowances: Dict[str, int] = {key: min(section.max_tokens, raw_tokens[key])
+                                  for key, section in sections.items()}
+    wanted = sum(allowances.values())
+    if wanted > available:
+        scale = available / wanted
+        allowances = {key: max(MIN_SECTION_TOKENS, int(allowance * scale))
+                      for key, allowance in allowances.items()}
+
+    values = {}
+    for key, section in sections.items():
+        values[key] = section.render(allowances[key])
+        if raw_tokens[key] > allowances[key]:
+            PROMPT_COMPACTIONS.inc(name, key)
+
+    prompt = template.format(**values)
+    PROMPT_TOKENS.observe(estimate_tokens(prompt), name)
+    return prompt
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Label: Gemini Resilience
+# Policies used by GeminiClient around every backend call:
+#   RetryPolicy     retries transient failures with full-jitter exponential backoff,
+#                   but only while the caller's deadline leaves room for another try
+#   CircuitBreaker  after repeated failures, fails calls immediately for a cooldown
+#                   (callers then fall back to stale cached answers), then lets a
+#                   single probe through to see whether the API has recovered
+# Hedged requests (a second copy of a slow call) live in GeminiClient itself since
+# they need its concurrency slots.
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, 5xx and 429 are worth retrying; other 4xx (bad request, auth) are not."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    # google.api_core exceptions carry the HTTP status as .code
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and 400 <= code < 500 and code not in (408, 429):
+        return False
+    return True
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0,
+                 min_attempt_time: float = 1.0, seed: Optional[int] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Don't start an attempt that would have less than this long to finish
+        self.min_attempt_time = min_attempt_time
+        self._random = random.Random(seed)
+
+    def next_delay(self, error: BaseException, attempt: int, remaining: float) -> Optional[float]:
+        """Seconds to wait before retrying after the given (0-based) attempt failed, or None to give up."""
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+        delay = self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if remaining - delay < self.min_attempt_time:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; half-opens after cooldown seconds."""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._counts = {'opened': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not go out."""
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.cooldown:
+                    self._counts['rejected'] += 1
+                    raise CircuitOpenError('Gemini circuit is open; failing fast')
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                # Exactly one probe at a time decides whether to close again
+                if self._probe_in_flight:
+                    self._counts['rejected'] += 1
+                    raise CircuitOpenError('Gemini circuit is half-open; probe in flight')
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._counts['opened'] += 1
+                self._state = OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return dict(self._counts, state=state, consecutive_failures=self._failures)
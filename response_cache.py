@@ -0,0 +1,264 @@
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Label: Gemini Response Cache
+# Many users share the same skills list and career goal, so the prompts we send
+# to Gemini repeat a lot. Responses are cached under a hash of the normalized
+# prompt + model name + generation config. The cache is made of tiers (an
+# in-memory LRU with TTL, and optionally a SQLite file that survives restarts);
+# any object with get(key, allow_stale=False) / set(key, value, expires_at) /
+# clear() can be plugged in as a tier.
+# Expired entries are kept until evicted: when the model call fails (e.g. the
+# circuit breaker is open) a stale answer is served instead of an error.
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Calls sampling above this temperature are meant to vary, so they skip the cache
+DEFAULT_MAX_CACHEABLE_TEMPERATURE = 0.7
+
+
+def _config_dict(generation_config) -> Dict[str, Any]:
+    """Turns a dict / GenerationConfig / None into a plain dict without unset values."""
+    if generation_config is None:
+        return {}
+    if isinstance(generation_config, dict):
+        config = dict(generation_config)
+    elif dataclasses.is_dataclass(generation_config):
+        config = dataclasses.asdict(generation_config)
+    else:
+        config = dict(vars(generation_config))
+    return {k: v for k, v in config.items() if v is not None}
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Prompts are indented f-strings; whitespace differences should not miss the cache
+    return ' '.join(prompt.split())
+
+
+def make_cache_key(prompt: str, model_name: str, generation_config=None) -> str:
+    payload = json.dumps(
+        {
+            'prompt': normalize_prompt(prompt),
+            'model': model_name,
+            'config': _config_dict(generation_config),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryTier:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, clock=time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < self._clock() and not allow_stale:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """On-disk tier so cached responses survive restarts and are shared between workers."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[str]:
+        row = self._conn().execute(
+            'SELECT value, expires_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] < time.time() and not allow_stale):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, expires_at: float):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at),
+            )
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM responses')
+
+
+class ResponseCache:
+    """Tiered, content-addressed cache for model responses with hit/miss counters."""
+
+    def __init__(self, tiers=None, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_cacheable_temperature: float = DEFAULT_MAX_CACHEABLE_TEMPERATURE):
+        self.tiers = tiers if tiers is not None else [MemoryTier()]
+        self.ttl_seconds = ttl_seconds
+        self.max_cacheable_temperature = max_cacheable_temperature
+        self._counts = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0, 'stale_served': 0}
+        self._count_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._count_lock:
+            self._counts[name] += 1
+
+    def is_cacheable(self, generation_config=None, allow_high_temperature: bool = False) -> bool:
+        temperature = _config_dict(generation_config).get('temperature')
+        if allow_high_temperature or temperature is None:
+            return True
+        return temperature <= self.max_cacheable_temperature
+
+    def get(self, key: str) -> Optional[str]:
+        for depth, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                # Promote hits from slower tiers into the faster ones in front of them
+                for faster in self.tiers[:depth]:
+                    faster.set(key, value, time.time() + self.ttl_seconds)
+                self._count('hits')
+                return value
+        self._count('misses')
+        return None
+
+    def get_stale(self, key: str) -> Optional[str]:
+        """Any stored value for key, expired or not (the fallback when the model is unavailable)."""
+        for tier in self.tiers:
+            value = tier.get(key, allow_stale=True)
+            if value is not None:
+                self._count('stale_served')
+                return value
+        return None
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl_seconds
+        for tier in self.tiers:
+            tier.set(key, value, expires_at)
+        self._count('stores')
+
+    def get_or_generate(self, prompt: str, model_name: str, generation_config, generate,
+                        allow_high_temperature: bool = False,
+                        is_valid: Optional[Callable[[str], bool]] = None,
+                        refresh: bool = False) -> str:
+        """
+        Returns the cached response for this prompt/model/config, or calls
+        generate() and caches its text (only if is_valid(text), when given).
+        High-temperature calls bypass the cache unless allow_high_temperature is set.
+        With refresh, the cached response is ignored and replaced by a new one.
+        """
+        if not self.is_cacheable(generation_config, allow_high_temperature):
+            self._count('bypassed')
+            return generate()
+
+        key = make_cache_key(prompt, model_name, generation_config)
+        cached = None if refresh else self.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            text = generate()
+        except Exception:
+            stale = self.get_stale(key)
+            if stale is None:
+                raise
+            return stale
+        if text and (is_valid is None or is_valid(text)):
+            self.set(key, text)
+        return text
+
+    def stream_or_generate(self, prompt: str, model_name: str, generation_config, stream,
+                           allow_high_temperature: bool = False, refresh: bool = False):
+        """
+        Streaming counterpart of get_or_generate(). A cached response is yielded as a
+        single chunk; otherwise stream() is iterated and the joined text is cached once
+        the stream completes.
+        """
+        if not self.is_cacheable(generation_config, allow_high_temperature):
+            self._count('bypassed')
+            yield from stream()
+            return
+
+        key = make_cache_key(prompt, model_name, generation_config)
+        cached = None if refresh else self.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            for chunk in stream():
+                parts.append(chunk)
+                yield chunk
+        except Exception:
+            # Only substitute a stale answer if nothing has been sent yet
+            stale = None if parts else self.get_stale(key)
+            if stale is None:
+                raise
+            yield stale
+            return
+        text = ''.join(parts)
+        if text:
+            self.set(key, text)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._count_lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+        counts['memory_entries'] = sum(len(t) for t in self.tiers if isinstance(t, MemoryTier))
+        return counts
+
+
+def build_response_cache(db_path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                         ttl_seconds: float = DEFAULT_TTL_SECONDS) -> ResponseCache:
+    """Memory-only cache by default; pass db_path to add the persistent SQLite tier."""
+    tiers = [MemoryTier(max_entries)]
+    if db_path:
+        tiers.append(SQLiteTier(db_path))
+    return ResponseCache(tiers=tiers, ttl_seconds=ttl_seconds)
@@ -0,0 +1,73 @@
+import os
+import threading
+from typing import Optional
+
+# Label: Settings
+# The app's configuration used to be read with os.getenv() wherever a module
+# happened to need it, some of it before load_dotenv() had run. Settings reads
+# the .env file and the environment once, on first use, and everything in
+# Chatbot.py / app.py takes its values from get_settings(). (Library modules such
+# as pdf_extract or skill_results keep their own env defaults, since they are
+# also run on their own from the command line.)
+
+
+class Settings:
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+        # Gemini client
+        self.gemini_backend = env.get('GEMINI_BACKEND', 'genai')
+        self.gemini_max_concurrency = int(env.get('GEMINI_MAX_CONCURRENCY', '8'))
+        self.gemini_timeout = float(env.get('GEMINI_TIMEOUT', '60'))
+        self.gemini_retry_attempts = int(env.get('GEMINI_RETRY_ATTEMPTS', '3'))
+        self.gemini_hedge_after: Optional[float] = float(env.get('GEMINI_HEDGE_AFTER', '0')) or None
+        self.gemini_breaker_failures = int(env.get('GEMINI_BREAKER_FAILURES', '5'))
+        self.gemini_breaker_cooldown = float(env.get('GEMINI_BREAKER_COOLDOWN', '30'))
+        # Fair-share scheduling of model calls (estimated tokens per user; USD per million tokens)
+        self.user_tokens_per_minute = float(env.get('IGNITE_USER_TOKENS_PER_MINUTE', '20000'))
+        self.user_token_burst = float(env.get('IGNITE_USER_TOKEN_BURST', '8000'))
+        self.interactive_slots = int(env.get('IGNITE_INTERACTIVE_SLOTS', '2'))
+        self.gemini_prompt_price = float(env.get('GEMINI_PRICE_PROMPT_PER_M', '0.30'))
+        self.gemini_output_price = float(env.get('GEMINI_PRICE_OUTPUT_PER_M', '2.50'))
+        # Response cache
+        self.gemini_cache_db: Optional[str] = env.get('GEMINI_CACHE_DB')
+        self.gemini_cache_size = int(env.get('GEMINI_CACHE_SIZE', '1024'))
+        self.gemini_cache_ttl = float(env.get('GEMINI_CACHE_TTL', str(24 * 60 * 60)))
+        self.cache_high_temperature = env.get('GEMINI_CACHE_HIGH_TEMPERATURE', '') == '1'
+        # Prompts and chat
+        self.prompt_token_budget = int(env.get('PROMPT_TOKEN_BUDGET', '1500'))
+        self.chat_max_sessions = int(env.get('CHAT_MAX_SESSIONS', '5000'))
+        self.chat_idle_seconds = float(env.get('CHAT_IDLE_SECONDS', str(30 * 60)))
+        self.chat_max_turns = int(env.get('CHAT_MAX_TURNS', '10'))
+        # Reuse a skill gap / roadmap made for a skill set at least this similar (above 1: never)
+        self.similarity_threshold = float(env.get('IGNITE_SIMILARITY_THRESHOLD', '0.8'))
+        # Web app
+        self.page_cache_size = int(env.get('IGNITE_PAGE_CACHE_SIZE', '1024'))
+        self.job_workers = int(env.get('IGNITE_JOB_WORKERS', '4'))
+        self.job_queue_depth = int(env.get('IGNITE_JOB_QUEUE_DEPTH', '64'))
+        # gzip HTML / JSON responses at least this large (level 1-9; 0 turns it off)
+        self.gzip_level = int(env.get('IGNITE_GZIP_LEVEL', '6'))
+        self.gzip_min_bytes = int(env.get('IGNITE_GZIP_MIN_BYTES', '1024'))
+        # Usernames (comma-separated) allowed to see cohort-wide analytics, usage and metrics
+        self.admin_users = frozenset(name.strip() for name in env.get('IGNITE_ADMIN_USERS', '').split(',')
+                                     if name.strip())
+        # Bearer token a Prometheus scraper sends for /metrics (admins' sessions work too)
+        self.metrics_token: Optional[str] = env.get('IGNITE_METRICS_TOKEN') or None
+        # Initialize the model client, PDF reader and Markdown renderer at startup
+        # instead of on first use (trades a slower start for a fast first request)
+        self.warm_up = env.get('IGNITE_WARM_UP', '') == '1'
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """The process-wide settings, read (after loading .env) the first time they are asked for."""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _settings = Settings()
+    return _settings
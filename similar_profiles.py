@@ -0,0 +1,271 @@
+import argparse
+import html
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from skill_extractor import canonical_skill, canonical_skill_set
+
+# Label: Similar Profiles ("users like you")
+# A skill gap is stored per exact skill set (skill_results) and a roadmap per
+# user, so a user whose skills differ from someone else's by one item still paid
+# for a full model call. SimilarResults indexes the answers already generated
+# (skill gaps from skill_results, roadmaps from the profile artifacts) by the
+# skill set they were made for, and finds the most similar one by Jaccard
+# similarity (shared skills / all skills of the two).
+# Each skill set is a row of 64-bit words, one bit per skill, so a lookup is a
+# few vectorized AND/OR/popcount operations over every stored set: exact, with
+# no false negatives, and a few milliseconds for hundreds of thousands of sets.
+# The index is built from the stores on first use and then only reads what was
+# written since (at most every REFRESH_SECONDS), which picks up answers
+# generated by other workers as well. Only answers that came from the model are
+# indexed, never ones that were themselves reused, so reuse doesn't drift.
+#   python similar_profiles.py --skills "python, flask, sql"
+
+# Jaccard similarity a stored answer needs to be reused (above 1 turns reuse off)
+DEFAULT_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', '0.8'))
+REFRESH_SECONDS = 5.0
+# A write can commit with a timestamp a little behind one already seen
+REFRESH_OVERLAP_SECONDS = 1.0
+# Artifact stored next to a roadmap that was adapted from a neighbour's
+REUSED_ROADMAP_MARKER = 'roadmap_reused_from'
+# How a roadmap_html stored before failures were kept out of the store begins
+FAILED_ROADMAP_PREFIX = "<p style='color:red;'>"
+
+
+class SkillSetIndex:
+    """Exact Jaccard nearest-neighbour search over skill sets, each with a value and a group."""
+
+    def __init__(self):
+        self.skills: List[str] = []
+        self._columns: Dict[str, int] = {}
+        # Raw spelling -> column, so canonical_skill() runs once per spelling
+        self._spellings: Dict[str, int] = {}
+        # Word-major (words x rows), so a lookup reads each word of every row contiguously
+        self._bits = np.zeros((1, 0), dtype=np.uint64)
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._groups = np.zeros(0, dtype=np.int32)
+        self._group_ids: Dict[str, int] = {}
+        # (group, skill mask) -> row
+        self._rows: Dict[Tuple[str, int], int] = {}
+        self._masks: List[int] = []
+        self._values: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _column(self, name: str) -> int:
+        column = self._spellings.get(name)
+        if column is None:
+            skill = canonical_skill(name)
+            column = self._columns.get(skill)
+            if column is None:
+                column = self._columns[skill] = len(self.skills)
+                self.skills.append(skill)
+            self._spellings[name] = column
+        return column
+
+    def _ensure_capacity(self, rows: int):
+        words = (len(self.skills) + 63) // 64 or 1
+        capacity = len(self._sizes)
+        if rows <= capacity and words == len(self._bits):
+            return
+        if rows > capacity:
+            capacity = max(rows, capacity * 2, 1024)
+        self._bits = np.pad(self._bits, ((0, words - len(self._bits)), (0, capacity - self._bits.shape[1])))
+        self._sizes = np.pad(self._sizes, (0, capacity - len(self._sizes)))
+        self._groups = np.pad(self._groups, (0, capacity - len(self._groups)), constant_values=-1)
+
+    def add_many(self, entries: Iterable[Tuple[Iterable[str], Any, str]]) -> int:
+        """Stores (skills, value, group) entries, replacing the value of a set already in the group."""
+        written: Dict[int, int] = {}
+        for skills, value, group in entries:
+            mask = 0
+            for name in skills:
+                if name and name.strip():
+                    mask |= 1 << self._column(name)
+            if not mask:
+                continue
+            row = self._rows.get((group, mask))
+            if row is None:
+                row = self._rows[(group, mask)] = len(self._values)
+                self._masks.append(mask)
+                self._values.append(value)
+            else:
+                self._values[row] = value
+            written[row] = self._group_ids.setdefault(group, len(self._group_ids))
+        if not written:
+            return 0
+
+        self._ensure_capacity(len(self._values))
+        rows = np.fromiter(written.keys(), dtype=np.int64, count=len(written))
+        words = len(self._bits)
+        masks = [self._masks[row] for row in written]
+        packed = b''.join(mask.to_bytes(words * 8, 'little') for mask in masks)
+        self._bits[:, rows] = np.frombuffer(packed, dtype='<u8').reshape(len(rows), words).T
+        self._sizes[rows] = [mask.bit_count() for mask in masks]
+        self._groups[rows] = list(written.values())
+        return len(written)
+
+    def add(self, skills: Iterable[str], value: Any, group: str = ''):
+        self.add_many([(skills, value, group)])
+
+    def nearest(self, skills: Iterable[str], group: str = '', min_similarity: float = 0.0,
+                exclude: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[float, List[str], Any]]:
+        """
+        (similarity, skill set, value) of the most similar stored set in the group
+        whose value exclude() doesn't reject, or None.
+        """
+        skills = canonical_skill_set(skills)
+        group_id = self._group_ids.get(group)
+        if not skills or group_id is None:
+            return None
+        # Skills nobody in the index has can't be shared, but still count towards the union
+        query = 0
+        for skill in skills:
+            if skill in self._columns:
+                query |= 1 << self._columns[skill]
+        if not query:
+            return None
+
+        count = len(self._values)
+        shared = np.zeros(count, dtype=np.int32)
+        for word in range(len(self._bits)):
+            query_word = (query >> (64 * word)) & 0xFFFFFFFFFFFFFFFF
+            if query_word:
+                shared += np.bitwise_count(self._bits[word, :count] & np.uint64(query_word))
+        similarity = shared / (self._sizes[:count] + len(skills) - shared)
+        if len(self._group_ids) > 1:
+            similarity[self._groups[:count] != group_id] = 0.0
+        best = int(np.argmax(similarity))
+        while exclude is not None and similarity[best] > 0 and exclude(self._values[best]):
+            similarity[best] = 0.0
+            best = int(np.argmax(similarity))
+        if similarity[best] <= 0 or similarity[best] < min_similarity:
+            return None
+        mask = self._masks[best]
+        neighbour = [skill for column, skill in enumerate(self.skills) if mask >> column & 1]
+        return float(similarity[best]), neighbour, self._values[best]
+
+
+class SimilarResults:
+    """Generated skill gaps and roadmaps, searchable by skill-set similarity."""
+
+    def __init__(self, profile_store, skill_results, threshold: float = DEFAULT_THRESHOLD):
+        self.profile_store = profile_store
+        self.skill_results = skill_results
+        self.threshold = threshold
+        self._indexes = {'skill_gap': SkillSetIndex(), 'roadmap': SkillSetIndex()}
+        self._watermarks: Dict[str, Optional[float]] = {kind: None for kind in self._indexes}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._counts = {'lookups': 0, 'matches': 0, 'refreshes': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold <= 1.0
+
+    def _changes(self, kind: str, since: float):
+        # Normalized to (skill set, value, group, written at)
+        if kind == 'skill_gap':
+            for skills, missing, stored_at in self.skill_results.entries('skill_gap', since):
+                yield skills, missing, '', stored_at
+        else:
+            for username, version, skills, goal, written_at in self.profile_store.artifact_changes(
+                    'roadmap_html', since, unless=REUSED_ROADMAP_MARKER, unless_prefix=FAILED_ROADMAP_PREFIX):
+                yield json.loads(skills) if skills else [], (username, version), goal_key(goal), written_at
+
+    def refresh(self, force: bool = False):
+        """Adds the answers stored since the last refresh (no-op within REFRESH_SECONDS unless forced)."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._counts['refreshes'] and now - self._refreshed_at < REFRESH_SECONDS:
+                return
+            for kind, index in self._indexes.items():
+                watermark = self._watermarks[kind]
+                since = 0.0 if watermark is None else watermark - REFRESH_OVERLAP_SECONDS
+                newest = [watermark or 0.0]
+
+                def entries():
+                    for skills, value, group, written_at in self._changes(kind, since):
+                        newest[0] = max(newest[0], written_at)
+                        yield skills, value, group
+
+                index.add_many(entries())
+                self._watermarks[kind] = newest[0]
+            self._refreshed_at = now
+            self._counts['refreshes'] += 1
+
+    def nearest(self, kind: str, skills: Iterable[str], group: str = '',
+                exclude: Optional[Callable[[Any], bool]] = None) -> Optional[Tuple[float, List[str], Any]]:
+        """The stored answer of kind for the most similar skill set, if it clears the threshold."""
+        if not self.enabled:
+            return None
+        self.refresh()
+        with self._lock:
+            self._counts['lookups'] += 1
+            match = self._indexes[kind].nearest(skills, group, self.threshold, exclude)
+            if match is not None:
+                self._counts['matches'] += 1
+        return match
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counts, **{f"{kind}_sets": len(index) for kind, index in self._indexes.items()})
+
+
+def goal_key(goal: Optional[str]) -> str:
+    """Roadmaps are only shared between users with the same (normalized) career goal."""
+    return ' '.join(str(goal or '').lower().split())
+
+
+def without_held(missing: Iterable[str], skills: Iterable[str]) -> List[str]:
+    """A neighbour's missing skills, minus the ones this user already has."""
+    held = {canonical_skill(skill) for skill in skills}
+    return [skill for skill in missing if canonical_skill(skill) not in held]
+
+
+# The opening heading or paragraph of a rendered roadmap
+_ROADMAP_OPENING = re.compile(r'\s*<(h[1-6]|p)\b.*?</\1>', re.S)
+
+
+def readdress_roadmap(roadmap_html: str, neighbour: str, username: str) -> Optional[str]:
+    """
+    A neighbour's roadmap addressed to username instead, or None if it can't be.
+    The roadmap prompt puts the user's name in the greeting, so the name is only
+    replaced in the opening heading or paragraph: elsewhere it may be an ordinary
+    word ('Go', 'Swift'). A roadmap that mentions the neighbour past the greeting
+    is not reused.
+    """
+    if neighbour == username:
+        return roadmap_html
+    name = re.compile(rf'(?<!\w){re.escape(html.escape(neighbour))}(?!\w)', re.I)
+    opening = _ROADMAP_OPENING.match(roadmap_html)
+    split = opening.end() if opening else 0
+    if name.search(roadmap_html, split):
+        return None
+    return name.sub(lambda _: html.escape(username), roadmap_html[:split]) + roadmap_html[split:]
+
+
+if __name__ == '__main__':
+    from profile_store import profile_store
+    from skill_results import SkillResultStore
+
+    parser = argparse.ArgumentParser(description='Find the stored skill gap for the most similar skill set.')
+    parser.add_argument('--skills', required=True, help='comma-separated skills')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    similar = SimilarResults(profile_store, SkillResultStore(), args.threshold)
+    started = time.perf_counter()
+    similar.refresh(force=True)
+    print(f"Indexed in {time.perf_counter() - started:.2f}s: {similar.stats()}")
+    started = time.perf_counter()
+    match = similar.nearest('skill_gap', [skill.strip() for skill in args.skills.split(',')])
+    print(f"Lookup took {(time.perf_counter() - started) * 1000:.2f}ms")
+    print(json.dumps(match and {'similarity': round(match[0], 3), 'skills': match[1], 'missing_skills': match[2]},
+                     indent=2))
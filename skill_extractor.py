@@ -0,0 +1,184 @@
+import re
+from typing import Any, Dict, List
+
+# Label: Local Skill / Contact Extraction
+# Skills in a profile are restricted to MASTER_SKILLS, so we don't need a model
+# round trip to find them: one precompiled regex over every skill name and its
+# common aliases finds them in well under a millisecond. Emails and phone
+# numbers are pulled out the same way. Gemini is only asked for what a regex
+# cannot derive (name, experience ranges).
+
+# You can use the same master skills list to guide the model
+MASTER_SKILLS = [
+    "python", "java", "c++", "c", "c#", "javascript", "typescript", "go", "rust", "kotlin", "swift", "php", "ruby", "scala",
+    "django", "flask", "fastapi", "node.js", "express.js", "ruby on rails", "spring boot",
+    "react", "angular", "vue.js", "next.js", "svelte",
+    "sql", "mysql", "postgresql", "sqlite", "mongodb", "redis", "cassandra", "elasticsearch",
+    "aws", "azure", "google cloud", "gcp", "docker", "kubernetes", "terraform", "ansible", "jenkins", "git", "ci/cd",
+    "pandas", "numpy", "scipy", "scikit-learn", "tensorflow", "pytorch", "keras", "matplotlib", "seaborn", "apache spark",
+    "html", "css", "sass", "graphql", "rest api",
+    "linux", "bash", "powershell", "agile", "scrum"
+]
+
+# Other spellings people use for a master skill (matched case-insensitively)
+SKILL_ALIASES = {
+    "c++": ["cpp", "c plus plus"],
+    "c#": ["csharp", "c sharp"],
+    "javascript": ["js", "ecmascript", "es6"],
+    "typescript": ["ts"],
+    "go": ["golang"],
+    "node.js": ["nodejs", "node js", "node"],
+    "express.js": ["expressjs", "express js"],
+    "ruby on rails": ["rails", "ror"],
+    "spring boot": ["springboot", "spring-boot"],
+    "react": ["react.js", "reactjs", "react js"],
+    "angular": ["angularjs", "angular.js"],
+    "vue.js": ["vue", "vuejs", "vue js"],
+    "next.js": ["nextjs", "next js"],
+    "postgresql": ["postgres", "psql"],
+    "mongodb": ["mongo"],
+    "elasticsearch": ["elastic search"],
+    "aws": ["amazon web services"],
+    "azure": ["microsoft azure"],
+    "google cloud": ["google cloud platform"],
+    "kubernetes": ["k8s"],
+    "ci/cd": ["cicd", "ci cd", "ci-cd"],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "tensorflow": ["tensor flow"],
+    "apache spark": ["spark", "pyspark"],
+    "html": ["html5"],
+    "css": ["css3"],
+    "sass": ["scss"],
+    "rest api": ["rest apis", "restful api", "restful apis", "rest"],
+}
+
+# Names that are also ordinary English words (or a single letter) only count
+# when written the way a resume writes the technology.
+CASE_SENSITIVE_FORMS = {
+    "c": ["C"],
+    "go": ["Go", "GO"],
+    "rust": ["Rust"],
+    "swift": ["Swift"],
+    "react": ["React"],
+    "spark": ["Spark"],
+    "agile": ["Agile", "AGILE"],
+    "node": ["Node"],
+    "rest": ["REST"],
+    "ts": ["TS"],
+    "js": ["JS"],
+}
+
+# A match must not be glued to other word characters, or to + and # (c vs c++ / c#)
+_BOUNDARY_BEFORE = r"(?<![\w+#@])"
+_BOUNDARY_AFTER = r"(?![\w+#])"
+
+
+def _trie_regex(forms) -> str:
+    """
+    Compiles the forms into a prefix-trie shaped regex ("c(?:\\+\\+|#)?" rather than
+    "c\\+\\+|c#|c"), so the engine tests each shared prefix once per position.
+    Optional tails are greedy, so the longest form wins ("c++" over "c").
+    """
+    trie = {}
+    for form in forms:
+        node = trie
+        for ch in form.lower() if form.islower() else form:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        branches = [(r"[\s-]+" if ch == " " else re.escape(ch)) + emit(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return emit(trie)
+
+
+def _build_patterns():
+    canonical = {}
+    for skill in MASTER_SKILLS:
+        canonical[skill] = skill
+        for alias in SKILL_ALIASES.get(skill, []):
+            canonical[alias] = skill
+
+    insensitive = [form for form in canonical if form not in CASE_SENSITIVE_FORMS]
+    sensitive = [written for form in CASE_SENSITIVE_FORMS for written in CASE_SENSITIVE_FORMS[form]]
+
+    return (
+        re.compile(_BOUNDARY_BEFORE + "(" + _trie_regex(insensitive) + ")" + _BOUNDARY_AFTER, re.IGNORECASE),
+        re.compile(_BOUNDARY_BEFORE + "(" + _trie_regex(sensitive) + ")" + _BOUNDARY_AFTER),
+        canonical,
+    )
+
+
+_SKILL_RE, _SKILL_CASE_RE, _CANONICAL = _build_patterns()
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+# Spaces and tabs only, so a match never runs on into the next line; it may end a sentence
+PHONE_RE = re.compile(r"(?<![\w.])\+?\(?\d[\d \t().-]{7,18}\d(?!\w|\.\w)")
+# "2019 - 2021": employment dates, not part of a phone number
+YEAR_RANGE_RE = re.compile(r"\b(?:19|20)\d{2}[ \t]*[-\u2013][ \t]*(?:19|20)\d{2}\b")
+
+
+def canonical_skill(name: str) -> str:
+    """Maps an alias ("k8s", "Postgres") to its MASTER_SKILLS name; unknown names are just lowercased."""
+    key = name.strip().lower()
+    if key not in _CANONICAL:
+        # Multi-word forms match across any run of spaces or hyphens
+        key = " ".join(re.split(r"[\s-]+", key))
+    return _CANONICAL.get(key, key)
+
+
+def canonical_skill_set(skills) -> List[str]:
+    """
+    Lowercased, alias-merged, de-duplicated and sorted: two users whose lists differ
+    only in spelling or order get the same set, so results keyed on it are shared.
+    """
+    return sorted({canonical_skill(skill) for skill in skills if skill and skill.strip()})
+
+
+def extract_skills(text: str) -> List[str]:
+    """MASTER_SKILLS found in the text, in order of first appearance."""
+    found = [(m.start(), canonical_skill(m.group(1))) for m in _SKILL_RE.finditer(text)]
+    found += [(m.start(), canonical_skill(m.group(1))) for m in _SKILL_CASE_RE.finditer(text)]
+
+    skills = []
+    for _, skill in sorted(found):
+        if skill not in skills:
+            skills.append(skill)
+    return skills
+
+
+def extract_emails(text: str) -> List[str]:
+    emails = []
+    for email in EMAIL_RE.findall(text):
+        email = email.rstrip(".")
+        if email not in emails:
+            emails.append(email)
+    return emails
+
+
+def extract_phones(text: str) -> List[str]:
+    phones = []
+    for match in PHONE_RE.findall(text):
+        digits = re.sub(r"\D", "", match)
+        # 10-15 digits: rules out single year ranges and dates
+        if YEAR_RANGE_RE.search(match) or not 10 <= len(digits) <= 15:
+            continue
+        if match.strip() not in phones:
+            phones.append(match.strip())
+    return phones
+
+
+def extract_profile_fields(text: str) -> Dict[str, Any]:
+    """The profile fields that can be derived locally: skills, emails, phones."""
+    return {
+        "emails": extract_emails(text),
+        "phones": extract_phones(text),
+        "skills": extract_skills(text),
+    }
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from response_cache import MemoryTier
+from skill_extractor import canonical_skill_set
+
+# Label: Skill-Set Results
+# generate_skill_gap() only looks at the skills list, and the recommendations
+# prompt only at the skills, yet both were recomputed for every user on every
+# click. Results are now stored once per canonical skill set (see
+# skill_extractor.canonical_skill_set) in a shared SQLite table with an LRU in
+# front, so every user with the same skills gets the same answer from a lookup.
+# Common sets can be computed ahead of time from the profile store:
+#   python skill_results.py --top 500
+
+SKILL_RESULTS_DB = os.getenv('SKILL_RESULTS_DB', 'skill_results.db')
+# Bump when a prompt changes so stale answers are not served for the new one
+RESULT_VERSIONS = {'skill_gap': 2, 'recommendation': 2}
+# Far longer than the response cache: these are the product's answers, not raw responses
+DEFAULT_TTL_SECONDS = float(os.getenv('SKILL_RESULTS_TTL', str(30 * 24 * 60 * 60)))
+
+
+def skill_set_key(skills: Iterable[str]) -> str:
+    return '|'.join(canonical_skill_set(skills))
+
+
+class SkillResultStore:
+    """Results keyed by (kind, canonical skill set), memory LRU over a SQLite table."""
+
+    def __init__(self, db_path: str = SKILL_RESULTS_DB, max_memory_entries: int = 4096,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, clock=time.time):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._memory = MemoryTier(max_memory_entries, clock)
+        self._local = threading.local()
+        # One in-flight computation per key; other callers wait for its result
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'stores': 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS skill_results ('
+                'kind TEXT NOT NULL, skill_key TEXT NOT NULL, value TEXT NOT NULL, '
+                'created_at REAL NOT NULL, PRIMARY KEY (kind, skill_key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS skill_results_created ON skill_results (kind, created_at)')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _kind(kind: str) -> str:
+        return f"{kind}:v{RESULT_VERSIONS.get(kind, 1)}"
+
+    def _count(self, name: str):
+        with self._locks_guard:
+            self._counts[name] += 1
+
+    def lookup(self, kind: str, skills: Iterable[str]) -> Optional[Any]:
+        """The stored result for this skill set, or None. Never calls the model."""
+        kind, key = self._kind(kind), skill_set_key(skills)
+        memory_key = kind + '\0' + key
+        value = self._memory.get(memory_key)
+        if value is None:
+            row = self._conn().execute(
+                'SELECT value, created_at FROM skill_results WHERE kind = ? AND skill_key = ?',
+                (kind, key),
+            ).fetchone()
+            if row is None or row[1] + self.ttl_seconds < self._clock():
+                self._count('misses')
+                return None
+            value = row[0]
+            self._memory.set(memory_key, value, row[1] + self.ttl_seconds)
+        self._count('hits')
+        return json.loads(value)
+
+    def store(self, kind: str, skills: Iterable[str], result: Any):
+        kind, key = self._kind(kind), skill_set_key(skills)
+        value = json.dumps(result)
+        now = self._clock()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO skill_results (kind, skill_key, value, created_at) '
+                'VALUES (?, ?, ?, ?)',
+                (kind, key, value, now),
+            )
+        self._memory.set(kind + '\0' + key, value, now + self.ttl_seconds)
+        self._count('stores')
+
+    def get_or_compute(self, kind: str, skills: Iterable[str], compute: Callable[[], Any]) -> Any:
+        """
+        Returns the stored result, or runs compute() once (even with many callers
+        asking for the same set at the same time) and stores it if it is non-empty.
+        """
+        skills = canonical_skill_set(skills)
+        cached = self.lookup(kind, skills)
+        if cached is not None:
+            return cached
+
+        lock_key = (kind, skill_set_key(skills))
+        with self._locks_guard:
+            lock = self._key_locks.setdefault(lock_key, threading.Lock())
+        with lock:
+            try:
+                cached = self.lookup(kind, skills)
+                if cached is not None:
+                    return cached
+                result = compute()
+                if result:
+                    self.store(kind, skills, result)
+                return result
+            finally:
+                with self._locks_guard:
+                    self._key_locks.pop(lock_key, None)
+
+    def entries(self, kind: str, since: float = 0.0) -> Iterator[Tuple[List[str], Any, float]]:
+        """Yields (skill set, result, stored at) for every unexpired result of kind stored at or after since."""
+        rows = self._conn().execute(
+            'SELECT skill_key, value, created_at FROM skill_results '
+            'WHERE kind = ? AND created_at >= ? AND created_at >= ? ORDER BY created_at',
+            (self._kind(kind), since, self._clock() - self.ttl_seconds),
+        )
+        for key, value, created_at in rows:
+            yield key.split('|') if key else [], json.loads(value), created_at
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locks_guard:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+        return counts
+
+
+def common_skill_sets(profiles: Iterable[Dict[str, Any]], top: int) -> List[List[str]]:
+    """The top most frequent canonical skill sets across the given profiles."""
+    counts = Counter(tuple(canonical_skill_set(profile.get('skills', []))) for profile in profiles)
+    counts.pop((), None)
+    return [list(skills) for skills, _ in counts.most_common(top)]
+
+
+def prewarm(top: int = 500, workers: int = 4, kinds=('skill_gap', 'recommendation')) -> Dict[str, int]:
+    """Computes results for the most common skill sets among the users' latest profiles."""
+    from Chatbot import generate_skill_gap, recommend_for_skills, skill_results
+    from profile_store import profile_store
+
+    compute = {'skill_gap': generate_skill_gap, 'recommendation': recommend_for_skills}
+    skill_sets = common_skill_sets((data for _, data in profile_store.latest_profiles()), top)
+    todo = [(kind, skills) for skills in skill_sets for kind in kinds
+            if skill_results.lookup(kind, skills) is None]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda task: compute[task[0]](task[1]), todo))
+    return {
+        'skill_sets': len(skill_sets),
+        'already_stored': len(skill_sets) * len(kinds) - len(todo),
+        'computed': sum(1 for result in results if result),
+        'failed': sum(1 for result in results if not result),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute skill gap / recommendation results.')
+    parser.add_argument('--top', type=int, default=500, help='how many of the most common skill sets')
+    parser.add_argument('--workers', type=int, default=4, help='Gemini requests in flight at once')
+    args = parser.parse_args()
+    print(json.dumps(prewarm(top=args.top, workers=args.workers), indent=2))
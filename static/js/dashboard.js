@@ -0,0 +1,385 @@
+// --- Background Job Polling ---
+// Slow routes answer 202 with a job id; poll its status URL until the job finishes.
+async function pollJob(statusUrl) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const res = await fetch(statusUrl);
+        const data = await res.json();
+        if (res.status !== 202) return data.result || data;
+    }
+}
+
+async function waitForJob(response) {
+    const data = await response.json();
+    if (response.status !== 202 || !data.status_url) return data;
+    return pollJob(data.status_url);
+}
+
+// Reads a text/event-stream response and calls onEvent(name, data) per event.
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            onEvent(event, data ? JSON.parse(data) : null);
+        }
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    // --- Tab Navigation Logic ---
+    const navLinks = document.querySelectorAll('.sidebar .nav-link');
+    const sections = document.querySelectorAll('.page-section');
+
+    navLinks.forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault(); 
+            navLinks.forEach(nav => nav.classList.remove('active'));
+            sections.forEach(section => section.classList.remove('active'));
+            this.classList.add('active');
+            const targetId = this.getAttribute('data-target');
+            const targetSection = document.getElementById(targetId);
+            if (targetSection) {
+                // This is where the magic happens for the profile animation.
+                // By adding the 'active' class, our CSS animations are triggered.
+                targetSection.classList.add('active');
+            }
+        });
+    });
+
+    // --- Chat Bot & Button-to-Chat Logic ---
+    const chatForm = document.getElementById('chat-form');
+    const chatInput = document.getElementById('chat-input');
+    const chatMessages = document.getElementById('chat-messages');
+    const exploreJobsBtn = document.getElementById('explore-jobs-btn');
+    const findMentorsBtn = document.getElementById('find-mentors-btn');
+    const setGoalsBtn = document.getElementById('set-goals-btn');
+    const sendBtn = document.getElementById('send-btn');
+
+    function triggerChat(prompt) {
+        chatInput.value = prompt;
+        sendBtn.click();
+    }
+
+    if (exploreJobsBtn) {
+        exploreJobsBtn.addEventListener('click', () => {
+            triggerChat('Based on my resume, find relevant jobs for me');
+        });
+    }
+    if (findMentorsBtn) {
+        findMentorsBtn.addEventListener('click', () => {
+            triggerChat('Can you suggest some potential mentors in my field?');
+        });
+    }
+    if (setGoalsBtn) {
+        setGoalsBtn.addEventListener('click', () => {
+            triggerChat('Help me set 3 short-term and 1 long-term career goal');
+        });
+    }
+
+    if (chatForm) {
+        chatForm.addEventListener('submit', function(e) {
+            e.preventDefault();
+            const userMessage = chatInput.value;
+            if (userMessage.trim() === '') return;
+            if (chatMessages.classList.contains('hidden')) {
+                chatMessages.classList.remove('hidden');
+            }
+            const userMessageDiv = document.createElement('p');
+            userMessageDiv.innerHTML = `<strong>You:</strong> ${userMessage}`;
+            chatMessages.appendChild(userMessageDiv);
+            chatInput.value = '';
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+            const thinkingDiv = document.createElement('p');
+            thinkingDiv.innerHTML = `<strong>AI:</strong> Thinking...`;
+            chatMessages.appendChild(thinkingDiv);
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+            // Tokens are streamed in as the model produces them
+            fetch('/chat/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: userMessage }),
+            })
+            .then(response => {
+                let answerSpan = null;
+                return readEventStream(response, (event, data) => {
+                    if (event !== 'token') return;
+                    if (!answerSpan) {
+                        thinkingDiv.innerHTML = `<strong>AI:</strong> `;
+                        answerSpan = document.createElement('span');
+                        thinkingDiv.appendChild(answerSpan);
+                    }
+                    answerSpan.textContent += data.text;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                });
+            })
+            .catch(error => {
+                thinkingDiv.innerHTML = `<strong>AI:</strong> Sorry, there was an error. Please try again.`;
+                console.error('Error:', error);
+            });
+        });
+    }
+
+    // --- Resume Upload Logic ---
+    const resumeForm = document.getElementById('resume-form');
+    if (resumeForm) {
+        const resumeResultDiv = document.getElementById('resume-result');
+        resumeForm.addEventListener('submit', function(e) {
+            e.preventDefault(); 
+            const fileInput = resumeForm.querySelector('input[type="file"]');
+            const file = fileInput.files[0];
+            if (!file) {
+                resumeResultDiv.innerHTML = `<p style="color: #ff6600;">Please select a file to analyze.</p>`;
+                return;
+            }
+            const formData = new FormData();
+            formData.append('resume', file);
+            resumeResultDiv.innerHTML = `<p>Analyzing your resume...</p>`;
+            fetch('/upload', { method: 'POST', body: formData })
+            .then(waitForJob)
+            .then(data => {
+                if (data.error) {
+                    resumeResultDiv.innerHTML = `<p style="color: #ff4444;"><strong>Error:</strong> ${data.error}</p>`;
+                } 
+                else if (data.message && data.enrichment) {
+                    // Skills are already saved; name and experience are still being filled in
+                    resumeResultDiv.innerHTML = `<p style="color: #00ff66;">${data.message} Completing your profile...</p>`;
+                    pollJob(data.enrichment.status_url).finally(() => { window.location.reload(); });
+                }
+                else if (data.message) {
+                    resumeResultDiv.innerHTML = `<p style="color: #00ff66;">${data.message}</p>`;
+                    setTimeout(() => { window.location.reload(); }, 2000); 
+                }
+            })
+            .catch(error => {
+                resumeResultDiv.innerHTML = `<p style="color: #ff4444;">A network error occurred.</p>`;
+                console.error('Fetch Error:', error);
+            });
+        });
+    }
+
+    // --- Recommendations Logic with Animation ---
+    const generateBtn = document.getElementById("generate-btn");
+    if (generateBtn) {
+        generateBtn.addEventListener("click", async () => {
+            const loading = document.getElementById("loading");
+            const resultDiv = document.getElementById("recommendations-result");
+
+            if (loading) loading.style.display = "block";
+            if (resultDiv) resultDiv.innerHTML = "";
+
+            try {
+                const response = await fetch("/generate_recommendations");
+                const data = await response.json();
+                if (loading) loading.style.display = "none";
+
+                if (data.error) {
+                    resultDiv.innerHTML = `<p style="color:red;">${data.error}</p>`;
+                    return;
+                }
+
+                let delayCounter = 0;
+                const createAndAppend = (tag, text, parent) => {
+                    const el = document.createElement(tag);
+                    if (text) el.textContent = text;
+                    parent.appendChild(el);
+                    el.classList.add('animated-item');
+                    el.style.animationDelay = `${delayCounter * 0.1}s`;
+                    delayCounter++; 
+                    return el;
+                };
+
+                createAndAppend('h4', 'AI Recommendations', resultDiv);
+
+                const sections = {
+                    "Career Paths": data.career_paths,
+                    "Next Skills to Learn": data.next_skills,
+                    "Target Industries": data.industries,
+                    "Tips": data.tips
+                };
+
+                let contentFound = false;
+                for (const title in sections) {
+                    const items = sections[title];
+                    if (items?.length) {
+                        contentFound = true;
+                        createAndAppend('h5', title, resultDiv);
+                        const ul = createAndAppend('ul', null, resultDiv);
+                        delayCounter--; 
+                        ul.style.animationDelay = `${delayCounter * 0.1}s`;
+
+                        items.forEach(itemText => {
+                            createAndAppend('li', itemText, ul);
+                        });
+                    }
+                }
+
+                if (!contentFound) {
+                    createAndAppend('p', 'Please wait for your Output', resultDiv);
+                }
+
+            } catch (err) {
+                if (loading) loading.style.display = "none";
+                resultDiv.innerHTML = `<p style="color:red;">An error occurred while fetching recommendations.</p>`;
+                console.error('Recommendation Fetch Error:', err);
+            }
+        });
+    }
+});
+
+// PROFILE EDIT/UPDATE JS (only affects profile UI)
+document.addEventListener('DOMContentLoaded', function() {
+    const editBtn = document.getElementById('edit-profile-btn');
+    const displayView = document.getElementById('profile-display-view');
+    const editView = document.getElementById('profile-edit-view');
+    const cancelBtn = document.getElementById('cancel-edit-btn');
+    const updateStatus = document.getElementById('update-status');
+
+    if (editBtn) {
+        editBtn.addEventListener('click', () => {
+            displayView.style.display = 'none';
+            editView.style.display = 'block';
+            updateStatus.textContent = '';
+            // scroll a bit so form visible
+            editView.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        });
+    }
+
+    if (cancelBtn) {
+        cancelBtn.addEventListener('click', () => {
+            editView.style.display = 'none';
+            displayView.style.display = 'block';
+        });
+    }
+
+    if (editView) {
+        editView.addEventListener('submit', async (e) => {
+            e.preventDefault();
+            updateStatus.textContent = 'Saving...';
+            updateStatus.style.color = '#ff9933';
+
+            const profileData = {
+                location: document.getElementById('edit-location').value,
+                currentRole: document.getElementById('edit-currentRole').value,
+                educationLevel: document.getElementById('edit-educationLevel').value,
+                fieldOfStudy: document.getElementById('edit-fieldOfStudy').value,
+                interests: document.getElementById('edit-interests').value,
+                careerPreferences: document.getElementById('edit-careerPreferences').value,
+                shortTermGoals: document.getElementById('edit-shortTermGoals').value,
+                longTermGoals: document.getElementById('edit-longTermGoals').value
+            };
+
+            try {
+                const res = await fetch('/update_profile', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(profileData)
+                });
+                const result = await res.json();
+
+                if (result.success) {
+                    updateStatus.textContent = result.message;
+                    updateStatus.style.color = '#00ff66';
+                    // update display spans if present
+                    for (const key in result.user) {
+                        const span = displayView.querySelector(`span[data-key="${key}"]`);
+                        if (span) span.textContent = result.user[key] || 'N/A';
+                    }
+                    setTimeout(() => {
+                        editView.style.display = 'none';
+                        displayView.style.display = 'block';
+                    }, 1400);
+                } else {
+                    updateStatus.textContent = 'Error: ' + (result.error || 'Unknown');
+                    updateStatus.style.color = 'red';
+                }
+            } catch (err) {
+                updateStatus.textContent = 'Network error occurred';
+                updateStatus.style.color = 'red';
+            }
+        });
+    }
+});
+
+document.addEventListener("DOMContentLoaded", () => {
+    const generateBtn = document.getElementById("generate-btn");
+    const loading = document.getElementById("loading");
+    const resultDiv = document.getElementById("recommendations-result");
+
+    if (generateBtn) {
+        generateBtn.addEventListener("click", async () => {
+            loading.style.display = "block";
+            resultDiv.innerHTML = "";
+
+            try {
+                const response = await fetch("/generate_recommendations");
+                const data = await response.json();
+                loading.style.display = "none";
+
+                if (data.next_steps) {
+                    // FIXED: Wrapped the HTML content in backticks (`)
+                    resultDiv.innerHTML = `<h4>AI Recommendations</h4><p>${data.next_steps}</p>`;
+                } else {
+                    // FIXED: Wrapped the HTML content in backticks (`)
+                    resultDiv.innerHTML = `<p>No recommendations available.</p>`;
+                }
+            } catch (err) {
+                loading.style.display = "none";
+                // FIXED: Wrapped the HTML content in backticks (`)
+                resultDiv.innerHTML = `<p style="color:red;">Error fetching recommendations.</p>`;
+            }
+        });
+    }
+});
+
+const analyzeBtn = document.getElementById('analyze-gap-btn');
+const missingSkillsContainer = document.getElementById('missing-skills-container');
+
+analyzeBtn.addEventListener('click', () => {
+    // 1. Show a loading state to the user
+    analyzeBtn.textContent = 'Analyzing...';
+    analyzeBtn.disabled = true;
+    missingSkillsContainer.innerHTML = '<p>Please wait, the AI is analyzing your skill gap...</p>';
+
+    // 2. Call the '/generate' route on your backend
+    fetch('/generate', {
+        method: 'POST',
+    })
+    .then(waitForJob)
+    .then(data => {
+        // 3. Display the results
+        if (data.skills && data.skills.length > 0) {
+            const skillsHtml = data.skills.map(skill => 
+                `<span class="skill-badge-missing">${skill}</span>`
+            ).join('');
+
+            missingSkillsContainer.innerHTML = `
+                <h6>Recommended skills to learn:</h6>
+                <div class="skills-container">${skillsHtml}</div>
+            `;
+        } else {
+            missingSkillsContainer.innerHTML = '<p><strong>Analysis complete!</strong> No significant skill gaps were found.</p>';
+        }
+        analyzeBtn.style.display = 'none'; // Hide button after analysis
+    })
+    .catch(error => {
+        // 4. Handle any errors
+        console.error('Skill gap analysis failed:', error);
+        missingSkillsContainer.innerHTML = '<p style="color: red;">An error occurred during analysis. Please try again.</p>';
+        analyzeBtn.textContent = 'Analyze Skill Gap';
+        analyzeBtn.disabled = false;
+    });
+});
@@ -0,0 +1,233 @@
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli  # optional; without it only gzip variants are built
+except ImportError:
+    brotli = None
+
+# Label: Static Assets
+# The login, register and dashboard pages used to inline all of their CSS and
+# JS, so every view re-sent it and no browser or CDN could cache it. Their CSS
+# and JS now live in static/css and static/js. build() copies each file to
+# static/dist under a name containing a hash of its content
+# (dashboard.css -> dashboard.3f9c0d21a7be.css), with gzip and, when the brotli
+# package is installed, brotli versions next to it, and writes a manifest of
+# source name -> built name. Templates link them with asset_url(), so a changed
+# file gets a new URL and a built file never changes: they are served with a
+# one-year immutable Cache-Control, and repeat page loads only fetch the HTML.
+# Files a build replaces stay servable for RETAIN_PREVIOUS_SECONDS (listed in
+# retired.json), so a page cached or still open from before a deploy keeps its
+# CSS and JS. The app builds on startup when the sources no longer match the
+# manifest; run
+#   python static_assets.py
+# to build ahead of a deploy (e.g. in the image build).
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_SUBDIR = 'dist'
+MANIFEST = 'manifest.json'
+# Built files replaced by a newer build -> when they were replaced
+RETIRED = 'retired.json'
+RETAIN_PREVIOUS_SECONDS = 7 * 24 * 60 * 60
+SOURCE_EXTENSIONS = ('.css', '.js')
+HASH_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Preferred first when the browser accepts several
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _sources(source_dir: str) -> List[str]:
+    """Source asset names (relative, with forward slashes), outside the build directory."""
+    names = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if not (root == source_dir and d == BUILD_SUBDIR))
+        for filename in sorted(files):
+            if filename.endswith(SOURCE_EXTENSIONS):
+                names.append(os.path.relpath(os.path.join(root, filename), source_dir).replace(os.sep, '/'))
+    return names
+
+
+def _write_atomic(path: str, data: bytes):
+    # Several workers may build at once; each file appears whole or not at all
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    """css/login.css -> login.<content hash>.css (the build directory is flat)."""
+    stem, extension = os.path.splitext(os.path.basename(name))
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _retire(build_dir: str, previous: Dict[str, str], manifest: Dict[str, str]):
+    """Records the files the new manifest no longer uses and deletes those retired long enough ago."""
+    now = time.time()
+    retired = _read_json(os.path.join(build_dir, RETIRED)) or {}
+    current = set(manifest.values())
+    for built in set(previous.values()) - current:
+        retired.setdefault(built, now)
+    for built, retired_at in list(retired.items()):
+        if built in current:
+            del retired[built]
+        elif now - retired_at > RETAIN_PREVIOUS_SECONDS:
+            for suffix in ('',) + tuple(suffix for _, suffix in ENCODINGS):
+                try:
+                    os.unlink(os.path.join(build_dir, built + suffix))
+                except FileNotFoundError:
+                    pass
+            del retired[built]
+    _write_atomic(os.path.join(build_dir, RETIRED), json.dumps(retired, indent=2, sort_keys=True).encode())
+
+
+def build(source_dir: str = SOURCE_DIR) -> Dict[str, str]:
+    """Writes the hashed and precompressed files and the manifest; returns the manifest."""
+    build_dir = os.path.join(source_dir, BUILD_SUBDIR)
+    os.makedirs(build_dir, exist_ok=True)
+    previous = _read_json(os.path.join(build_dir, MANIFEST)) or {}
+    manifest = {}
+    for name in _sources(source_dir):
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            data = f.read()
+        built = manifest[name] = hashed_name(name, data)
+        path = os.path.join(build_dir, built)
+        if os.path.exists(path):
+            continue
+        _write_atomic(path, data)
+        # mtime=0 keeps the .gz byte-identical across builds
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                _write_atomic(path + suffix, compressed)
+    _retire(build_dir, previous, manifest)
+    _write_atomic(os.path.join(build_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class BuiltAsset:
+    __slots__ = ('mimetype', 'etag', 'bodies')
+
+    def __init__(self, mimetype: str, etag: str, bodies: Dict[str, bytes]):
+        self.mimetype = mimetype
+        self.etag = etag
+        # Content-Encoding ('identity', 'gzip', 'br') -> bytes
+        self.bodies = bodies
+
+
+class StaticAssets:
+    """The built assets, held in memory, and the URLs templates link them by."""
+
+    def __init__(self, source_dir: str = SOURCE_DIR):
+        self.source_dir = source_dir
+        self.build_dir = os.path.join(source_dir, BUILD_SUBDIR)
+        self._manifest: Dict[str, str] = {}
+        # Changes with every build that changes a URL; part of the page ETags
+        self.version = ''
+        self._assets: Dict[str, BuiltAsset] = {}
+        self._lock = threading.Lock()
+
+    def _stale(self, manifest: Dict[str, str]) -> bool:
+        names = _sources(self.source_dir)
+        if sorted(manifest) != names:
+            return True
+        for name in names:
+            with open(os.path.join(self.source_dir, name), 'rb') as f:
+                if manifest[name] != hashed_name(name, f.read()):
+                    return True
+        return False
+
+    def _read_built(self, built: str) -> Optional[BuiltAsset]:
+        bodies = {}
+        for encoding, suffix in (('identity', ''),) + ENCODINGS:
+            path = os.path.join(self.build_dir, built + suffix)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    bodies[encoding] = f.read()
+        if 'identity' not in bodies:
+            return None
+        mimetype = mimetypes.guess_type(built)[0] or 'application/octet-stream'
+        # The name already carries the content hash
+        return BuiltAsset(mimetype, built.rsplit('.', 2)[-2], bodies)
+
+    def load(self, rebuild_if_stale: bool = True):
+        """Reads the manifest and the built files into memory, building them first if they are missing or stale."""
+        with self._lock:
+            manifest = _read_json(os.path.join(self.build_dir, MANIFEST))
+            if manifest is None or (rebuild_if_stale and self._stale(manifest)):
+                try:
+                    manifest = build(self.source_dir)
+                except OSError as e:
+                    # e.g. a read-only deploy: asset_url() falls back to the unhashed /static/ files
+                    print(f"Could not build static assets ({e}); serving them unhashed")
+                    manifest = {}
+            # The current build, plus the files earlier builds linked that are still retained
+            retired = _read_json(os.path.join(self.build_dir, RETIRED)) or {}
+            assets = {}
+            for built in list(manifest.values()) + sorted(retired):
+                asset = self._read_built(built)
+                if asset is not None:
+                    assets[built] = asset
+            self._manifest, self._assets = manifest, assets
+            self.version = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+
+    def built_name(self, name: str) -> Optional[str]:
+        """The hashed file name for a source asset name such as 'css/login.css'."""
+        return self._manifest.get(name)
+
+    def select(self, built: str, accept_encoding) -> Optional[Tuple[BuiltAsset, str]]:
+        """
+        The asset and the Content-Encoding to send it with, given the request's
+        Accept-Encoding (werkzeug's request.accept_encodings); None if unknown.
+        """
+        asset = self._assets.get(built)
+        if asset is None:
+            return None
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.bodies and accept_encoding[encoding]:
+                return asset, encoding
+        return asset, 'identity'
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'assets': len(self._assets),
+            'bytes': sum(len(asset.bodies['identity']) for asset in self._assets.values()),
+        }
+
+
+static_assets = StaticAssets()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the hashed, precompressed static assets.')
+    parser.add_argument('--source-dir', default=SOURCE_DIR)
+    args = parser.parse_args()
+    built_dir = os.path.join(args.source_dir, BUILD_SUBDIR)
+    for source, built_file in build(args.source_dir).items():
+        sizes = [f"{suffix or 'raw'} {os.path.getsize(os.path.join(built_dir, built_file + suffix))}B"
+                 for suffix in ('', '.gz', '.br') if os.path.exists(os.path.join(built_dir, built_file + suffix))]
+        print(f"{source} -> {BUILD_SUBDIR}/{built_file} ({', '.join(sizes)})")
+    if brotli is None:
+        print("brotli is not installed; built gzip variants only (pip install brotli)")
@@ -0,0 +1,63 @@
+import json
+from typing import Any, Optional
+
+# Label: Streaming Helpers
+# Used by the server-sent-events routes so the browser sees tokens as soon as the
+# model produces them instead of waiting for the full response.
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one server-sent event; data is JSON-encoded so newlines are safe."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Stops nginx-style proxies from buffering the whole stream
+    'X-Accel-Buffering': 'no',
+}
+
+
+def render_markdown(text: str) -> str:
+    # python-markdown is imported on first use: workers that only serve the login
+    # and dashboard pages never load it
+    import markdown
+    return markdown.markdown(text)
+
+
+class IncrementalMarkdown:
+    """
+    Renders streamed Markdown to HTML block by block. A block is finished once a
+    blank line follows it (outside a code fence); feed() returns the HTML for any
+    blocks that became complete, and finish() renders whatever is left.
+    """
+
+    def __init__(self):
+        self._pending = ''
+        self.markdown_text = ''
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.markdown_text += chunk
+        self._pending += chunk
+
+        # _pending always starts on a block boundary, i.e. outside any code fence
+        in_fence = False
+        complete_upto = 0
+        position = 0
+        for line in self._pending.splitlines(keepends=True):
+            position += len(line)
+            if not line.endswith('\n'):
+                break
+            if line.lstrip().startswith('```'):
+                in_fence = not in_fence
+            elif not line.strip() and not in_fence:
+                complete_upto = position
+
+        if not complete_upto:
+            return None
+        ready, self._pending = self._pending[:complete_upto], self._pending[complete_upto:]
+        return render_markdown(ready) if ready.strip() else None
+
+    def finish(self) -> Optional[str]:
+        ready, self._pending = self._pending, ''
+        return render_markdown(ready) if ready.strip() else None
@@ -0,0 +1,77 @@
+import json
+import re
+from typing import Any, Dict
+
+# Label: Structured Model Output
+# Functions that need data back from Gemini ask for JSON (response_mime_type) and
+# pass the expected shape as response_schema, so the model can only answer in
+# that shape. The answer is still checked here before it is used or cached: the
+# schema is a plain dict in the OpenAPI subset Gemini accepts (type, properties,
+# required, items), and validate() understands the same subset.
+
+_JSON_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'integer': int,
+    'number': (int, float),
+    'boolean': bool,
+}
+
+
+class SchemaError(ValueError):
+    """The model's answer is not JSON, or not the JSON the schema asks for."""
+
+
+def json_config(schema: Dict[str, Any], max_output_tokens: int, **extra) -> Dict[str, Any]:
+    """generation_config for a schema-constrained JSON answer of at most max_output_tokens."""
+    return dict(extra, response_mime_type='application/json', response_schema=schema,
+                max_output_tokens=max_output_tokens)
+
+
+def loads_json(text: str) -> Any:
+    """
+    Parses a JSON answer, tolerating Markdown code fences or stray text around the
+    object or array. Raises SchemaError if there is no JSON in it.
+    """
+    text = (text or '').strip()
+    if text.startswith('```'):
+        text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    for open_char, close_char in (('{', '}'), ('[', ']')):
+        start, end = text.find(open_char), text.rfind(close_char)
+        if start != -1 and end > start:
+            try:
+                return json.loads(text[start:end + 1])
+            except json.JSONDecodeError:
+                continue
+    raise SchemaError('No JSON in the model response')
+
+
+def validate(data: Any, schema: Dict[str, Any], path: str = '$') -> Any:
+    """Returns data if it matches schema, otherwise raises SchemaError naming the first mismatch."""
+    expected = schema.get('type')
+    python_type = _JSON_TYPES.get(expected)
+    # bool is an int in Python, but not in JSON
+    if python_type is not None and (not isinstance(data, python_type)
+                                    or (expected in ('integer', 'number') and isinstance(data, bool))):
+        raise SchemaError(f"{path}: expected {expected}, got {type(data).__name__}")
+
+    if expected == 'object':
+        for key in schema.get('required', ()):
+            if key not in data:
+                raise SchemaError(f"{path}: missing '{key}'")
+        for key, child in schema.get('properties', {}).items():
+            if key in data:
+                validate(data[key], child, f"{path}.{key}")
+    elif expected == 'array' and 'items' in schema:
+        for index, item in enumerate(data):
+            validate(item, schema['items'], f"{path}[{index}]")
+    return data
+
+
+def parse_structured(text: str, schema: Dict[str, Any]) -> Any:
+    return validate(loads_json(text), schema)
@@ -0,0 +1,110 @@
+import contextvars
+
+import pytest
+
+import metrics
+from fair_scheduler import BATCH, INTERACTIVE, FairScheduler, QuotaExceededError, set_caller
+from gemini_client import DEFAULT_OUTPUT_ESTIMATE, FakeBackend, GeminiClient
+
+# Token-bucket accounting, on a clock that only moves when a test moves it
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    # 10 tokens a second, up to 1000
+    scheduler = FairScheduler(slots=4, interactive_slots=1, tokens_per_minute=600, burst_tokens=1000, clock=clock)
+    metrics.on_tokens(scheduler.record_usage)
+    yield scheduler
+    metrics._token_listeners.remove(scheduler.record_usage)
+
+
+def as_user(user, call):
+    def run():
+        set_caller(user, BATCH)
+        return call()
+    return contextvars.copy_context().run(run)
+
+
+def bucket(scheduler, user='ann'):
+    return scheduler.usage(user)['bucket_tokens']
+
+
+def test_a_call_costs_its_reported_tokens_once(scheduler):
+    backend = FakeBackend(latency=0, responder=lambda *args: 'x' * 400)  # 100 output tokens
+    client = GeminiClient(backend, default_timeout=5, scheduler=scheduler)
+    as_user('ann', lambda: client.generate('p' * 400))  # 100 prompt tokens
+
+    # The 100 + 512 estimate was replaced by the 100 + 100 the call used
+    assert bucket(scheduler) == 800
+    assert scheduler.usage('ann')['output_tokens'] == 100
+
+
+def test_release_settles_the_estimate_against_the_reported_tokens(scheduler):
+    ticket = scheduler.acquire(300, timeout=1, caller=('ann', BATCH))
+    assert bucket(scheduler) == 700
+    scheduler.record_usage(400, 200, caller=('ann', BATCH))
+    scheduler.release(ticket)
+    assert bucket(scheduler) == 400
+
+    ticket = scheduler.acquire(300, timeout=1, caller=('ann', BATCH))
+    scheduler.record_usage(50, 50, caller=('ann', BATCH))
+    scheduler.release(ticket)
+    assert bucket(scheduler) == 300
+
+
+def test_an_answer_without_a_token_count_costs_its_estimate(scheduler):
+    ticket = scheduler.acquire(100 + DEFAULT_OUTPUT_ESTIMATE, timeout=1, caller=('ann', BATCH))
+    scheduler.release(ticket)
+    assert bucket(scheduler) == 1000 - 100 - DEFAULT_OUTPUT_ESTIMATE
+
+
+def test_the_bucket_refills_with_time_up_to_the_burst(scheduler, clock):
+    scheduler.release(scheduler.acquire(600, timeout=1, caller=('ann', BATCH)))
+    assert bucket(scheduler) == 400
+    clock.now += 30
+    scheduler.release(scheduler.acquire(0, timeout=1, caller=('ann', BATCH)))
+    assert bucket(scheduler) == 700
+    clock.now += 3600
+    scheduler.release(scheduler.acquire(0, timeout=1, caller=('ann', BATCH)))
+    assert bucket(scheduler) == 1000
+
+
+def test_a_chat_that_would_wait_too_long_is_refused_and_not_charged(scheduler):
+    scheduler.release(scheduler.acquire(1000, timeout=1, caller=('ann', BATCH)))
+    # 10 tokens a second: another 100 would take 10s to pay off, past INTERACTIVE_MAX_WAIT
+    with pytest.raises(QuotaExceededError) as refused:
+        scheduler.acquire(100, timeout=30, caller=('ann', INTERACTIVE))
+    assert refused.value.retry_after == pytest.approx(10)
+    assert bucket(scheduler) == 0
+    assert scheduler.usage('ann')['refused'] == 1
+    # Other users have their own bucket
+    scheduler.release(scheduler.acquire(100, timeout=1, caller=('bob', INTERACTIVE)))
+    assert bucket(scheduler, 'bob') == 900
+
+
+def test_a_failed_call_is_refunded(scheduler):
+    ticket = scheduler.acquire(600, timeout=1, caller=('ann', BATCH))
+    scheduler.release(ticket, refund=True)
+    assert bucket(scheduler) == 1000
+
+
+def test_calls_without_a_user_are_never_charged(scheduler):
+    ticket = scheduler.acquire(5000, timeout=1, caller=(None, BATCH))
+    scheduler.record_usage(3000, 3000, caller=(None, BATCH))
+    scheduler.release(ticket)
+    assert scheduler.usage()[0]['user'] == '(system)'
+    assert scheduler.usage()[0]['prompt_tokens'] == 3000
+    assert scheduler.stats()['throttled'] == 0
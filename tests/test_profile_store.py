@@ -0,0 +1,24 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from profile_store import ProfileStore
+
+# The one-time import of parsed_resumes/*.json
+
+
+def test_workers_starting_together_import_the_legacy_files_once(tmp_path):
+    for username in ('amy', 'bob'):
+        for number in (1, 2):
+            (tmp_path / f'{username}_{number}.json').write_text(json.dumps({'skills': [f'skill {number}']}))
+
+    def migrate(_):
+        # A store per worker, as in separate processes: nothing is shared but the database
+        store = ProfileStore(str(tmp_path / 'profiles.db'), legacy_dir=str(tmp_path))
+        return store.migrate_legacy_files(['amy', 'bob'])
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        imported = sorted(pool.map(migrate, range(4)))
+
+    assert imported == [0, 0, 0, 4]
+    store = ProfileStore(str(tmp_path / 'profiles.db'), legacy_dir=str(tmp_path))
+    assert [len(store.history(username)) for username in ('amy', 'bob')] == [2, 2]
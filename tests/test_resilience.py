@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from benchmark import drive_client
+from gemini_client import FakeBackend, GeminiClient
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from response_cache import ResponseCache
+
+# Fake-backend checks for the retry, hedging and circuit-breaker layers
+# (benchmark.py resilience reports the same scenarios at a larger scale).
+
+
+def make_client(backend, max_attempts=1, hedge_after=None, breaker=None, timeout=5.0):
+    return GeminiClient(backend, max_concurrency=16, default_timeout=timeout,
+                        retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=0.01,
+                                                 min_attempt_time=0.05, seed=7),
+                        breaker=breaker, hedge_after=hedge_after)
+
+
+def test_hedging_cuts_the_slow_tail():
+    def p99(hedge_after):
+        # A hedge is slow as well only tail_rate of the time, so both are ~0.2% of calls
+        backend = FakeBackend(latency=0.02, tail_rate=0.04, tail_latency=0.6, seed=7)
+        client = make_client(backend, hedge_after=hedge_after)
+        return drive_client(lambda i: client.generate(f'prompt {i}'), 200, 8)['p99_ms']
+
+    unhedged, hedged = p99(None), p99(0.1)
+    assert unhedged >= 550
+    assert hedged < unhedged / 2
+
+
+def test_open_breaker_fails_fast_and_serves_stale_answers():
+    backend = FakeBackend(latency=0.01, seed=7)
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    client = make_client(backend, breaker=breaker)
+    cache = ResponseCache(ttl_seconds=0)  # every entry is stale straight away
+    answer = cache.get_or_generate('prompt', 'fake', None, lambda: client.generate('prompt'))
+
+    backend.failure_rate, backend.latency = 1.0, 0.2
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            client.generate('other prompt')
+    assert breaker.state == 'open'
+
+    calls_before = backend.calls
+    started = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        client.generate('other prompt')
+    assert time.perf_counter() - started < 0.05
+    assert cache.get_or_generate('prompt', 'fake', None, lambda: client.generate('prompt')) == answer
+    assert backend.calls == calls_before
+    assert cache.stats()['stale_served'] == 1
+
+
+def test_retries_stop_at_the_deadline():
+    backend = FakeBackend(latency=0.1, failure_rate=1.0, seed=7)
+    client = make_client(backend, max_attempts=50, timeout=0.35)
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        client.generate('prompt')
+    assert time.perf_counter() - started < 0.5
+    assert 2 <= backend.calls <= 4
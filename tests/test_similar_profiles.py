@@ -0,0 +1,83 @@
+import pytest
+
+import Chatbot
+from profile_store import ProfileStore
+from similar_profiles import REUSED_ROADMAP_MARKER, SimilarResults, SkillSetIndex, readdress_roadmap
+from skill_results import SkillResultStore
+
+# Reuse of skill gaps and roadmaps from users with similar skills, on throwaway stores
+
+SKILLS = ['Python', 'SQL', 'Docker', 'AWS']
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    profiles = ProfileStore(str(tmp_path / 'profiles.db'), legacy_dir=str(tmp_path))
+    results = SkillResultStore(str(tmp_path / 'skill_results.db'))
+    monkeypatch.setattr(Chatbot, 'profile_store', profiles)
+    monkeypatch.setattr(Chatbot, '_similar', SimilarResults(profiles, results, threshold=0.7))
+    return profiles, results
+
+
+def add_user(profiles, username, skills=SKILLS, goal='Data Engineer', roadmap=None, **artifacts):
+    profiles.save(username, {'skills': skills, 'careerPreferences': goal})
+    if roadmap is not None:
+        artifacts['roadmap_html'] = roadmap
+    if artifacts:
+        profiles.put_artifacts(username, artifacts)
+
+
+def reuse(username, skills=SKILLS, goal='Data Engineer'):
+    return Chatbot.similar_roadmap(username, {'careerPreferences': goal}, skills)
+
+
+def test_index_finds_the_most_similar_set_in_the_group():
+    index = SkillSetIndex()
+    index.add(['python', 'sql', 'docker'], 'a', group='data')
+    index.add(['python', 'sql'], 'b', group='data')
+    index.add(['python', 'sql', 'docker', 'aws'], 'c', group='web')
+
+    similarity, skills, value = index.nearest(['Python', 'SQL', 'Docker', 'AWS'], group='data')
+    assert (value, sorted(skills)) == ('a', ['docker', 'python', 'sql'])
+    assert similarity == pytest.approx(3 / 4)
+    assert index.nearest(['python', 'sql', 'docker'], group='data', exclude=lambda v: v == 'a')[2] == 'b'
+    assert index.nearest(['rust'], group='data') is None
+    assert index.nearest(['python'], group='data', min_similarity=0.9) is None
+
+
+def test_a_similar_users_roadmap_is_readdressed(stores):
+    profiles, _ = stores
+    add_user(profiles, 'bob', roadmap='<h1>A roadmap for Bob</h1><p>Learn Spark.</p>')
+
+    roadmap_html, source = reuse('amy', SKILLS + ['Git'])
+    assert roadmap_html == '<h1>A roadmap for amy</h1><p>Learn Spark.</p>'
+    assert source == 'bob@1'
+
+
+def test_the_requesters_own_roadmap_is_never_reused(stores):
+    profiles, _ = stores
+    add_user(profiles, 'amy', roadmap='<h1>A roadmap for amy</h1><p>Learn Spark.</p>')
+    assert reuse('amy') is None
+
+
+def test_failed_reused_and_off_goal_roadmaps_are_not_handed_on(stores):
+    profiles, _ = stores
+    add_user(profiles, 'bob', roadmap="<p style='color:red;'>Error: Could not generate a roadmap.</p>")
+    add_user(profiles, 'cat', roadmap='<h1>For cat</h1>', **{REUSED_ROADMAP_MARKER: 'dan@1'})
+    add_user(profiles, 'eve', goal='Designer', roadmap='<h1>For eve</h1>')
+    assert reuse('amy') is None
+
+
+def test_the_name_is_only_replaced_in_the_greeting():
+    roadmap_html = '<h2>Roadmap for Go</h2>\n<ul><li>Learn SQL</li></ul>'
+    assert readdress_roadmap(roadmap_html, 'go', 'amy') == '<h2>Roadmap for amy</h2>\n<ul><li>Learn SQL</li></ul>'
+    # 'Go' is also a skill here: replacing it would corrupt the plan, so the roadmap isn't reused
+    assert readdress_roadmap('<h2>Roadmap for Go</h2><p>Learn Go.</p>', 'go', 'amy') is None
+    assert readdress_roadmap('<p>Hi Bob!</p>', 'bob', '<amy>') == '<p>Hi &lt;amy&gt;!</p>'
+
+
+def test_a_similar_skill_gap_leaves_out_skills_already_held(stores):
+    _, results = stores
+    results.store('skill_gap', SKILLS, ['Kubernetes', 'Git', 'Terraform'])
+    assert Chatbot.similar_skill_gap(SKILLS + ['Git']) == ['Kubernetes', 'Terraform']
+    assert Chatbot.similar_skill_gap(['Photoshop']) is None
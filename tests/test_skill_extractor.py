@@ -0,0 +1,42 @@
+import pytest
+
+from skill_extractor import canonical_skill, canonical_skill_set, extract_emails, extract_phones, extract_skills
+
+# Phone numbers the resume parser fills the profile with, without a model call
+
+
+@pytest.mark.parametrize('text, phones', [
+    ('+1 (555) 123-4567.', ['+1 (555) 123-4567']),
+    ('Contact: 555 123 4567.', ['555 123 4567']),
+    ('Call 555.123.4567 or 555-765-4321', ['555.123.4567', '555-765-4321']),
+    ('Phone:\t+44 20 7946 0958\nEmail: a@b.io', ['+44 20 7946 0958']),
+])
+def test_phone_numbers_are_found(text, phones):
+    assert extract_phones(text) == phones
+
+
+@pytest.mark.parametrize('text', [
+    '2019 - 2021\n2017 - 2019',
+    '2019 - 2021 2021-2023',
+    'Acme Corp 2015 – 2019 2019 – 2023',
+])
+def test_year_ranges_are_not_phone_numbers(text):
+    assert extract_phones(text) == []
+
+
+def test_a_number_does_not_run_on_into_the_next_line():
+    assert extract_phones('555 123 4567\n2019 - 2021') == ['555 123 4567']
+
+
+def test_emails_lose_a_sentence_ending_period_and_repeats():
+    text = 'Mail jane.doe@example.com. Or jane.doe@example.com, or j+cv@mail.example.org.'
+    assert extract_emails(text) == ['jane.doe@example.com', 'j+cv@mail.example.org']
+
+
+def test_skills_are_found_in_order_under_their_canonical_names():
+    skills = extract_skills('Built services in Python on k8s, then Postgres and python scripts.')
+    assert skills == [canonical_skill('Python'), canonical_skill('k8s'), canonical_skill('Postgres')]
+
+
+def test_canonical_skill_sets_ignore_spelling_order_and_repeats():
+    assert canonical_skill_set(['Python', 'k8s', ' ']) == canonical_skill_set(['kubernetes', 'python', 'PYTHON'])
@@ -0,0 +1,70 @@
+import pytest
+
+import skill_results
+from skill_results import SkillResultStore
+
+# The shared results table, keyed by canonical skill set, on a clock tests move by hand
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return SkillResultStore(str(tmp_path / 'skill_results.db'), ttl_seconds=60, clock=clock)
+
+
+def test_sets_that_differ_only_in_spelling_and_order_share_a_result(store):
+    store.store('skill_gap', ['Python', 'k8s', 'Postgres'], ['Go'])
+    assert store.lookup('skill_gap', ['postgresql', 'Kubernetes', 'python', 'Python']) == ['Go']
+    assert store.lookup('skill_gap', ['Python', 'Kubernetes']) is None
+    assert store.lookup('recommendation', ['Python', 'k8s', 'Postgres']) is None
+
+
+def test_results_outlive_the_memory_tier_and_expire_after_the_ttl(store, clock, tmp_path):
+    store.store('skill_gap', ['Python'], ['SQL'])
+    # Another worker sees it through the table
+    other = SkillResultStore(str(tmp_path / 'skill_results.db'), ttl_seconds=60, clock=clock)
+    assert other.lookup('skill_gap', ['python']) == ['SQL']
+
+    clock.now += 61
+    assert store.lookup('skill_gap', ['Python']) is None
+    assert other.lookup('skill_gap', ['Python']) is None
+    assert list(store.entries('skill_gap')) == []
+
+
+def test_a_prompt_version_bump_hides_older_results(store, monkeypatch):
+    store.store('skill_gap', ['Python'], ['SQL'])
+    monkeypatch.setitem(skill_results.RESULT_VERSIONS, 'skill_gap', skill_results.RESULT_VERSIONS['skill_gap'] + 1)
+    assert store.lookup('skill_gap', ['Python']) is None
+
+
+def test_get_or_compute_stores_only_non_empty_results(store):
+    calls = []
+
+    def compute(result):
+        calls.append(result)
+        return result
+
+    assert store.get_or_compute('skill_gap', ['Python'], lambda: compute([])) == []
+    assert store.get_or_compute('skill_gap', ['Python'], lambda: compute(['SQL'])) == ['SQL']
+    assert store.get_or_compute('skill_gap', ['python'], lambda: compute(['Rust'])) == ['SQL']
+    assert calls == [[], ['SQL']]
+    assert store.stats()['stores'] == 1
+
+
+def test_entries_list_what_was_stored_since(store, clock):
+    store.store('skill_gap', ['Python'], ['SQL'])
+    clock.now += 10
+    store.store('skill_gap', ['Java', 'Spring'], ['Kotlin'])
+    assert list(store.entries('skill_gap', since=1005)) == [(['java', 'spring'], ['Kotlin'], 1010.0)]
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl  # POSIX only; used to serialise writers across gunicorn workers
+except ImportError:
+    fcntl = None
+
+from metrics import instrument_io
+
+# Label: User Registry
+# users.json used to be parsed on every login/dashboard hit and rewritten in
+# full (indent=4) on every register/profile update, with no protection against
+# two workers writing at once. The repository below keeps the parsed file in
+# memory, re-reads it only when its mtime/size changes, and writes through a
+# temp file + os.replace under an exclusive file lock.
+
+JSON_FILE = 'users.json'
+# Never part of anything derived from a record (page ETags)
+SECRET_FIELDS = ('password',)
+
+
+class UserRepository:
+    """Cached, concurrency-safe access to the users.json registry."""
+
+    def __init__(self, path: str = JSON_FILE):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._stamp = None
+        self._lock = threading.RLock()
+
+    # --- Cache handling ---
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @instrument_io('users.read')
+    def _read_file(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Reloads users.json only if another process has replaced it since the last read."""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    self._users = self._read_file()
+                    self._stamp = stamp
+        return self._users
+
+    # --- Reads (a stat + dict lookup, independent of the number of users) ---
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        user = self._refresh().get(username)
+        return dict(user) if user is not None else None
+
+    def exists(self, username: str) -> bool:
+        return username in self._refresh()
+
+    def usernames(self) -> List[str]:
+        return list(self._refresh().keys())
+
+    def record_stamp(self, username: str) -> Optional[str]:
+        """A digest of the user's record, minus the password, that changes whenever the record does."""
+        user = self._refresh().get(username)
+        if user is None:
+            return None
+        public = {key: value for key, value in user.items() if key not in SECRET_FIELDS}
+        return hashlib.sha256(json.dumps(public, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+    def check_password(self, username: str, password: str) -> bool:
+        user = self._refresh().get(username)
+        return user is not None and user.get('password') == password
+
+    # --- Writes ---
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @instrument_io('users.write')
+    def _write_file(self, users: Dict[str, Dict[str, Any]]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.users-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(users, tmp_file, separators=(',', ':'))
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            # os.replace is atomic, so readers see either the old or the new file, never half of one
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._users = users
+        self._stamp = self._file_stamp()
+
+    def create(self, username: str, record: Dict[str, Any]) -> bool:
+        """Adds a new user. Returns False if the username is already taken."""
+        with self._write_lock():
+            # Re-read under the lock so we never overwrite another worker's update
+            users = self._read_file()
+            if username in users:
+                return False
+            users[username] = dict(record)
+            self._write_file(users)
+            return True
+
+    def update(self, username: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merges fields into one user's record. Returns the updated record, or None if not found."""
+        with self._write_lock():
+            users = self._read_file()
+            if username not in users:
+                return None
+            users[username].update(fields)
+            self._write_file(users)
+            return dict(users[username])
+
+
+user_store = UserRepository()